@@ -0,0 +1,246 @@
+"""Metrics pipeline shared by the dashboard and the HTTP service"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import quantstats as qs
+import yfinance as yf
+
+import kernels
+from data_cache import shared_cache
+
+# Seconds a caller waits for a benchmark download before falling back to
+# previously downloaded data
+BENCHMARK_TIMEOUT = float(os.environ.get('BQUANT_BENCHMARK_TIMEOUT', 20))
+
+# Downloads run here so callers can keep working while they are in flight;
+# concurrent requests for the same ticker and range share one download
+_downloads = ThreadPoolExecutor(max_workers=4, thread_name_prefix='benchmark')
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def parse_returns(df, date_col, returns_col, scale=None, dayfirst=False):
+    """Returns Series indexed by date, rescaled from percent if needed
+
+    ``scale`` divides the values (100 for percentages); when None the
+    scale is guessed from the mean absolute return.
+    """
+    returns = df.set_index(pd.to_datetime(df[date_col], dayfirst=dayfirst))[returns_col].dropna()
+    if scale is None:
+        scale = 100 if returns.abs().mean() > 1 else 1
+    if scale != 1:
+        returns = returns / scale
+    return returns
+
+
+def parse_return_frame(df, date_col, columns, dayfirst=False, scales=None):
+    """Several return columns indexed by date, each rescaled from percent if needed
+
+    ``scales`` maps columns to their divisor (100 for percentages); columns
+    left out are guessed from their mean absolute return.
+    """
+    frame = df.set_index(pd.to_datetime(df[date_col], dayfirst=dayfirst))[list(columns)].astype(float)
+    frame = frame.dropna(how='all')
+    guessed = (frame.abs().mean() > 1).map({True: 100, False: 1})
+    divisors = pd.Series(scales or {}, dtype=float).reindex(frame.columns).fillna(guessed)
+    return frame / divisors
+
+
+def download_benchmark(ticker, start, end):
+    """Download benchmark returns from Yahoo Finance, None if no data"""
+    bench_data = yf.download(
+        ticker,
+        start=start,
+        end=end,
+        progress=False,
+        auto_adjust=True
+    )
+
+    if bench_data.empty:
+        return None
+
+    if 'Close' in bench_data.columns:
+        benchmark = bench_data['Close'].pct_change().dropna()
+    else:
+        benchmark = bench_data.iloc[:, 0].pct_change().dropna()
+
+    if isinstance(benchmark, pd.DataFrame):
+        benchmark = benchmark.iloc[:, 0]
+
+    return benchmark
+
+
+def _history_key(ticker):
+    return ('yfinance', ticker, 'history')
+
+
+def _download_into_cache(key, ticker, start, end):
+    try:
+        benchmark = download_benchmark(ticker, start, end)
+        if benchmark is not None:
+            benchmark = shared_cache.put(key, benchmark)
+            # Everything downloaded so far for the ticker, the fallback when
+            # a later download fails or is slow
+            history = shared_cache.get(_history_key(ticker))
+            shared_cache.put(_history_key(ticker), benchmark if history is None else benchmark.combine_first(history))
+        return benchmark
+    finally:
+        with _pending_lock:
+            _pending.pop(key, None)
+
+
+def request_benchmark(ticker, start, end):
+    """Future with the benchmark returns; the download starts in the background right away"""
+    key = ('yfinance', ticker, start, end)
+    benchmark = shared_cache.get(key)
+    if benchmark is not None:
+        future = Future()
+        future.set_result(benchmark)
+        return future
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is None:
+            future = _downloads.submit(_download_into_cache, key, ticker, start, end)
+            _pending[key] = future
+    return future
+
+
+def wait_for_benchmark(future, ticker, start, end, timeout=BENCHMARK_TIMEOUT):
+    """Result of ``request_benchmark`` and whether it came from earlier downloads
+
+    When the download fails or takes longer than ``timeout`` seconds, the
+    part of [start, end] already downloaded for the ticker is used instead;
+    without any, the error is raised. A slow download keeps running and
+    serves later requests.
+    """
+    try:
+        return future.result(timeout=timeout), False
+    except Exception:
+        history = shared_cache.get(_history_key(ticker))
+        fallback = history.loc[start:end] if history is not None else None
+        if fallback is None or len(fallback) == 0:
+            raise
+        return fallback, True
+
+
+def fetch_benchmark(ticker, start, end):
+    """Benchmark returns, downloaded once per ticker and range for the whole process"""
+    return request_benchmark(ticker, start, end).result()
+
+
+def calculate_beta(returns, benchmark):
+    """Calculate beta manually"""
+    common_dates = returns.index.intersection(benchmark.index)
+    if len(common_dates) == 0:
+        return 0
+
+    aligned_returns = returns.loc[common_dates]
+    aligned_benchmark = benchmark.loc[common_dates]
+
+    covariance = np.cov(aligned_returns, aligned_benchmark)[0][1]
+    benchmark_variance = np.var(aligned_benchmark)
+
+    if benchmark_variance == 0:
+        return 0
+
+    return covariance / benchmark_variance
+
+
+def calculate_alpha(returns, benchmark, rf=0, periods=252):
+    """Calculate alpha manually"""
+    common_dates = returns.index.intersection(benchmark.index)
+    if len(common_dates) == 0:
+        return 0
+
+    aligned_returns = returns.loc[common_dates]
+    aligned_benchmark = benchmark.loc[common_dates]
+
+    beta = calculate_beta(aligned_returns, aligned_benchmark)
+
+    strategy_return = (1 + aligned_returns).prod() ** (periods / len(aligned_returns)) - 1
+    benchmark_return = (1 + aligned_benchmark).prod() ** (periods / len(aligned_benchmark)) - 1
+
+    alpha = strategy_return - (rf + beta * (benchmark_return - rf))
+
+    return alpha
+
+
+def drawdown_episodes(returns):
+    """One row per drawdown episode: start, valley, end, depth and length
+
+    Equity starts at 1 as in qs.stats.max_drawdown. ``end`` is the first
+    date back at the previous peak (NaT while still under water) and
+    ``periods`` counts observations from start until recovery.
+    """
+    returns = returns.dropna()
+    columns = ['start', 'valley', 'end', 'max_drawdown', 'periods', 'days']
+    values = returns.to_numpy(dtype=float)
+    if len(values) == 0:
+        return pd.DataFrame(columns=columns)
+
+    drawdown = kernels.drawdown(values)
+    starts, ends, valleys = kernels.episode_bounds(drawdown)
+    if len(starts) == 0:
+        return pd.DataFrame(columns=columns)
+
+    index = returns.index
+    last = np.minimum(ends, len(values) - 1)
+    recovered = ends < len(values)
+
+    return pd.DataFrame({
+        'start': index[starts],
+        'valley': index[valleys],
+        'end': index[last].where(recovered),
+        'max_drawdown': drawdown[valleys],
+        'periods': ends - starts,
+        'days': (index[last] - index[starts]).days,
+    })
+
+
+def strategy_metrics(returns, rf=0.0, periods=252):
+    """Every strategy-only metric shown on the dashboard"""
+    episodes = drawdown_episodes(returns)
+    return {
+        'total_return': qs.stats.comp(returns),
+        'cagr': qs.stats.cagr(returns, rf=rf, periods=periods),
+        'sharpe': qs.stats.sharpe(returns, rf=rf, periods=periods),
+        'sortino': qs.stats.sortino(returns, rf=rf, periods=periods),
+        'volatility': qs.stats.volatility(returns, periods=periods),
+        'var_95': qs.stats.var(returns),
+        'cvar_95': qs.stats.cvar(returns),
+        'kelly': qs.stats.kelly_criterion(returns),
+        'skew': qs.stats.skew(returns),
+        'kurtosis': qs.stats.kurtosis(returns),
+        'max_drawdown': qs.stats.max_drawdown(returns),
+        'avg_drawdown': episodes['max_drawdown'].mean() if len(episodes) else 0,
+        'avg_drawdown_periods': episodes['periods'].mean() if len(episodes) else 0,
+        'calmar': qs.stats.calmar(returns, periods=periods),
+        'win_rate': qs.stats.win_rate(returns),
+        'best': qs.stats.best(returns),
+        'worst': qs.stats.worst(returns),
+        'payoff_ratio': qs.stats.payoff_ratio(returns),
+        'profit_factor': qs.stats.profit_factor(returns),
+        'avg_win': qs.stats.avg_win(returns),
+        'avg_loss': qs.stats.avg_loss(returns),
+    }
+
+
+def benchmark_metrics(returns, benchmark, rf=0.0, periods=252):
+    """Benchmark comparison metrics shown on the dashboard"""
+    return {
+        'benchmark_return': qs.stats.comp(benchmark),
+        'benchmark_sharpe': qs.stats.sharpe(benchmark, rf=rf, periods=periods),
+        'beta': calculate_beta(returns, benchmark),
+        'alpha': calculate_alpha(returns, benchmark, rf=rf, periods=periods),
+    }
+
+
+def headline_metrics(returns, benchmark=None, rf=0.0, periods=252):
+    """Strategy metrics plus benchmark comparison when a benchmark is given"""
+    metrics = strategy_metrics(returns, rf=rf, periods=periods)
+    if benchmark is not None:
+        metrics.update(benchmark_metrics(returns, benchmark, rf=rf, periods=periods))
+    return metrics
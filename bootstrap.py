@@ -0,0 +1,118 @@
+"""Vectorized bootstrap confidence intervals for the headline metrics"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+METRICS = ['sharpe', 'sortino', 'cagr', 'max_drawdown', 'calmar']
+
+
+def iid_indices(n, size, rng):
+    """Index matrix for the classic i.i.d. bootstrap"""
+    return rng.integers(0, n, size=(size, n), dtype=np.int32)
+
+
+def stationary_indices(n, size, block_size, rng):
+    """Index matrix for the Politis-Romano stationary block bootstrap"""
+    # Each position starts a new block with probability 1/block_size, so
+    # block lengths are geometric. Within a block indices advance by one
+    # (wrapping around), which keeps the serial dependence of the series.
+    new_block = rng.random((size, n)) < 1.0 / block_size
+    new_block[:, 0] = True
+    rows, cols = np.nonzero(new_block)
+    offsets = rng.integers(0, n, size=len(cols)) - cols
+
+    # Forward-fill each block's offset with a cumulative sum of the jumps
+    # between consecutive block offsets, restarting at every row
+    jumps = np.diff(offsets, prepend=0)
+    jumps[cols == 0] = offsets[cols == 0]
+    steps = np.zeros((size, n), dtype=np.int64)
+    steps[rows, cols] = jumps
+    np.cumsum(steps, axis=1, out=steps)
+    steps += np.arange(n)
+    return steps % n
+
+
+def matrix_metrics(samples, log_samples, rf=0.0, periods=252):
+    """Headline metrics for every row of a (replicates x observations) matrix
+
+    ``log_samples`` holds ``log1p`` of the same draws; both buffers are
+    overwritten in place to keep the number of passes over memory low.
+    """
+    n = samples.shape[1]
+    rf_period = (1 + rf) ** (1.0 / periods) - 1
+
+    # Shifting by rf does not change the dispersion, so the moments come
+    # from the raw draws in a single pass each
+    mean = samples.mean(axis=1)
+    sum_sq = np.einsum('ij,ij->i', samples, samples)
+    std = np.sqrt(np.maximum(sum_sq - n * mean ** 2, 0) / (n - 1))
+    mean -= rf_period
+    np.minimum(samples, rf_period, out=samples)
+    samples -= rf_period
+    downside = np.sqrt(np.einsum('ij,ij->i', samples, samples) / n)
+
+    # Compounding and drawdowns in log space: the equity curve starts at 1,
+    # so the running peak is floored at log(1) = 0
+    log_equity = np.cumsum(log_samples, axis=1, out=log_samples)
+    cagr = np.expm1(log_equity[:, -1] * periods / n)
+    peak = np.maximum(log_equity, 0)
+    np.maximum.accumulate(peak, axis=1, out=peak)
+    log_equity -= peak
+    max_dd = np.expm1(log_equity.min(axis=1))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = mean / std * np.sqrt(periods)
+        sortino = np.where(downside > 0, mean / downside, np.nan) * np.sqrt(periods)
+        calmar = cagr / np.abs(max_dd)
+
+    return np.column_stack([sharpe, sortino, cagr, max_dd, calmar])
+
+
+def bootstrap_metrics(returns, rf=0.0, periods=252, n_boot=10000, method='iid',
+                      block_size=None, batch_size=500, n_jobs=None, seed=None):
+    """Bootstrap distribution of the headline metrics, one row per replicate"""
+    values = np.asarray(returns, dtype=float)
+    values = values[np.isfinite(values)]
+    log_values = np.log1p(values)
+    n = len(values)
+    if n < 2:
+        return pd.DataFrame(np.nan, index=range(n_boot), columns=METRICS)
+
+    if block_size is None:
+        block_size = max(1.0, n ** (1.0 / 3.0))
+
+    sizes = [min(batch_size, n_boot - i) for i in range(0, n_boot, batch_size)]
+    # One independent stream per batch keeps results reproducible whatever
+    # the number of workers
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    def run_batch(size, stream):
+        rng = np.random.default_rng(stream)
+        if method == 'stationary':
+            idx = stationary_indices(n, size, block_size, rng)
+        else:
+            idx = iid_indices(n, size, rng)
+        return matrix_metrics(np.take(values, idx), np.take(log_values, idx),
+                              rf=rf, periods=periods)
+
+    # NumPy releases the GIL inside the heavy kernels, so threads scale
+    # across cores without pickling the index matrices
+    workers = n_jobs or os.cpu_count() or 1
+    if workers > 1 and len(sizes) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_batch, sizes, streams))
+    else:
+        results = [run_batch(size, stream) for size, stream in zip(sizes, streams)]
+
+    return pd.DataFrame(np.vstack(results), columns=METRICS)
+
+
+def bootstrap_ci(returns, rf=0.0, periods=252, confidence=0.95, **kwargs):
+    """Percentile confidence intervals for the headline metrics"""
+    replicates = bootstrap_metrics(returns, rf=rf, periods=periods, **kwargs)
+    alpha = (1 - confidence) / 2
+    lower = np.nanquantile(replicates.values, alpha, axis=0)
+    upper = np.nanquantile(replicates.values, 1 - alpha, axis=0)
+    return pd.DataFrame({'lower': lower, 'upper': upper}, index=METRICS)
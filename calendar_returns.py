@@ -0,0 +1,80 @@
+"""Compounded calendar breakdowns from a single log-return aggregation"""
+import numpy as np
+import pandas as pd
+
+
+def _compound(log_sums, counts, index):
+    """Compounded returns for the buckets that have observations"""
+    observed = counts > 0
+    return pd.Series(np.expm1(log_sums[observed]), index=index[observed])
+
+
+def calendar_returns(returns):
+    """Monthly, quarterly, yearly, weekday and hour-of-day compounded returns
+
+    Log returns are summed once per calendar month; quarters and years are
+    sums of those monthly sums, so no bucket is compounded twice. Weekday
+    and hour buckets come from the same log returns. Buckets without
+    observations are left out (NaN in ``monthly_table``).
+    """
+    returns = returns.dropna().sort_index()
+    empty = pd.Series(dtype=float)
+    if len(returns) == 0:
+        return {
+            'monthly': empty, 'monthly_table': pd.DataFrame(columns=range(1, 13), dtype=float),
+            'quarterly': empty, 'yearly': empty, 'weekday': empty, 'hour': empty,
+        }
+
+    log_returns = np.log1p(returns.to_numpy(dtype=float))
+    index = returns.index
+    years = index.year.to_numpy()
+    first_year = years[0]
+    n_years = years[-1] - first_year + 1
+
+    month_code = (years - first_year) * 12 + index.month.to_numpy() - 1
+    month_sums = np.bincount(month_code, weights=log_returns, minlength=n_years * 12)
+    month_counts = np.bincount(month_code, minlength=n_years * 12)
+
+    year_labels = np.arange(first_year, first_year + n_years)
+    month_ends = pd.period_range(f'{first_year}-01', periods=n_years * 12, freq='M')
+    month_ends = month_ends.to_timestamp(how='end').normalize()
+    monthly = _compound(month_sums, month_counts, month_ends)
+
+    table = np.where(month_counts > 0, np.expm1(month_sums), np.nan).reshape(n_years, 12)
+    monthly_table = pd.DataFrame(table, index=year_labels, columns=range(1, 13))
+    monthly_table = monthly_table.loc[month_counts.reshape(n_years, 12).sum(axis=1) > 0]
+
+    quarter_sums = month_sums.reshape(-1, 3).sum(axis=1)
+    quarter_counts = month_counts.reshape(-1, 3).sum(axis=1)
+    quarters = pd.period_range(f'{first_year}Q1', periods=n_years * 4, freq='Q')
+    quarterly = _compound(quarter_sums, quarter_counts, quarters)
+
+    year_sums = month_sums.reshape(n_years, 12).sum(axis=1)
+    year_counts = month_counts.reshape(n_years, 12).sum(axis=1)
+    yearly = _compound(year_sums, year_counts, pd.Index(year_labels))
+
+    weekday_code = index.dayofweek.to_numpy()
+    weekday = _compound(
+        np.bincount(weekday_code, weights=log_returns, minlength=7),
+        np.bincount(weekday_code, minlength=7),
+        pd.RangeIndex(7)
+    )
+
+    # Hour-of-day only carries information for intraday data
+    hours = index.hour.to_numpy()
+    hour = empty
+    if hours.any():
+        hour = _compound(
+            np.bincount(hours, weights=log_returns, minlength=24),
+            np.bincount(hours, minlength=24),
+            pd.RangeIndex(24)
+        )
+
+    return {
+        'monthly': monthly,
+        'monthly_table': monthly_table,
+        'quarterly': quarterly,
+        'yearly': yearly,
+        'weekday': weekday,
+        'hour': hour,
+    }
@@ -0,0 +1,190 @@
+"""Plotly versions of the dashboard charts, rendered in the browser"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from analytics import drawdown_episodes
+from regression import rolling_regression
+
+STRATEGY_COLOR = '#00d4ff'
+BENCHMARK_COLOR = '#ff9900'
+FACTOR_COLORS = ['#00d4ff', '#ff9900', '#7CFC00', '#ff4d6d', '#b388ff', '#ffd54f']
+MONTH_LABELS = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+
+# Above this many points line traces switch to WebGL
+WEBGL_THRESHOLD = 5000
+# Line traces are thinned to about this many points, keeping every bucket's
+# minimum and maximum so peaks and troughs survive
+MAX_POINTS = 20000
+
+
+def _thin(values, max_points=MAX_POINTS):
+    """Positions to plot: per-bucket min and max once a series is too long"""
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    bucket = -(-n // (max_points // 2))
+    full = n // bucket * bucket
+    blocks = np.nan_to_num(values[:full], nan=0.0).reshape(-1, bucket)
+    starts = np.arange(0, full, bucket)
+    keep = np.concatenate([
+        starts + blocks.argmin(axis=1),
+        starts + blocks.argmax(axis=1),
+        np.arange(full, n),
+        [0, n - 1],
+    ])
+    return np.unique(keep)
+
+
+def _line(series, name, color, width=2, fill=None, **kwargs):
+    """Line trace with float32 data, WebGL for long series"""
+    values = series.to_numpy(dtype=float)
+    positions = _thin(values)
+    trace = go.Scattergl if len(positions) > WEBGL_THRESHOLD else go.Scatter
+    return trace(
+        x=series.index[positions].to_numpy(),
+        y=values[positions].astype(np.float32),
+        mode='lines', name=name, fill=fill,
+        line=dict(color=color, width=width),
+        **kwargs
+    )
+
+
+def _layout(fig, title, yaxis_title=None, height=450, percent=False):
+    fig.update_layout(
+        template='plotly_dark', height=height, title=title,
+        yaxis_title=yaxis_title, hovermode='x unified',
+        margin=dict(l=40, r=20, t=60, b=40),
+        legend=dict(orientation='h', yanchor='bottom', y=1.0, xanchor='right', x=1)
+    )
+    if percent:
+        fig.update_yaxes(ticksuffix='%')
+    return fig
+
+
+def cumulative_returns_figure(returns, benchmark=None, bench_name="Benchmark"):
+    """Compounded cumulative returns, with the benchmark if given"""
+    fig = go.Figure()
+    fig.add_trace(_line(((1 + returns).cumprod() - 1) * 100, 'Estrategia', STRATEGY_COLOR))
+    if benchmark is not None:
+        cum_bench = ((1 + benchmark.loc[returns.index.min():returns.index.max()]).cumprod() - 1) * 100
+        fig.add_trace(_line(cum_bench, bench_name, BENCHMARK_COLOR, opacity=0.7))
+    fig.add_hline(y=0, line=dict(color='white', width=1), opacity=0.4)
+    return _layout(fig, 'Retornos Acumulados', 'Retorno (%)', height=500, percent=True)
+
+
+def drawdown_figure(returns, top=5, episodes=None):
+    """Underwater curve with the deepest drawdown periods shaded"""
+    equity = (1 + returns).cumprod()
+    drawdown = (equity / np.maximum(equity.cummax(), 1.0) - 1) * 100
+
+    fig = go.Figure()
+    fig.add_trace(_line(drawdown, 'Drawdown', '#ff4b4b', width=1, fill='tozeroy'))
+    if episodes is None:
+        episodes = drawdown_episodes(returns)
+    episodes = episodes.nsmallest(top, 'max_drawdown')
+    for episode in episodes.itertuples():
+        end = episode.end if pd.notna(episode.end) else returns.index[-1]
+        fig.add_vrect(x0=episode.start, x1=end, fillcolor=BENCHMARK_COLOR, opacity=0.15, line_width=0)
+    return _layout(fig, f'Períodos de Drawdown (Top {top})', 'Drawdown (%)', percent=True)
+
+
+def monthly_heatmap_figure(monthly_table, height=None):
+    """Monthly returns heatmap from the calendar aggregation"""
+    values = monthly_table.to_numpy(dtype=float) * 100
+    limit = np.nanmax(np.abs(values)) if np.isfinite(values).any() else 1
+    text = np.where(np.isfinite(values), np.char.mod('%.1f', np.nan_to_num(values)), '')
+    fig = go.Figure(go.Heatmap(
+        z=values.astype(np.float32), x=MONTH_LABELS, y=[str(y) for y in monthly_table.index],
+        text=text, texttemplate='%{text}', colorscale='RdYlGn', zmin=-limit, zmax=limit,
+        hovertemplate='%{y} %{x}: %{z:.2f}%<extra></extra>', colorbar=dict(ticksuffix='%')
+    ))
+    fig.update_yaxes(autorange='reversed', type='category')
+    height = height or max(300, 60 + 28 * len(monthly_table))
+    fig = _layout(fig, 'Retornos Mensuales (%)', height=height)
+    fig.update_layout(hovermode='closest')
+    return fig
+
+
+def histogram_figure(returns, bins=50):
+    """Return distribution binned on the server, so only the bin counts are sent"""
+    values = returns.dropna().to_numpy(dtype=float) * 100
+    counts, edges = np.histogram(values, bins=bins)
+    fig = go.Figure(go.Bar(
+        x=((edges[:-1] + edges[1:]) / 2).astype(np.float32), y=counts,
+        width=np.diff(edges).astype(np.float32), marker_color=STRATEGY_COLOR, opacity=0.8,
+        name='Frecuencia', hovertemplate='%{x:.2f}%: %{y}<extra></extra>'
+    ))
+    fig.add_vline(x=values.mean(), line=dict(color=BENCHMARK_COLOR, dash='dash'),
+                  annotation_text='Media', annotation_font_color=BENCHMARK_COLOR)
+    fig.add_vline(x=0, line=dict(color='white', width=1), opacity=0.4)
+    fig = _layout(fig, 'Distribución de Retornos', 'Frecuencia')
+    fig.update_layout(hovermode='closest', bargap=0)
+    fig.update_xaxes(ticksuffix='%')
+    return fig
+
+
+def yearly_returns_figure(yearly, bench_yearly=None, bench_name="Benchmark"):
+    """Yearly compounded returns, side by side with the benchmark if given"""
+    years = yearly.index
+    if bench_yearly is not None:
+        years = years.union(bench_yearly.index)
+    labels = [str(y) for y in years]
+    fig = go.Figure(go.Bar(x=labels, y=yearly.reindex(years).to_numpy() * 100,
+                           name='Estrategia', marker_color=STRATEGY_COLOR))
+    if bench_yearly is not None:
+        fig.add_trace(go.Bar(x=labels, y=bench_yearly.reindex(years).to_numpy() * 100,
+                             name=bench_name, marker_color=BENCHMARK_COLOR, opacity=0.7))
+    fig.update_xaxes(type='category')
+    return _layout(fig, 'Retornos Anuales', 'Retorno (%)', percent=True)
+
+
+def rolling_volatility(returns, window=126, periods=252):
+    """Annualized rolling volatility as in qs.stats.rolling_volatility"""
+    return returns.rolling(window).std() * np.sqrt(periods)
+
+
+def rolling_sharpe(returns, rf=0.0, window=126, periods=252):
+    """Annualized rolling Sharpe as in qs.stats.rolling_sharpe"""
+    excess = returns - ((1 + rf) ** (1 / periods) - 1)
+    return excess.rolling(window).mean() / excess.rolling(window).std() * np.sqrt(periods)
+
+
+def rolling_beta(returns, benchmark, window=60):
+    """Rolling beta over the dates both series share"""
+    return rolling_regression(returns, benchmark, window=window).iloc[:, 1]
+
+
+def rolling_figure(series, title, yaxis_title, hline=None, hline_name=None, percent=False):
+    """Rolling statistic with an optional reference line"""
+    series = series.dropna()
+    scale = 100 if percent else 1
+    fig = go.Figure(_line(series * scale, yaxis_title, STRATEGY_COLOR))
+    if hline is not None:
+        fig.add_hline(y=hline * scale, line=dict(color=BENCHMARK_COLOR, dash='dash'), opacity=0.7,
+                      annotation_text=hline_name, annotation_font_color=BENCHMARK_COLOR)
+    return _layout(fig, title, yaxis_title, percent=percent)
+
+
+def var_backtest_figure(returns, forecast, breach_dates, title):
+    """Returns against the VaR forecast, breaches marked"""
+    scale = 100
+    fig = go.Figure()
+    fig.add_trace(_line(returns * scale, 'Retorno', STRATEGY_COLOR, width=1))
+    fig.add_trace(_line(forecast.dropna() * scale, 'VaR', BENCHMARK_COLOR))
+    breaches = returns.loc[breach_dates] * scale
+    trace = go.Scattergl if len(breaches) > WEBGL_THRESHOLD else go.Scatter
+    fig.add_trace(trace(
+        x=breaches.index, y=breaches.to_numpy(dtype=np.float32), mode='markers', name='Excesos',
+        marker=dict(color='#ff4d6d', size=6)
+    ))
+    return _layout(fig, title, 'Retorno (%)', percent=True)
+
+
+def factor_lines_figure(frame, title, yaxis_title, percent=False):
+    """One line per column, e.g. rolling factor betas"""
+    scale = 100 if percent else 1
+    fig = go.Figure()
+    for i, column in enumerate(frame.columns):
+        fig.add_trace(_line(frame[column].dropna() * scale, str(column), FACTOR_COLORS[i % len(FACTOR_COLORS)]))
+    return _layout(fig, title, yaxis_title, percent=percent)
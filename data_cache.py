@@ -0,0 +1,105 @@
+"""Process-wide cache for immutable data shared across Streamlit sessions"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def content_key(data):
+    """Stable key for uploaded file contents"""
+    return hashlib.sha1(data).hexdigest()
+
+
+class SharedDataCache:
+    """LRU cache with a global memory budget
+
+    Series are stored as a read-only NumPy buffer plus their index, so every
+    session that hits the same key reads the same memory. DataFrames are
+    handed out as shallow copies and must be treated as immutable.
+    """
+
+    def __init__(self, max_bytes, float32=False):
+        self.max_bytes = max_bytes
+        self.float32 = float32
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _pack(self, value):
+        if isinstance(value, pd.Series):
+            dtype = np.float32 if self.float32 and value.dtype.kind == 'f' else value.dtype
+            values = np.array(value.to_numpy(), dtype=dtype)
+            values.flags.writeable = False
+            nbytes = values.nbytes + value.index.memory_usage(deep=True)
+            return ('series', values, value.index, value.name), nbytes
+        if isinstance(value, pd.DataFrame):
+            return ('frame', value), int(value.memory_usage(deep=True).sum())
+        raise TypeError(f"Unsupported type for shared cache: {type(value).__name__}")
+
+    @staticmethod
+    def _unpack(entry):
+        if entry[0] == 'series':
+            _, values, index, name = entry
+            return pd.Series(values, index=index, name=name, copy=False)
+        return entry[1].copy(deep=False)
+
+    def get(self, key):
+        """Return the cached value or None, marking it as recently used"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._unpack(item[0])
+
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries over budget"""
+        entry, nbytes = self._pack(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            # Larger than the whole budget: hand it back without caching
+            if nbytes <= self.max_bytes:
+                self._entries[key] = (entry, nbytes)
+                self._bytes += nbytes
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= evicted
+        return self._unpack(entry)
+
+    def get_or_load(self, key, loader):
+        """Return the cached value, calling ``loader()`` on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, loader())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# Module state survives Streamlit reruns and is shared by every session in
+# the server process. Budget and storage mode are set per deployment.
+shared_cache = SharedDataCache(
+    max_bytes=int(float(os.environ.get('BQUANT_CACHE_MB', 512)) * 1024 ** 2),
+    float32=os.environ.get('BQUANT_CACHE_FLOAT32', '0').lower() in ('1', 'true', 'yes'),
+)
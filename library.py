@@ -0,0 +1,238 @@
+"""Server-side library of strategy return series, memory-mapped from a local directory
+
+Each strategy is a folder holding its dates (int64 nanoseconds) and returns
+(float64) as raw column files plus a ``meta.json`` with the name,
+description, row count and date range. Opening a strategy maps the column
+files read-only, so every session reads the same pages of the OS cache
+instead of holding its own copy. Appending writes only the new rows and
+then swaps the metadata, so readers always see a consistent row count.
+One writer per strategy at a time is assumed.
+
+    python library.py add "Momentum EU" returns.csv --description "Diaria"
+    python library.py append "Momentum EU" latest.csv
+    python library.py list
+
+The directory defaults to ./library next to this file; set
+BQUANT_LIBRARY_DIR to use another one.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from analytics import parse_returns
+from upload_schema import detect_schema, read_columns
+
+LIBRARY_DIR = os.environ.get('BQUANT_LIBRARY_DIR',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'library'))
+
+DATES_FILE = 'dates.i8'
+VALUES_FILE = 'values.f8'
+META_FILE = 'meta.json'
+
+
+class LibraryError(Exception):
+    """Missing, duplicate or malformed library entry"""
+
+
+def _slug(name):
+    slug = re.sub(r'[^\w.-]+', '_', name.strip()).strip('._')
+    if not slug:
+        raise LibraryError(f"Invalid strategy name: {name!r}")
+    return slug
+
+
+def _clean(returns):
+    """Sorted float64 returns on a unique tz-naive nanosecond index"""
+    returns = returns.dropna().astype(float)
+    index = pd.DatetimeIndex(returns.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    returns.index = index.as_unit('ns')
+    returns = returns[~returns.index.duplicated(keep='last')]
+    return returns.sort_index()
+
+
+def _write_json(path, payload):
+    """Write next to ``path`` and rename over it, so readers never see half a file"""
+    handle, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(handle, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(temp, path)
+
+
+class StrategyLibrary:
+    """Directory of strategies opened as memory-mapped return series"""
+
+    def __init__(self, root=LIBRARY_DIR):
+        self.root = root
+
+    def _path(self, name, filename=''):
+        return os.path.join(self.root, _slug(name), filename)
+
+    def exists(self, name):
+        return os.path.exists(self._path(name, META_FILE))
+
+    def metadata(self, name):
+        try:
+            with open(self._path(name, META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise LibraryError(f"Strategy not found: {name}")
+
+    def list(self):
+        """Metadata of every strategy, one row each, sorted by name"""
+        entries = []
+        if os.path.isdir(self.root):
+            for folder in os.listdir(self.root):
+                path = os.path.join(self.root, folder, META_FILE)
+                if os.path.exists(path):
+                    with open(path) as f:
+                        entries.append(json.load(f))
+        columns = ['name', 'description', 'rows', 'start', 'end', 'source', 'updated']
+        return pd.DataFrame(entries, columns=columns).sort_values('name', ignore_index=True)
+
+    def load(self, name):
+        """Read-only return series backed by the memory-mapped column files"""
+        meta = self.metadata(name)
+        rows = meta['rows']
+        if rows == 0:
+            return pd.Series([], index=pd.DatetimeIndex([]), dtype=float, name=meta['name'])
+        dates = np.memmap(self._path(name, DATES_FILE), dtype=np.int64, mode='r', shape=(rows,))
+        values = np.memmap(self._path(name, VALUES_FILE), dtype=np.float64, mode='r', shape=(rows,))
+        index = pd.DatetimeIndex(dates.view('M8[ns]'), copy=False)
+        return pd.Series(values, index=index, name=meta['name'], copy=False)
+
+    def save(self, name, returns, description='', source=None, overwrite=False):
+        """Store a new strategy (or replace one with ``overwrite``)"""
+        if self.exists(name) and not overwrite:
+            raise LibraryError(f"Strategy already exists: {name}")
+        returns = _clean(returns)
+        folder = self._path(name)
+        os.makedirs(self.root, exist_ok=True)
+
+        # Build the folder aside and move it in whole
+        staging = tempfile.mkdtemp(dir=self.root, prefix='.staging-')
+        returns.index.asi8.astype(np.int64).tofile(os.path.join(staging, DATES_FILE))
+        returns.to_numpy(dtype=np.float64).tofile(os.path.join(staging, VALUES_FILE))
+        now = datetime.now().isoformat(timespec='seconds')
+        _write_json(os.path.join(staging, META_FILE), {
+            'name': name,
+            'description': description,
+            'source': source,
+            'rows': len(returns),
+            'start': returns.index[0].isoformat() if len(returns) else None,
+            'end': returns.index[-1].isoformat() if len(returns) else None,
+            'created': now,
+            'updated': now,
+        })
+        if os.path.exists(folder):
+            shutil.rmtree(folder)
+        os.replace(staging, folder)
+        return len(returns)
+
+    def append(self, name, returns):
+        """Add the periods after the stored end date; returns how many were added
+
+        Rows are appended to the column files first and the metadata is
+        swapped last, so open readers keep seeing the previous row count.
+        Periods at or before the stored end date are ignored.
+        """
+        meta = self.metadata(name)
+        returns = _clean(returns)
+        if meta['end'] is not None:
+            returns = returns[returns.index > pd.Timestamp(meta['end'])]
+        if len(returns) == 0:
+            return 0
+
+        # Drop anything past the recorded rows left by an interrupted append
+        columns = {
+            DATES_FILE: returns.index.asi8.astype(np.int64),
+            VALUES_FILE: returns.to_numpy(dtype=np.float64),
+        }
+        for filename, column in columns.items():
+            with open(self._path(name, filename), 'r+b') as f:
+                f.truncate(meta['rows'] * column.itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(column.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        meta.update({
+            'rows': meta['rows'] + len(returns),
+            'start': meta['start'] or returns.index[0].isoformat(),
+            'end': returns.index[-1].isoformat(),
+            'updated': datetime.now().isoformat(timespec='seconds'),
+        })
+        _write_json(self._path(name, META_FILE), meta)
+        return len(returns)
+
+    def delete(self, name):
+        if not self.exists(name):
+            raise LibraryError(f"Strategy not found: {name}")
+        shutil.rmtree(self._path(name))
+
+
+def read_returns_file(path, date_col=None, returns_col=None):
+    """Return series from a CSV/Excel file, detected the same way as dashboard uploads"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    schema = detect_schema(data, os.path.basename(path))
+    date_col = date_col or schema['date_col']
+    returns_col = returns_col or schema['returns_col']
+    frame = read_columns(data, schema, [date_col, returns_col])
+    scale = schema['scale'] if returns_col == schema['returns_col'] else None
+    return parse_returns(frame, date_col, returns_col, scale=scale, dayfirst=schema['dayfirst'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the BQuantStats strategy library")
+    parser.add_argument('--root', default=LIBRARY_DIR, help="library directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="store a strategy from a returns file")
+    add.add_argument('name')
+    add.add_argument('path')
+    add.add_argument('--description', default='')
+    add.add_argument('--overwrite', action='store_true')
+
+    append = commands.add_parser('append', help="append new periods from a returns file")
+    append.add_argument('name')
+    append.add_argument('path')
+
+    for command in (add, append):
+        command.add_argument('--date-col')
+        command.add_argument('--returns-col')
+
+    commands.add_parser('list', help="show stored strategies")
+    remove = commands.add_parser('remove', help="delete a strategy")
+    remove.add_argument('name')
+
+    args = parser.parse_args(argv)
+    library = StrategyLibrary(args.root)
+    try:
+        if args.command == 'add':
+            returns = read_returns_file(args.path, args.date_col, args.returns_col)
+            rows = library.save(args.name, returns, description=args.description,
+                                source=os.path.basename(args.path), overwrite=args.overwrite)
+            print(f"Stored {args.name}: {rows} rows")
+        elif args.command == 'append':
+            returns = read_returns_file(args.path, args.date_col, args.returns_col)
+            print(f"Appended {library.append(args.name, returns)} rows to {args.name}")
+        elif args.command == 'list':
+            print(library.list().to_string(index=False))
+        elif args.command == 'remove':
+            library.delete(args.name)
+            print(f"Removed {args.name}")
+    except LibraryError as e:
+        parser.exit(1, f"error: {e}\n")
+
+
+if __name__ == '__main__':
+    main()
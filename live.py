@@ -0,0 +1,262 @@
+"""Live mode: follow a growing returns file or drop directory and update metrics online
+
+``ReturnsTail`` reads only the bytes added since the previous poll.
+``OnlineMetrics`` folds each batch of new returns into running
+accumulators (Welford/Pébay moments, log equity and its peak, streak state,
+win/loss counts and sums), so an update costs O(new rows) no matter how long
+the history is. Its figures follow the quantstats definitions used by
+``analytics.strategy_metrics``.
+
+Only paths under BQUANT_LIVE_DIR can be followed; live mode is off when it
+is not set.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from analytics import parse_returns
+from upload_schema import detect_schema, read_columns, SAMPLE_BYTES
+
+LIVE_ROOT = os.environ.get('BQUANT_LIVE_DIR')
+LIVE_EXTENSIONS = ('.csv', '.txt')
+
+
+class LivePathError(Exception):
+    """Live path missing, or outside the configured live directory"""
+
+
+def _within(path, root):
+    return os.path.commonpath([path, root]) == root
+
+
+def resolve_live_path(path, root=LIVE_ROOT):
+    """Real path of ``path`` (relative paths start at ``root``), which must lie under ``root``"""
+    if not root:
+        raise LivePathError("Live mode is disabled: BQUANT_LIVE_DIR is not set")
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if not _within(resolved, root):
+        raise LivePathError(f"Path is outside the live directory: {path}")
+    if not os.path.exists(resolved):
+        raise LivePathError(f"Path not found: {path}")
+    return resolved
+
+
+class ReturnsTail:
+    """New return observations appended to a file, or to the files of a directory
+
+    The column layout is detected once, from the first data rows that
+    arrive. Each poll reads every file from where the previous one stopped,
+    up to its last complete line; a file that shrank is read again from the
+    top. Only periods after the latest date already returned are kept. With
+    ``root``, files of a directory that resolve outside it (e.g. symlinks)
+    are skipped.
+    """
+
+    def __init__(self, path, root=None):
+        self.path = path
+        self.root = os.path.realpath(root) if root else None
+        self.offsets = {}
+        self.schema = None
+        self.header = None
+        self.last_date = None
+
+    def _files(self):
+        if os.path.isdir(self.path):
+            files = sorted(
+                os.path.join(self.path, f) for f in os.listdir(self.path)
+                if f.lower().endswith(LIVE_EXTENSIONS) and not f.startswith('.')
+            )
+        else:
+            files = [self.path] if os.path.exists(self.path) else []
+        if self.root is not None:
+            files = [f for f in files if _within(os.path.realpath(f), self.root)]
+        return files
+
+    def _read_new(self, filename):
+        """Complete lines added to ``filename`` since the last poll, without its header"""
+        size = os.path.getsize(filename)
+        offset = self.offsets.get(filename)
+        if offset is None or size < offset:
+            offset = 0
+        if size == offset:
+            return b''
+        with open(filename, 'rb') as f:
+            f.seek(offset)
+            chunk = f.read(size - offset)
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return b''
+        self.offsets[filename] = offset + end
+        chunk = chunk[:end]
+        if offset == 0:
+            header, chunk = chunk.split(b'\n', 1)
+            if self.header is None:
+                self.header = header + b'\n'
+        return chunk
+
+    def poll(self):
+        """Return series with the periods added since the previous poll (may be empty)"""
+        chunks = []
+        for filename in self._files():
+            chunk = self._read_new(filename)
+            if chunk.strip():
+                chunks.append(chunk)
+        if not chunks:
+            return pd.Series([], index=pd.DatetimeIndex([]), dtype=float)
+
+        data = self.header + b''.join(chunks)
+        if self.schema is None:
+            # Detected from the first rows, not from a header-only file, so
+            # the percent scale is judged on actual values
+            self.schema = detect_schema(data[:SAMPLE_BYTES], os.path.basename(self.path) or 'live.csv')
+        schema = self.schema
+        date_col, returns_col = schema['date_col'], schema['returns_col']
+        frame = read_columns(data, schema, [date_col, returns_col])
+        returns = parse_returns(frame, date_col, returns_col, scale=schema['scale'], dayfirst=schema['dayfirst'])
+        returns = returns[~returns.index.duplicated(keep='last')].sort_index()
+        if self.last_date is not None:
+            returns = returns[returns.index > self.last_date]
+        if len(returns):
+            self.last_date = returns.index[-1]
+        return returns.astype(float)
+
+
+def _runs(signs):
+    """Sign and length of each run of equal signs"""
+    starts = np.r_[0, np.flatnonzero(np.diff(signs)) + 1]
+    return signs[starts], np.diff(np.r_[starts, len(signs)])
+
+
+class OnlineMetrics:
+    """Headline metrics maintained incrementally as returns arrive"""
+
+    def __init__(self, rf=0.0, periods=252):
+        self.rf = rf
+        self.periods = periods
+        self.rf_period = (1 + rf) ** (1 / periods) - 1
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.downside_sq = 0.0
+        self.log_equity = 0.0
+        self.peak_log = 0.0
+        self.max_drawdown_log = 0.0
+        self.wins = self.losses = 0
+        self.win_sum = self.loss_sum = 0.0
+        self.best = -np.inf
+        self.worst = np.inf
+        self.streak_sign = 0
+        self.streak_length = 0
+        self.max_win_streak = self.max_loss_streak = 0
+        self.first_date = self.last_date = None
+
+    def update(self, returns):
+        """Fold a batch of new returns (oldest first) into the accumulators
+
+        Returns the batch's ``cumulative`` return and ``drawdown`` since the
+        first observation, for drawing only the newest part of the curves.
+        """
+        returns = returns.dropna()
+        values = returns.to_numpy(dtype=float)
+        k = len(values)
+        if k == 0:
+            return pd.DataFrame({'cumulative': [], 'drawdown': []}, index=returns.index, dtype=float)
+        if self.first_date is None:
+            self.first_date = returns.index[0]
+        self.last_date = returns.index[-1]
+
+        # Combine the batch's central moments with the running ones
+        # (Chan / Pébay pairwise update)
+        mean_b = values.mean()
+        centered = values - mean_b
+        m2_b, m3_b, m4_b = (centered ** 2).sum(), (centered ** 3).sum(), (centered ** 4).sum()
+        n_a, n = self.n, self.n + k
+        delta = mean_b - self.mean
+        m4 = (self.m4 + m4_b + delta ** 4 * n_a * k * (n_a ** 2 - n_a * k + k ** 2) / n ** 3
+              + 6 * delta ** 2 * (n_a ** 2 * m2_b + k ** 2 * self.m2) / n ** 2
+              + 4 * delta * (n_a * m3_b - k * self.m3) / n)
+        m3 = (self.m3 + m3_b + delta ** 3 * n_a * k * (n_a - k) / n ** 2
+              + 3 * delta * (n_a * m2_b - k * self.m2) / n)
+        self.m2 += m2_b + delta ** 2 * n_a * k / n
+        self.m3, self.m4 = m3, m4
+        self.mean += delta * k / n
+        self.n = n
+
+        shortfall = np.minimum(values - self.rf_period, 0)
+        self.downside_sq += shortfall @ shortfall
+
+        # Drawdown against the running peak of log equity (starting at 1)
+        log_equity = self.log_equity + np.cumsum(np.log1p(values))
+        peak = np.maximum.accumulate(np.maximum(log_equity, self.peak_log))
+        drawdown = log_equity - peak
+        self.max_drawdown_log = min(self.max_drawdown_log, drawdown.min())
+        self.log_equity, self.peak_log = log_equity[-1], peak[-1]
+
+        positive, negative = values > 0, values < 0
+        self.wins += int(positive.sum())
+        self.losses += int(negative.sum())
+        self.win_sum += values[positive].sum()
+        self.loss_sum += values[negative].sum()
+        self.best = max(self.best, values.max())
+        self.worst = min(self.worst, values.min())
+
+        # Streaks: the batch's first run continues the open one if the sign matches
+        signs, lengths = _runs(np.sign(values).astype(int))
+        if signs[0] == self.streak_sign and self.streak_sign != 0:
+            lengths[0] += self.streak_length
+        for sign, attribute in ((1, 'max_win_streak'), (-1, 'max_loss_streak')):
+            matching = lengths[signs == sign]
+            if len(matching):
+                setattr(self, attribute, max(getattr(self, attribute), int(matching.max())))
+        self.streak_sign, self.streak_length = int(signs[-1]), int(lengths[-1])
+        return pd.DataFrame({'cumulative': np.expm1(log_equity), 'drawdown': np.expm1(drawdown)}, index=returns.index)
+
+    def metrics(self):
+        """Current values under the same keys as ``strategy_metrics``, plus live-only state"""
+        n, periods = self.n, self.periods
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(self.m2 / (n - 1)) if n > 1 else np.nan
+            m2, m3, m4 = self.m2 / n, self.m3 / n, self.m4 / n
+            skew = m3 / m2 ** 1.5 * np.sqrt(n * (n - 1)) / (n - 2) if n > 2 else np.nan
+            kurt = (((n + 1) * (m4 / m2 ** 2 - 3) + 6) * (n - 1) / ((n - 2) * (n - 3))) if n > 3 else np.nan
+            cagr = np.exp(self.log_equity * periods / n) - 1 if n else np.nan
+            max_drawdown = np.expm1(self.max_drawdown_log)
+            avg_win = self.win_sum / self.wins if self.wins else np.nan
+            avg_loss = self.loss_sum / self.losses if self.losses else np.nan
+            payoff = avg_win / abs(avg_loss) if self.losses else np.nan
+            win_rate = self.wins / (self.wins + self.losses) if self.wins + self.losses else 0.0
+            downside = np.sqrt(self.downside_sq / n) if n else np.nan
+        z = norm.ppf(0.05)
+        return {
+            'total_return': np.expm1(self.log_equity),
+            'cagr': cagr,
+            'sharpe': (self.mean - self.rf_period) / std * np.sqrt(periods),
+            'sortino': (self.mean - self.rf_period) / downside * np.sqrt(periods),
+            'volatility': std * np.sqrt(periods),
+            'var_95': self.mean + std * z,
+            'cvar_95': self.mean - std * norm.pdf(z) / 0.05,
+            'kelly': (payoff * win_rate - (1 - win_rate)) / payoff,
+            'skew': skew,
+            'kurtosis': kurt,
+            'max_drawdown': max_drawdown,
+            'calmar': cagr / abs(max_drawdown) if max_drawdown else np.nan,
+            'win_rate': win_rate,
+            'best': self.best,
+            'worst': self.worst,
+            'payoff_ratio': payoff,
+            'profit_factor': self.win_sum / abs(self.loss_sum) if self.loss_sum else np.inf,
+            'avg_win': avg_win,
+            'avg_loss': avg_loss,
+            'current_drawdown': np.expm1(self.log_equity - self.peak_log),
+            'equity': np.exp(self.log_equity),
+            'win_streak': self.max_win_streak,
+            'loss_streak': self.max_loss_streak,
+            'current_streak': self.streak_sign * self.streak_length,
+            'observations': n,
+            'last_date': self.last_date,
+        }
@@ -0,0 +1,209 @@
+"""Concurrent-session load test for the dashboard
+
+Drives main.py headlessly through Streamlit's app-testing API. Every
+simulated analyst gets its own AppTest session, all inside this process,
+so module-level state such as the shared data cache behaves as it would
+on a single server. Yahoo Finance is replaced by a local synthetic price
+source so runs are repeatable and need no network.
+
+    python loadtest.py --sessions 20 --rows 50000 --preset completo
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+
+def synthetic_upload(rows, seed=0, freq='B'):
+    """CSV bytes with a date column and a daily returns column"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2000-01-03', periods=rows, freq=freq)
+    df = pd.DataFrame({
+        'Date': index.strftime('%Y-%m-%d %H:%M:%S'),
+        'Returns': rng.normal(0.0004, 0.01, rows),
+    })
+    return df.to_csv(index=False).encode()
+
+
+def local_benchmark_download(tickers, start=None, end=None, **kwargs):
+    """Stand-in for yf.download returning deterministic synthetic prices"""
+    ticker = tickers if isinstance(tickers, str) else tickers[0]
+    index = pd.bdate_range(start, end)
+    rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+    close = 100 * np.cumprod(1 + rng.normal(0.0003, 0.012, len(index)))
+    return pd.DataFrame({'Close': close}, index=index)
+
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class MemorySampler(threading.Thread):
+    """Background RSS sampler"""
+
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.samples.append((time.perf_counter(), current_rss()))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.samples.append((time.perf_counter(), current_rss()))
+
+
+def find_widget(widgets, label):
+    """First widget whose label contains ``label``"""
+    for widget in widgets:
+        if label in widget.label:
+            return widget
+    raise LookupError(f"Widget not found: {label}")
+
+
+def run_session(session_id, upload, args, start_barrier, results):
+    """One simulated analyst: upload, configure, then rerun repeatedly"""
+    latencies = []
+    errors = []
+    try:
+        at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+        at.run()
+        start_barrier.wait()
+
+        at.sidebar.get('file_uploader')[0].upload('estrategia.csv', upload, 'text/csv')
+        steps = [lambda: None]
+        if args.benchmark == 'none':
+            steps.append(lambda: at.sidebar.radio[0].set_value("Ninguno"))
+        else:
+            steps.append(lambda: find_widget(at.sidebar.selectbox, "Selecciona Benchmark").set_value(args.benchmark))
+        preset = "Completo" if args.preset == 'completo' else "Esencial"
+        steps.append(lambda: find_widget(at.sidebar.button, preset).click())
+
+        # Initial load, benchmark and preset, followed by rf nudges as an
+        # analyst would do while exploring
+        rf_values = [4.5 + 0.1 * (i + 1) for i in range(args.reruns)]
+        steps += [lambda rf=rf: find_widget(at.sidebar.number_input, "Tasa Libre").set_value(rf)
+                  for rf in rf_values]
+
+        for step in steps:
+            step()
+            started = time.perf_counter()
+            at.run()
+            latencies.append(time.perf_counter() - started)
+            errors += [e.value for e in at.exception] + [e.value for e in at.error]
+    except Exception as e:
+        # Never leave the other sessions waiting for one that failed to start
+        start_barrier.abort()
+        errors.append(f"{type(e).__name__}: {e}")
+    results[session_id] = {'latencies': latencies, 'errors': errors}
+
+
+def summarize(results, wall_time, memory):
+    latencies = np.array([t for r in results.values() for t in r['latencies']])
+    rss = np.array([m for _, m in memory]) / 1024 ** 2
+    summary = {
+        'sessions': len(results),
+        'reruns': int(len(latencies)),
+        'wall_time_s': wall_time,
+        'throughput_reruns_per_s': len(latencies) / wall_time if wall_time else 0.0,
+        'errors': sum(len(r['errors']) for r in results.values()),
+        'rss_start_mb': float(rss[0]) if len(rss) else None,
+        'rss_peak_mb': float(rss.max()) if len(rss) else None,
+        'rss_end_mb': float(rss[-1]) if len(rss) else None,
+    }
+    if len(latencies):
+        for p in (50, 90, 95, 99):
+            summary[f'latency_p{p}_s'] = float(np.percentile(latencies, p))
+        summary['latency_mean_s'] = float(latencies.mean())
+        summary['latency_max_s'] = float(latencies.max())
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sessions', type=int, default=20, help="concurrent analysts")
+    parser.add_argument('--reruns', type=int, default=5, help="rf nudges per session after loading")
+    parser.add_argument('--rows', type=int, default=5000, help="rows in each synthetic upload")
+    parser.add_argument('--freq', default='B', help="pandas frequency of the synthetic upload (B, h, min...)")
+    parser.add_argument('--preset', choices=['completo', 'esencial'], default='completo')
+    parser.add_argument('--benchmark', default='SPY', help="ticker served by the local stand-in, or 'none'")
+    parser.add_argument('--shared-upload', action='store_true',
+                        help="all sessions upload the same file (exercises the shared cache)")
+    parser.add_argument('--timeout', type=float, default=600, help="per-rerun timeout in seconds")
+    parser.add_argument('--output', help="write the summary and raw latencies as JSON")
+    args = parser.parse_args(argv)
+
+    yf.download = local_benchmark_download
+
+    uploads = [synthetic_upload(args.rows, seed=0 if args.shared_upload else i, freq=args.freq)
+               for i in range(args.sessions)]
+    results = {}
+    barrier = threading.Barrier(args.sessions + 1)
+    threads = [
+        threading.Thread(target=run_session, args=(i, uploads[i], args, barrier, results))
+        for i in range(args.sessions)
+    ]
+
+    sampler = MemorySampler()
+    sampler.start()
+    for thread in threads:
+        thread.start()
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+    sampler.stop()
+
+    summary = summarize(results, wall_time, sampler.samples)
+    width = max(len(k) for k in summary)
+    for key, value in summary.items():
+        print(f"{key:<{width}}  {value:.3f}" if isinstance(value, float) else f"{key:<{width}}  {value}")
+    for session_id, result in sorted(results.items()):
+        for error in result['errors'][:3]:
+            print(f"session {session_id}: {error}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'config': vars(args),
+                'summary': summary,
+                'latencies': {str(k): v['latencies'] for k, v in results.items()},
+                'memory': sampler.samples,
+            }, f, indent=2)
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,6 +10,25 @@ import yfinance as yf
 import tempfile
 import os
 
+from bootstrap import bootstrap_ci
+from rolling_metrics import rolling_metrics, calendar_metrics, stability_summary
+from data_cache import shared_cache, content_key
+from calendar_returns import calendar_returns
+from analytics import parse_returns, parse_return_frame, fetch_benchmark, request_benchmark, wait_for_benchmark, strategy_metrics, benchmark_metrics, drawdown_episodes
+from portfolio import build_portfolio, REBALANCE_METHODS
+from sensitivity import sensitivity_grid, SENSITIVITY_METRICS
+from regression import ols, rolling_regression
+from risk import var_table, rolling_var, var_backtest, VAR_METHODS, VAR_LEVELS
+from scenarios import stress_test, SCENARIO_START, SOURCE_HISTORY, SOURCE_PROJECTED, SOURCE_MIXED, SOURCE_NONE
+from library import StrategyLibrary, LibraryError
+from trades import parse_trades, trades_to_returns, trade_stats, TRADE_FREQS
+from live import ReturnsTail, OnlineMetrics, LivePathError, resolve_live_path, LIVE_ROOT
+from snapshot import save_snapshot, load_snapshot, SnapshotError, SNAPSHOT_EXTENSION
+from upload_schema import detect_schema, detect_scale, detect_dayfirst, detect_trade_columns, read_columns, DELIMITERS
+import charts
+import kernels
+from charts import MONTH_LABELS
+
 # Matplotlib configuration
 import matplotlib
 matplotlib.use('Agg')
@@ -33,6 +52,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Optional HTTP analytics service inside the Streamlit process, sharing its caches
+if os.environ.get('BQUANT_SERVICE_PORT'):
+    from service import ensure_server
+    try:
+        ensure_server(port=int(os.environ['BQUANT_SERVICE_PORT']))
+    except OSError as e:
+        st.warning(f"⚠️ No se pudo iniciar el servicio de analítica: {e}")
+
+# Return series stored on the server, appended by the batch tooling (library.py)
+strategy_library = StrategyLibrary()
+
 # Custom CSS
 st.markdown("""
     <style>
@@ -176,6 +206,8 @@ if 'preferences' not in st.session_state:
     st.session_state.preferences = {
         'show_insights': True,
         'show_benchmark_comparison': True,
+        'show_confidence_intervals': False,
+        'chart_backend': 'plotly',
         'metrics': {
             'basic': True,
             'risk': True,
@@ -197,7 +229,11 @@ if 'preferences' not in st.session_state:
         'advanced': {
             'monte_carlo': False,
             'time_analysis': True,
-            'statistical_edge': True
+            'statistical_edge': True,
+            'stability': False,
+            'sensitivity': False,
+            'stress_test': False,
+            'factor_regression': False
         }
     }
 
@@ -231,40 +267,382 @@ def get_insight(metric_name, value):
             return f"<div class='warning-box'><b>⚠️ Insight:</b> {thresholds['bad'][1]}</div>"
     return ""
 
-def calculate_beta(returns, benchmark):
-    """Calculate beta manually"""
-    common_dates = returns.index.intersection(benchmark.index)
-    if len(common_dates) == 0:
-        return 0
-    
-    aligned_returns = returns.loc[common_dates]
-    aligned_benchmark = benchmark.loc[common_dates]
+def restore_snapshot(snapshot_file):
+    """Saved analysis bundle; its preferences and settings are applied once per bundle"""
+    if snapshot_file is None:
+        st.session_state.pop('snapshot', None)
+        return None
+    key = content_key(snapshot_file.getvalue())
+    restored = st.session_state.get('snapshot')
+    if restored is not None and restored[0] == key:
+        return restored[1]
     
-    covariance = np.cov(aligned_returns, aligned_benchmark)[0][1]
-    benchmark_variance = np.var(aligned_benchmark)
-    
-    if benchmark_variance == 0:
-        return 0
-    
-    return covariance / benchmark_variance
+    snapshot = load_snapshot(snapshot_file.getvalue())
+    for name, value in (snapshot['preferences'] or {}).items():
+        if isinstance(value, dict) and isinstance(st.session_state.preferences.get(name), dict):
+            st.session_state.preferences[name].update(value)
+        else:
+            st.session_state.preferences[name] = value
+    settings = snapshot['settings']
+    if 'rf' in settings:
+        st.session_state['rf_rate_pct'] = settings['rf'] * 100
+    if 'periods' in settings:
+        st.session_state['periods_per_year'] = settings['periods']
+    if 'bootstrap_method' in settings:
+        st.session_state['bootstrap_method'] = settings['bootstrap_method']
+    if snapshot['monte_carlo'] is not None:
+        st.session_state['monte_carlo'] = snapshot['monte_carlo']
+    st.session_state['snapshot'] = (key, snapshot)
+    return snapshot
 
-def calculate_alpha(returns, benchmark, rf=0, periods=252):
-    """Calculate alpha manually"""
-    common_dates = returns.index.intersection(benchmark.index)
-    if len(common_dates) == 0:
-        return 0
-    
-    aligned_returns = returns.loc[common_dates]
-    aligned_benchmark = benchmark.loc[common_dates]
-    
-    beta = calculate_beta(aligned_returns, aligned_benchmark)
-    
-    strategy_return = (1 + aligned_returns).prod() ** (periods / len(aligned_returns)) - 1
-    benchmark_return = (1 + aligned_benchmark).prod() ** (periods / len(aligned_benchmark)) - 1
+def series_key(series):
+    """Content key of a return series, to tie stored results to the data they came from"""
+    return content_key(series.to_numpy(dtype=float).tobytes() + series.index.as_unit('ns').asi8.tobytes())
+
+LIVE_TAIL_POINTS = 500
+
+def live_state(path, rf, periods):
+    """Tail reader, online metrics and received periods of the followed path, kept across reruns"""
+    key = (os.path.abspath(path), rf, periods)
+    state = st.session_state.get('live')
+    if state is None or state['key'] != key:
+        state = {
+            'key': key,
+            'tail': ReturnsTail(path, root=LIVE_ROOT),
+            'online': OnlineMetrics(rf, periods),
+            'chunks': [],
+            'path': pd.DataFrame({'cumulative': [], 'drawdown': []}, index=pd.DatetimeIndex([]), dtype=float),
+            'analyzed': 0,
+        }
+        st.session_state['live'] = state
+    return state
+
+def poll_live(state):
+    """Fold the periods added since the last poll into the live state; returns how many"""
+    new = state['tail'].poll()
+    if len(new):
+        path = state['online'].update(new)
+        state['chunks'].append(new)
+        state['path'] = pd.concat([state['path'], path]).iloc[-LIVE_TAIL_POINTS:]
+    return len(new)
+
+def live_panel(state):
+    """Live headline metrics and the newest stretch of the equity curve"""
+    added = poll_live(state)
+    m = state['online'].metrics()
+    if m['observations'] == 0:
+        st.info("⏳ Esperando datos en la ruta seguida...")
+        return
+
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
+    with col1:
+        st.metric("Observaciones", f"{m['observations']}", delta=f"+{added}" if added else None)
+    with col2:
+        st.metric("Retorno Total", f"{m['total_return']*100:.2f}%")
+    with col3:
+        st.metric("Ratio Sharpe", f"{m['sharpe']:.2f}")
+    with col4:
+        st.metric("Drawdown Actual", f"{m['current_drawdown']*100:.2f}%")
+    with col5:
+        st.metric("DD Máximo", f"{m['max_drawdown']*100:.2f}%")
+    with col6:
+        streak = m['current_streak']
+        st.metric("Racha Actual", f"{abs(streak)} {'ganadora' if streak > 0 else 'perdedora' if streak < 0 else '-'}")
+
+    tail = state['path'].rename(columns={'cumulative': 'Retorno Acumulado', 'drawdown': 'Drawdown'})
+    render_chart(
+        lambda: charts.factor_lines_figure(tail, f'Últimas {len(tail)} Observaciones', 'Retorno (%)', percent=True),
+        lambda: plot_factor_lines(tail * 100, f'Últimas {len(tail)} Observaciones', 'Retorno (%)'),
+        key='live_tail'
+    )
+
+    pending = m['observations'] - state['analyzed']
+    last_date = m['last_date']
+    last_label = f"{last_date:%Y-%m-%d}" if last_date == last_date.normalize() else f"{last_date:%Y-%m-%d %H:%M}"
+    st.caption(f"🕒 Último dato: {last_label} • comprobado a las {datetime.now():%H:%M:%S}")
+    if pending > 0:
+        st.caption(f"ℹ️ {pending} observaciones nuevas aún no incluidas en el análisis completo")
+        if st.button("🔄 Recalcular Análisis Completo", key='live_rerun'):
+            st.rerun()
+
+DELIMITER_LABELS = {',': "Coma (,)", ';': "Punto y coma (;)", '\t': "Tabulador", '|': "Barra (|)"}
+
+def format_key(upload_key, schema):
+    """Upload content key plus the reader settings every parse of it depends on"""
+    return (upload_key, schema['delimiter'], schema['decimal'])
+
+def load_columns(uploaded_file, upload_key, schema, columns):
+    """Chosen columns of the upload, parsed once per file and column set for the whole server"""
+    key = ('upload',) + format_key(upload_key, schema) + (tuple(columns),)
+    return shared_cache.get_or_load(key, lambda: read_columns(uploaded_file.getvalue(), schema, columns))
+
+def select_format(container, uploaded_file, key_prefix):
+    """Detected file format, with delimiter and decimal overrides for text files"""
+    data = uploaded_file.getvalue()
+    schema = detect_schema(data, uploaded_file.name)
+    if schema['excel']:
+        return schema
+    with container:
+        col1, col2 = st.columns(2)
+        with col1:
+            delimiter = st.selectbox(
+                "Separador de Columnas", DELIMITERS,
+                index=DELIMITERS.index(schema['delimiter']) if schema['delimiter'] in DELIMITERS else 0,
+                format_func=lambda d: DELIMITER_LABELS[d], key=f"{key_prefix}_delimiter"
+            )
+        with col2:
+            decimal = st.selectbox(
+                "Separador Decimal", ['.', ','], index=['.', ','].index(schema['decimal']),
+                format_func=lambda d: "Punto (0.01)" if d == '.' else "Coma (0,01)", key=f"{key_prefix}_decimal"
+            )
+    if (delimiter, decimal) != (schema['delimiter'], schema['decimal']):
+        schema = detect_schema(data, uploaded_file.name, delimiter=delimiter, decimal=decimal)
+    return schema
+
+def select_scale(container, schema, date_col, returns_col, key_prefix):
+    """Percent scale and date order for the chosen columns, detected from the sample"""
+    sample = schema['sample']
+    detected_scale = detect_scale(sample[returns_col]) if returns_col in schema['numeric_columns'] else 1
+    with container:
+        col1, col2 = st.columns(2)
+        with col1:
+            scale = st.selectbox(
+                "Escala de Retornos", [1, 100], index=[1, 100].index(detected_scale),
+                format_func=lambda s: "Decimal (0.01 = 1%)" if s == 1 else "Porcentaje (1.0 = 1%)",
+                key=f"{key_prefix}_scale_{returns_col}"
+            )
+        with col2:
+            dayfirst = st.checkbox(
+                "Fechas con día primero (DD/MM/AAAA)", value=detect_dayfirst(sample[date_col]),
+                key=f"{key_prefix}_dayfirst_{date_col}"
+            )
+    return scale, dayfirst
+
+def load_portfolio(load_assets, file_key, date_col, assets, weights, rebalance, threshold, dayfirst=False, scales=None):
+    """Portfolio returns and drifted weights, built once per configuration for the whole server"""
+    scales = tuple((scales or {}).get(c, 1) for c in assets)
+    key = ('portfolio',) + file_key + (date_col, tuple(assets), scales, tuple(weights), rebalance, threshold, dayfirst)
+    returns = shared_cache.get(key)
+    drifted = shared_cache.get(key + ('weights',))
+    turnover = shared_cache.get(key + ('turnover',))
+    if returns is None or drifted is None or turnover is None:
+        asset_returns = shared_cache.get_or_load(
+            ('returns',) + file_key + (date_col, tuple(assets), scales, dayfirst),
+            lambda: parse_return_frame(load_assets(), date_col, assets, dayfirst=dayfirst, scales=dict(zip(assets, scales)))
+        )
+        portfolio = build_portfolio(asset_returns, weights, rebalance=rebalance, threshold=threshold)
+        returns = shared_cache.put(key, portfolio['returns'])
+        drifted = shared_cache.put(key + ('weights',), portfolio['weights'])
+        turnover = shared_cache.put(key + ('turnover',), portfolio['turnover'])
+    return returns, drifted, turnover
+
+REBALANCE_LABELS = {
+    'daily': 'Diario',
+    'weekly': 'Semanal',
+    'monthly': 'Mensual',
+    'quarterly': 'Trimestral',
+    'yearly': 'Anual',
+    'threshold': 'Por Umbral de Desviación',
+    'none': 'Sin Rebalanceo (Buy & Hold)'
+}
+
+def format_ci(ci, metric, pct=False):
+    """Format a bootstrap confidence interval as a metric caption"""
+    lower, upper = ci.loc[metric, 'lower'], ci.loc[metric, 'upper']
+    if pct:
+        return f"IC 95%: {lower*100:.2f}% a {upper*100:.2f}%"
+    return f"IC 95%: {lower:.2f} a {upper:.2f}"
+
+TRADE_FREQ_LABELS = {
+    'B': 'Diaria (días hábiles)',
+    'D': 'Diaria (calendario)',
+    'h': 'Horaria',
+    '30min': '30 minutos',
+    '15min': '15 minutos',
+    '5min': '5 minutos'
+}
+
+def format_duration(delta):
+    """Compact holding time such as '2d 4h', '3h 15m' or '45m'"""
+    if pd.isna(delta):
+        return "-"
+    minutes = int(delta.total_seconds() // 60)
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    return f"{minutes}m"
+
+WEEKDAY_LABELS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+def render_chart(plotly_builder, *matplotlib_builders, key=None):
+    """Draw a chart in the browser with Plotly, falling back to matplotlib images"""
+    builders = list(matplotlib_builders)
+    if st.session_state.preferences['chart_backend'] == 'plotly':
+        builders.insert(0, plotly_builder)
+    for position, builder in enumerate(builders):
+        try:
+            fig = builder()
+        except Exception:
+            if position == len(builders) - 1:
+                raise
+            continue
+        if isinstance(fig, go.Figure):
+            st.plotly_chart(fig, use_container_width=True, key=key)
+        else:
+            st.pyplot(fig, clear_figure=True)
+            plt.close('all')
+        return
+
+def plot_cumulative_returns(returns, benchmark=None, bench_name="Benchmark", figsize=(14, 6)):
+    """Cumulative returns without quantstats styling"""
+    cum_returns = (1 + returns).cumprod()
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.plot(cum_returns.index, cum_returns.values, linewidth=2, color='#00d4ff', label='Estrategia')
+    if benchmark is not None:
+        cum_bench = (1 + benchmark).cumprod()
+        ax.plot(cum_bench.index, cum_bench.values, linewidth=2, color='#ff9900', label=bench_name, alpha=0.7)
+    ax.set_title('Retornos Acumulados', fontsize=14, color='white')
+    ax.set_xlabel('Fecha', fontsize=12, color='white')
+    ax.set_ylabel('Valor', fontsize=12, color='white')
+    ax.legend()
+    ax.grid(True, alpha=0.2)
+    ax.set_facecolor('#0f1419')
+    fig.patch.set_facecolor('#0f1419')
+    ax.tick_params(colors='white')
+    plt.tight_layout()
+    return fig
+
+def plot_rolling_beta(rolling_beta, figsize=(10, 6)):
+    """Rolling beta against the beta = 1 reference"""
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.plot(rolling_beta.index, rolling_beta.values, linewidth=2, color='#00d4ff')
+    ax.axhline(y=1, color='#ff9900', linestyle='--', alpha=0.5, label='Beta = 1')
+    ax.set_title('Rolling Beta', fontsize=14, color='white')
+    ax.set_xlabel('Fecha', fontsize=12, color='white')
+    ax.set_ylabel('Beta', fontsize=12, color='white')
+    ax.grid(True, alpha=0.2)
+    ax.legend()
+    ax.set_facecolor('#0f1419')
+    fig.patch.set_facecolor('#0f1419')
+    ax.tick_params(colors='white')
+    plt.tight_layout()
+    return fig
+
+def plot_factor_lines(frame, title, ylabel, figsize=(14, 6)):
+    """One line per column, e.g. rolling factor betas"""
+    fig, ax = plt.subplots(figsize=figsize)
+    for i, column in enumerate(frame.columns):
+        ax.plot(frame.index, frame[column].values, linewidth=2, color=charts.FACTOR_COLORS[i % len(charts.FACTOR_COLORS)], label=str(column))
+    ax.set_title(title, fontsize=14, color='white')
+    ax.set_xlabel('Fecha', fontsize=12, color='white')
+    ax.set_ylabel(ylabel, fontsize=12, color='white')
+    ax.grid(True, alpha=0.2)
+    ax.legend()
+    ax.set_facecolor('#0f1419')
+    fig.patch.set_facecolor('#0f1419')
+    ax.tick_params(colors='white')
+    plt.tight_layout()
+    return fig
+
+def plot_var_backtest(returns, forecast, breach_dates, title, figsize=(14, 6)):
+    """Returns against the VaR forecast with breaches marked"""
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.plot(returns.index, returns.values * 100, linewidth=0.8, color='#00d4ff', label='Retorno')
+    ax.plot(forecast.index, forecast.values * 100, linewidth=2, color='#ff9900', label='VaR')
+    breaches = returns.loc[breach_dates]
+    ax.scatter(breaches.index, breaches.values * 100, color='#ff4d6d', s=12, zorder=3, label='Excesos')
+    ax.set_title(title, fontsize=14, color='white')
+    ax.set_xlabel('Fecha', fontsize=12, color='white')
+    ax.set_ylabel('Retorno (%)', fontsize=12, color='white')
+    ax.grid(True, alpha=0.2)
+    ax.legend()
+    ax.set_facecolor('#0f1419')
+    fig.patch.set_facecolor('#0f1419')
+    ax.tick_params(colors='white')
+    plt.tight_layout()
+    return fig
+
+def plot_monthly_heatmap(monthly_table, figsize=(10, 7)):
+    """Monthly returns heatmap from the calendar aggregation"""
+    values = monthly_table.values * 100
+    limit = np.nanmax(np.abs(values)) if np.isfinite(values).any() else 1
     
-    alpha = strategy_return - (rf + beta * (benchmark_return - rf))
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.imshow(values, cmap='RdYlGn', vmin=-limit, vmax=limit, aspect='auto')
+    for (row, col), value in np.ndenumerate(values):
+        if np.isfinite(value):
+            ax.text(col, row, f"{value:.1f}", ha='center', va='center', fontsize=8, color='black')
+    ax.set_xticks(range(12))
+    ax.set_xticklabels(MONTH_LABELS)
+    ax.set_yticks(range(len(monthly_table.index)))
+    ax.set_yticklabels(monthly_table.index)
+    ax.set_title('Retornos Mensuales (%)', fontsize=14, color='white')
+    ax.set_facecolor('#0f1419')
+    fig.patch.set_facecolor('#0f1419')
+    ax.tick_params(colors='white')
+    plt.tight_layout()
+    return fig
+
+def plot_yearly_returns(yearly, bench_yearly=None, bench_name="Benchmark", figsize=(10, 6)):
+    """Yearly compounded returns, side by side with the benchmark if given"""
+    years = yearly.index
+    if bench_yearly is not None:
+        years = years.union(bench_yearly.index)
+    positions = np.arange(len(years))
+    width = 0.4 if bench_yearly is not None else 0.8
     
-    return alpha
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.bar(positions, yearly.reindex(years).values * 100, width=width, color='#00d4ff', label='Estrategia')
+    if bench_yearly is not None:
+        ax.bar(positions + width, bench_yearly.reindex(years).values * 100, width=width,
+               color='#ff9900', alpha=0.7, label=bench_name)
+        ax.set_xticks(positions + width / 2)
+    else:
+        ax.set_xticks(positions)
+    ax.set_xticklabels(years, rotation=45)
+    ax.axhline(y=0, color='white', linewidth=0.8, alpha=0.5)
+    ax.set_title('Retornos Anuales', fontsize=14, color='white')
+    ax.set_ylabel('Retorno (%)', fontsize=12, color='white')
+    ax.legend()
+    ax.grid(True, alpha=0.2, axis='y')
+    ax.set_facecolor('#0f1419')
+    fig.patch.set_facecolor('#0f1419')
+    ax.tick_params(colors='white')
+    plt.tight_layout()
+    return fig
+
+SENSITIVITY_LABELS = {
+    'sharpe': 'Sharpe',
+    'sortino': 'Sortino',
+    'cagr_excess': 'CAGR - Tasa Libre',
+    'alpha': 'Alpha (Anual)'
+}
+
+VAR_METHOD_LABELS = {
+    'historical': 'Histórico',
+    'parametric': 'Paramétrico (Normal)',
+    'cornish_fisher': 'Cornish-Fisher'
+}
+
+BENCHMARK_TICKERS = ["SPY", "QQQ", "IWM", "EFA", "AGG", "GLD", "^GSPC", "^IXIC", "BTC-USD", "ETH-USD"]
+
+SOURCE_LABELS = {
+    SOURCE_HISTORY: 'Histórico',
+    SOURCE_PROJECTED: 'Proyectado (β)',
+    SOURCE_MIXED: 'Mixto',
+    SOURCE_NONE: 'Sin datos'
+}
+
+WINDOW_METRIC_LABELS = {
+    'sharpe': 'Sharpe',
+    'volatility': 'Volatilidad',
+    'max_drawdown': 'Drawdown Máx.',
+    'win_rate': 'Tasa de Acierto',
+    'cagr': 'CAGR'
+}
 
 # Title
 st.markdown("<h1 style='text-align: center; margin-bottom: 0; font-size: 48px;'>📊 BQuantStats Pro Analytics</h1>", unsafe_allow_html=True)
@@ -280,50 +658,101 @@ with st.sidebar:
         help="Se requieren columnas de fecha y retornos"
     )
     
-    if uploaded_file:
+    snapshot_file = st.file_uploader(
+        "O Restaura un Análisis Guardado",
+        type=[SNAPSHOT_EXTENSION],
+        help="Archivo .bqs exportado desde 'Guardar Análisis'; no requiere volver a subir ni descargar datos"
+    )
+    snapshot = None
+    if snapshot_file:
+        try:
+            snapshot = restore_snapshot(snapshot_file)
+        except SnapshotError as e:
+            st.error(f"❌ No se pudo restaurar el análisis: {e}")
+    else:
+        restore_snapshot(None)
+    
+    library_name = None
+    library_entries = strategy_library.list()
+    if len(library_entries):
+        library_name = st.selectbox(
+            "O Abre una Estrategia de la Biblioteca",
+            [None] + library_entries['name'].tolist(),
+            format_func=lambda name: "— Ninguna —" if name is None else name,
+            help="Series guardadas en el servidor; se abren sin subir ni copiar el archivo"
+        )
+        if library_name is not None and uploaded_file is not None:
+            st.caption("ℹ️ Se analiza el archivo subido; quítalo para usar la biblioteca")
+    
+    live_path = None
+    with st.expander("🔴 Modo en Vivo", expanded=False):
+        if LIVE_ROOT is None:
+            st.caption("ℹ️ Desactivado: el servidor no tiene configurada BQUANT_LIVE_DIR")
+        else:
+            live_input = st.text_input(
+                "Archivo o Carpeta",
+                key='live_path',
+                help=f"Ruta relativa a {LIVE_ROOT}: CSV que va creciendo con nuevas filas, o carpeta donde se depositan archivos nuevos"
+            ).strip()
+            live_interval = st.number_input("Actualizar cada (segundos)", min_value=2, max_value=3600, value=10, key='live_interval')
+            if live_input:
+                try:
+                    live_path = resolve_live_path(live_input)
+                except LivePathError:
+                    st.error("❌ La ruta no existe dentro del directorio en vivo del servidor")
+            if live_path is not None and (uploaded_file is not None or library_name is not None):
+                st.caption("ℹ️ Se analiza el archivo subido o la biblioteca; quítalos para seguir la ruta")
+    
+    if uploaded_file or snapshot or library_name or live_path:
         st.markdown("---")
         st.markdown("### 🎯 Configuración de Benchmark")
         
-        benchmark_type = st.radio(
-            "Tipo de Benchmark",
-            ["Predefinido (yfinance)", "CSV Personalizado", "Ninguno"],
-            index=0
-        )
+        if snapshot is not None:
+            bench_label = snapshot['bench_name'] if snapshot['benchmark'] is not None else "Ninguno"
+            st.info(f"📦 Benchmark restaurado del análisis guardado: **{bench_label}**")
+        else:
+            benchmark_type = st.radio(
+                "Tipo de Benchmark",
+                ["Predefinido (yfinance)", "CSV Personalizado", "Ninguno"],
+                index=0
+            )
         
-        benchmark_option = None
-        benchmark_file = None
+            benchmark_option = None
+            benchmark_file = None
         
-        if benchmark_type == "Predefinido (yfinance)":
-            benchmark_option = st.selectbox(
-                "Selecciona Benchmark",
-                ["SPY", "QQQ", "IWM", "EFA", "AGG", "GLD", "^GSPC", "^IXIC", "BTC-USD", "ETH-USD"],
-                index=0,
-                help="Datos descargados automáticamente de Yahoo Finance"
-            )
+            if benchmark_type == "Predefinido (yfinance)":
+                benchmark_option = st.selectbox(
+                    "Selecciona Benchmark",
+                    BENCHMARK_TICKERS,
+                    index=0,
+                    help="Datos descargados automáticamente de Yahoo Finance"
+                )
             
-            st.info(f"📊 Se descargará: **{benchmark_option}** (ajustado al rango de tu estrategia)")
+                st.info(f"📊 Se descargará: **{benchmark_option}** (ajustado al rango de tu estrategia)")
         
-        elif benchmark_type == "CSV Personalizado":
-            benchmark_file = st.file_uploader(
-                "Sube Benchmark CSV",
-                type=['csv', 'xlsx'],
-                help="Archivo con columnas de fecha y retornos del benchmark"
-            )
+            elif benchmark_type == "CSV Personalizado":
+                benchmark_file = st.file_uploader(
+                    "Sube Benchmark CSV",
+                    type=['csv', 'xlsx'],
+                    help="Archivo con columnas de fecha y retornos del benchmark"
+                )
         
-        else:
-            st.info("ℹ️ Análisis sin benchmark. Solo métricas de la estrategia.")
+            else:
+                st.info("ℹ️ Análisis sin benchmark. Solo métricas de la estrategia.")
         
         st.markdown("---")
         
+        st.session_state.setdefault('rf_rate_pct', 4.5)
         rf_rate = st.number_input(
             "Tasa Libre de Riesgo (%)",
             min_value=0.0,
             max_value=10.0,
-            value=4.5,
-            step=0.1
+            step=0.1,
+            key='rf_rate_pct'
         ) / 100
         
-        periods_per_year = st.selectbox("Períodos/Año", [252, 365, 12, 52, 1], index=0)
+        st.session_state.setdefault('periods_per_year', 252)
+        periods_per_year = st.selectbox("Períodos/Año", [252, 365, 12, 52, 1], key='periods_per_year')
         
         st.markdown("---")
         st.markdown("### 🎨 Personalizar Visualización")
@@ -347,6 +776,13 @@ with st.sidebar:
             )
         
         with st.expander("📈 Gráficos a Mostrar", expanded=False):
+            st.session_state.preferences['chart_backend'] = st.selectbox(
+                "Motor de Gráficos",
+                ['plotly', 'matplotlib'],
+                index=['plotly', 'matplotlib'].index(st.session_state.preferences['chart_backend']),
+                format_func=lambda b: {'plotly': "Interactivo (Plotly)", 'matplotlib': "Estático (Matplotlib)"}[b],
+                help="Plotly dibuja en el navegador; Matplotlib genera imágenes en el servidor"
+            )
             st.session_state.preferences['charts']['cumulative_returns'] = st.checkbox(
                 "Retornos Acumulados", 
                 value=st.session_state.preferences['charts']['cumulative_returns']
@@ -397,6 +833,20 @@ with st.sidebar:
                 "Comparación con Benchmark", 
                 value=st.session_state.preferences['show_benchmark_comparison']
             )
+            st.session_state.preferences['show_confidence_intervals'] = st.checkbox(
+                "Intervalos de Confianza (Bootstrap)", 
+                value=st.session_state.preferences['show_confidence_intervals'],
+                help="10.000 réplicas bootstrap de Sharpe, Sortino, CAGR, Drawdown Máximo y Calmar"
+            )
+            bootstrap_method = 'iid'
+            if st.session_state.preferences['show_confidence_intervals']:
+                bootstrap_method = st.selectbox(
+                    "Método Bootstrap",
+                    ['iid', 'stationary'],
+                    format_func=lambda m: {'iid': "i.i.d.", 'stationary': "Bloques Estacionarios"}[m],
+                    help="Los bloques estacionarios conservan la autocorrelación de los retornos",
+                    key='bootstrap_method'
+                )
             st.session_state.preferences['advanced']['statistical_edge'] = st.checkbox(
                 "Análisis de Ventaja Estadística", 
                 value=st.session_state.preferences['advanced']['statistical_edge']
@@ -405,6 +855,22 @@ with st.sidebar:
                 "Análisis Temporal", 
                 value=st.session_state.preferences['advanced']['time_analysis']
             )
+            st.session_state.preferences['advanced']['stability'] = st.checkbox(
+                "Estabilidad de Métricas", 
+                value=st.session_state.preferences['advanced']['stability']
+            )
+            st.session_state.preferences['advanced']['sensitivity'] = st.checkbox(
+                "Sensibilidad a Tasa Libre y Períodos", 
+                value=st.session_state.preferences['advanced']['sensitivity']
+            )
+            st.session_state.preferences['advanced']['stress_test'] = st.checkbox(
+                "Escenarios de Estrés Históricos", 
+                value=st.session_state.preferences['advanced']['stress_test']
+            )
+            st.session_state.preferences['advanced']['factor_regression'] = st.checkbox(
+                "Regresión Multifactor", 
+                value=st.session_state.preferences['advanced']['factor_regression']
+            )
             st.session_state.preferences['advanced']['monte_carlo'] = st.checkbox(
                 "Simulación Monte Carlo", 
                 value=st.session_state.preferences['advanced']['monte_carlo']
@@ -429,7 +895,7 @@ with st.sidebar:
     st.markdown("<p style='color: #666; font-size: 11px; text-align: center;'>v2.0 Professional Edition</p>", unsafe_allow_html=True)
 
 # Main content
-if uploaded_file is None:
+if uploaded_file is None and snapshot is None and library_name is None and live_path is None:
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         st.markdown("""
@@ -522,150 +988,312 @@ if uploaded_file is None:
         """, unsafe_allow_html=True)
 else:
     try:
-        # Read file
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith('.xlsx'):
-            df = pd.read_excel(uploaded_file)
+        sample_df = None
+        trades = None
+        benchmark_request = None
+        if snapshot is not None:
+            returns = snapshot['returns']
+            benchmark = snapshot['benchmark']
+            bench_name = snapshot['bench_name'] or "Benchmark"
+            manifest = snapshot['manifest']
+            source_name = manifest.get('source')
+            st.success(f"📦 Análisis restaurado: {manifest.get('source') or 'sin nombre'} • "
+                       f"{len(returns)} observaciones • guardado el {manifest['created'].replace('T', ' ')}")
         else:
-            df = pd.read_csv(uploaded_file, sep='\t')
+            if uploaded_file is None and library_name is None:
+                # The panel polls the path on its own timer and updates its
+                # metrics online; the rest of the page is recomputed only on
+                # a full rerun, from every period received so far
+                live = live_state(live_path, rf_rate, periods_per_year)
+                poll_live(live)
+                if live['chunks']:
+                    live['chunks'] = [pd.concat(live['chunks'])]
+                    live['analyzed'] = len(live['chunks'][0])
+                st.markdown("<div class='section-header'><h3 style='margin:0;'>🔴 En Vivo</h3></div>", unsafe_allow_html=True)
+                st.fragment(run_every=live_interval)(live_panel)(live)
+                if not live['analyzed']:
+                    st.stop()
+                returns = live['chunks'][0]
+                source_name = os.path.basename(os.path.normpath(live_path))
+            elif uploaded_file is None:
+                # Library series are memory-mapped, so every session reads the same pages
+                try:
+                    returns = strategy_library.load(library_name)
+                    library_meta = strategy_library.metadata(library_name)
+                except LibraryError as e:
+                    st.error(f"❌ No se pudo abrir la estrategia: {e}")
+                    st.stop()
+                source_name = library_name
+                st.success(f"📚 Biblioteca: {library_name} • {len(returns)} observaciones"
+                           + (f" • {library_meta['description']}" if library_meta.get('description') else ""))
+            else:
+                source_name = uploaded_file.name
+                # Detect the layout from a sample; the full file is parsed once,
+                # after the columns are chosen, and only for those columns
+                upload_key = content_key(uploaded_file.getvalue())
+                upload_status = st.empty()
+                format_box = st.expander("🔎 Formato Detectado", expanded=False)
+                schema = select_format(format_box, uploaded_file, 'upload')
+                sample_df = schema['sample']
         
-        st.success(f"✅ Cargado {uploaded_file.name} • {len(df)} observaciones")
+                trade_columns = detect_trade_columns(schema)
+                trade_mode = st.radio(
+                    "Tipo de Datos", ["Retornos por Período", "Lista de Operaciones"],
+                    index=1 if trade_columns else 0, horizontal=True, key=f"upload_kind_{upload_key}",
+                    help="Una lista de operaciones (entrada, salida, PnL) se convierte en retornos periódicos"
+                ) == "Lista de Operaciones"
         
-        # Column selection
-        col1, col2 = st.columns(2)
-        with col1:
-            date_col = st.selectbox("Columna de Fecha", df.columns, index=0)
-        with col2:
-            returns_col = st.selectbox("Columna de Retornos", df.columns, index=1 if len(df.columns) > 1 else 0)
+                if trade_mode:
+                    with st.expander("🧾 Lista de Operaciones", expanded=True):
+                        columns = schema['columns']
+                        optional = [None] + schema['numeric_columns']
+                        detected = trade_columns or {'entry': columns[0], 'exit': columns[min(1, len(columns) - 1)],
+                                                     'pnl': schema['returns_col'], 'mae': None, 'mfe': None}
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            entry_col = st.selectbox("Columna de Entrada", columns, index=columns.index(detected['entry']))
+                            mae_col = st.selectbox("Columna MAE (opcional)", optional, index=optional.index(detected['mae']),
+                                                   format_func=lambda c: "— Ninguna —" if c is None else c)
+                        with col2:
+                            exit_col = st.selectbox("Columna de Salida", columns, index=columns.index(detected['exit']))
+                            mfe_col = st.selectbox("Columna MFE (opcional)", optional, index=optional.index(detected['mfe']),
+                                                   format_func=lambda c: "— Ninguna —" if c is None else c)
+                        with col3:
+                            pnl_col = st.selectbox("Columna de PnL", columns, index=columns.index(detected['pnl']))
+                            trade_freq = st.selectbox("Frecuencia de Retornos", TRADE_FREQS,
+                                                      format_func=lambda f: TRADE_FREQ_LABELS[f])
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            trade_capital = st.number_input("Capital Inicial", min_value=1.0, value=100000.0, step=1000.0,
+                                                            help="Los retornos son el PnL de cada período sobre el capital valorado a mercado")
+                        with col2:
+                            dayfirst = st.checkbox("Fechas con día primero (DD/MM/AAAA)",
+                                                   value=detect_dayfirst(sample_df[entry_col]), key=f"trades_dayfirst_{entry_col}")
+                        st.dataframe(sample_df.head(10), use_container_width=True)
+                
+                    trade_cols = (entry_col, exit_col, pnl_col, mae_col, mfe_col)
+                    trades = shared_cache.get_or_load(
+                        ('trades',) + format_key(upload_key, schema) + trade_cols + (dayfirst,),
+                        lambda: parse_trades(
+                            load_columns(uploaded_file, upload_key, schema, [c for c in trade_cols if c is not None]),
+                            entry_col, exit_col, pnl_col, mae_col=mae_col, mfe_col=mfe_col, dayfirst=dayfirst
+                        )
+                    )
+                    if len(trades) == 0:
+                        st.error("❌ No hay operaciones válidas con esas columnas")
+                        st.stop()
+                    returns = shared_cache.get_or_load(
+                        ('trades',) + format_key(upload_key, schema) + trade_cols + (dayfirst, trade_capital, trade_freq),
+                        lambda: trades_to_returns(trades, trade_capital, trade_freq)
+                    )
+                    if trades.attrs.get('dropped'):
+                        st.caption(f"ℹ️ {trades.attrs['dropped']} filas descartadas (fecha o PnL vacío, o salida antes de la entrada)")
+                    if trade_freq not in ('B', 'D'):
+                        st.caption("ℹ️ Retornos intradía: ajusta Períodos/Año al número de barras por año")
+                else:
+                    # Column selection
+                    columns = schema['columns']
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        date_col = st.selectbox("Columna de Fecha", columns, index=columns.index(schema['date_col']))
+                    with col2:
+                        returns_col = st.selectbox("Columna de Retornos", columns, index=columns.index(schema['returns_col']))
         
-        # Process data
-        df[date_col] = pd.to_datetime(df[date_col])
-        df.set_index(date_col, inplace=True)
-        returns = df[returns_col].dropna()
+                    scale, dayfirst = select_scale(format_box, schema, date_col, returns_col, 'upload')
+                    with format_box:
+                        st.caption(f"Vista previa de las primeras {len(sample_df)} filas")
+                        st.dataframe(sample_df.head(10), use_container_width=True)
         
-        if returns.abs().mean() > 1:
-            returns = returns / 100
+                    # Optional portfolio built from several return columns
+                    asset_columns = [c for c in schema['numeric_columns'] if c != date_col]
+                    build_mode = len(asset_columns) > 1 and st.checkbox(
+                        "🧺 Construir portafolio con varias columnas",
+                        value=False,
+                        help="Combina varias columnas de retornos con pesos objetivo y rebalanceo"
+                    )
         
-        qs.extend_pandas()
+                    # Process data
+                    if build_mode:
+                        with st.expander("🧺 Constructor de Portafolio", expanded=True):
+                            assets = st.multiselect("Activos", asset_columns, default=asset_columns)
+                            if not assets:
+                                st.warning("⚠️ Selecciona al menos un activo")
+                                st.stop()
+                
+                            weights_df = st.data_editor(
+                                pd.DataFrame({'Activo': assets, 'Peso': [round(100 / len(assets), 2)] * len(assets)}),
+                                hide_index=True, disabled=['Activo'], use_container_width=True,
+                                key=f"portfolio_weights_{content_key(repr(assets).encode())}"
+                            )
+                
+                            # Percent scale per column, detected from the sample like the single-column case
+                            percent_assets = st.multiselect(
+                                "Columnas en Porcentaje (1.0 = 1%)", assets,
+                                default=[c for c in assets if detect_scale(sample_df[c]) == 100],
+                                key=f"portfolio_percent_{content_key(repr(assets).encode())}"
+                            )
+                            scales = {c: 100 if c in percent_assets else 1 for c in assets}
+                
+                            col1, col2 = st.columns(2)
+                            with col1:
+                                rebalance = st.selectbox("Rebalanceo", REBALANCE_METHODS, index=REBALANCE_METHODS.index('monthly'),
+                                                         format_func=lambda m: REBALANCE_LABELS[m])
+                            with col2:
+                                threshold = None
+                                if rebalance == 'threshold':
+                                    threshold = st.slider("Desviación Máxima por Activo (%)", 1, 25, 5) / 100
+                
+                            if weights_df['Peso'].fillna(0).sum() == 0:
+                                st.warning("⚠️ Los pesos deben sumar un valor distinto de cero")
+                                st.stop()
+                
+                            returns, drifted_weights, turnover = load_portfolio(
+                                lambda: load_columns(uploaded_file, upload_key, schema, [date_col] + assets),
+                                format_key(upload_key, schema), date_col, assets, weights_df['Peso'].fillna(0).tolist(), rebalance, threshold, dayfirst, scales
+                            )
+                
+                            target_weights = weights_df.set_index('Activo')['Peso'] / weights_df['Peso'].sum()
+                            col1, col2, col3 = st.columns(3)
+                            with col1:
+                                st.metric("Activos", f"{len(assets)}")
+                            with col2:
+                                st.metric("Rebalanceos", f"{len(turnover)}")
+                            with col3:
+                                st.metric("Rotación Media", f"{turnover.mean()*100:.2f}%" if len(turnover) else "0.00%")
+                
+                            st.dataframe(pd.DataFrame({
+                                'Peso Objetivo': target_weights.map(lambda w: f"{w*100:.2f}%"),
+                                'Peso Final': drifted_weights.iloc[-1].map(lambda w: f"{w*100:.2f}%"),
+                                'Peso Medio': drifted_weights.mean().map(lambda w: f"{w*100:.2f}%")
+                            }), use_container_width=True)
+                    else:
+                        returns = shared_cache.get_or_load(
+                            ('returns',) + format_key(upload_key, schema) + (date_col, returns_col, scale, dayfirst),
+                            lambda: parse_returns(
+                                load_columns(uploaded_file, upload_key, schema, [date_col, returns_col]),
+                                date_col, returns_col, scale=scale, dayfirst=dayfirst
+                            )
+                        )
+        
+                upload_status.success(f"✅ Cargado {uploaded_file.name} • "
+                                      + (f"{len(trades)} operaciones → " if trades is not None else "")
+                                      + f"{len(returns)} observaciones")
         
-        # Fetch benchmark
-        benchmark = None
-        bench_name = "Benchmark"
+            qs.extend_pandas()
         
-        if benchmark_type == "Predefinido (yfinance)" and benchmark_option:
-            bench_name = benchmark_option
+            # Fetch benchmark
+            benchmark = None
+            benchmark_request = None
+            bench_name = "Benchmark"
+        
+            if benchmark_type == "Predefinido (yfinance)" and benchmark_option:
+                bench_name = benchmark_option
             
-            with st.spinner(f"📥 Descargando {bench_name} desde Yahoo Finance..."):
-                try:
-                    start = returns.index.min()
-                    end = returns.index.max()
-                    
-                    bench_data = yf.download(
-                        benchmark_option, 
-                        start=start, 
-                        end=end, 
-                        progress=False, 
-                        auto_adjust=True
-                    )
-                    
-                    if not bench_data.empty and len(bench_data) > 0:
-                        if 'Close' in bench_data.columns:
-                            benchmark = bench_data['Close'].pct_change().dropna()
-                        else:
-                            benchmark = bench_data.iloc[:, 0].pct_change().dropna()
-                        
-                        if isinstance(benchmark, pd.DataFrame):
-                            benchmark = benchmark.iloc[:, 0]
-                        
-                        col_info1, col_info2, col_info3 = st.columns(3)
-                        with col_info1:
-                            st.success(f"✅ {bench_name} descargado")
-                        with col_info2:
-                            st.info(f"📅 {len(benchmark)} días")
-                        with col_info3:
-                            bench_return = (1 + benchmark).prod() - 1
-                            st.info(f"📈 Retorno: {bench_return*100:.2f}%")
-                        
-                        st.caption(f"📆 Rango: {start.strftime('%Y-%m-%d')} a {end.strftime('%Y-%m-%d')}")
-                        
-                        with st.expander("📊 Vista Previa del Benchmark", expanded=False):
-                            preview_df = pd.DataFrame({
-                                'Fecha': benchmark.index[-10:],
-                                'Retorno': [f"{r*100:.4f}%" for r in benchmark.values[-10:]]
-                            })
-                            st.dataframe(preview_df, use_container_width=True, hide_index=True)
-                    else:
-                        st.error(f"❌ No se pudieron obtener datos de {bench_name}")
-                        benchmark = None
-                except Exception as e:
-                    st.error(f"❌ Error al descargar {bench_name}")
-                    with st.expander("🔍 Detalles del error"):
-                        st.code(str(e))
-                        st.info("💡 Consejos:")
-                        st.markdown("""
-                        - Verifica que el símbolo sea correcto (ej: SPY, QQQ, ^GSPC)
-                        - Algunos símbolos requieren formato especial (ej: BTC-USD para Bitcoin)
-                        - Yahoo Finance puede tener datos limitados para ciertos activos
-                        - Intenta con un rango de fechas diferente
-                        """)
-                    benchmark = None
+                bench_start, bench_end = returns.index.min(), returns.index.max()
+                # One download per ticker and date range for the whole server,
+                # started now and collected once the strategy-only sections
+                # are on screen
+                benchmark_request = request_benchmark(benchmark_option, bench_start, bench_end)
+                # Scenario dates are naive; compare in the upload's timezone
+                if (st.session_state.preferences['advanced']['stress_test']
+                        and bench_start > SCENARIO_START.tz_localize(bench_start.tz)):
+                    request_benchmark(benchmark_option, SCENARIO_START, bench_end)
+                bench_status = st.empty()
+                bench_status.info(f"📥 Descargando {bench_name} desde Yahoo Finance en segundo plano...")
         
-        elif benchmark_type == "CSV Personalizado" and benchmark_file:
-            try:
-                if benchmark_file.name.endswith('.csv'):
-                    bench_df = pd.read_csv(benchmark_file)
-                else:
-                    bench_df = pd.read_excel(benchmark_file)
+            elif benchmark_type == "CSV Personalizado" and benchmark_file:
+                try:
+                    bench_key = content_key(benchmark_file.getvalue())
                 
-                st.success(f"✅ Benchmark cargado: {benchmark_file.name}")
+                    st.success(f"✅ Benchmark cargado: {benchmark_file.name}")
                 
-                with st.expander("📄 Vista Previa del Benchmark"):
-                    st.dataframe(bench_df.head(), use_container_width=True)
+                    bench_box = st.expander("📄 Vista Previa del Benchmark")
+                    bench_schema = select_format(bench_box, benchmark_file, 'bench')
+                    bench_columns = bench_schema['columns']
                 
-                col_b1, col_b2 = st.columns(2)
-                with col_b1:
-                    bench_date_col = st.selectbox("Columna Fecha (Benchmark)", bench_df.columns, index=0, key="bench_date")
-                with col_b2:
-                    bench_ret_col = st.selectbox("Columna Retornos (Benchmark)", bench_df.columns, index=1 if len(bench_df.columns) > 1 else 0, key="bench_ret")
+                    col_b1, col_b2 = st.columns(2)
+                    with col_b1:
+                        bench_date_col = st.selectbox("Columna Fecha (Benchmark)", bench_columns, index=bench_columns.index(bench_schema['date_col']), key="bench_date")
+                    with col_b2:
+                        bench_ret_col = st.selectbox("Columna Retornos (Benchmark)", bench_columns, index=bench_columns.index(bench_schema['returns_col']), key="bench_ret")
                 
-                bench_df[bench_date_col] = pd.to_datetime(bench_df[bench_date_col])
-                bench_df.set_index(bench_date_col, inplace=True)
-                benchmark = bench_df[bench_ret_col].dropna()
+                    bench_scale, bench_dayfirst = select_scale(bench_box, bench_schema, bench_date_col, bench_ret_col, 'bench')
+                    with bench_box:
+                        st.dataframe(bench_schema['sample'].head(), use_container_width=True)
                 
-                if benchmark.abs().mean() > 1:
-                    benchmark = benchmark / 100
+                    benchmark = shared_cache.get_or_load(
+                        ('returns',) + format_key(bench_key, bench_schema) + (bench_date_col, bench_ret_col, bench_scale, bench_dayfirst),
+                        lambda: parse_returns(
+                            load_columns(benchmark_file, bench_key, bench_schema, [bench_date_col, bench_ret_col]),
+                            bench_date_col, bench_ret_col, scale=bench_scale, dayfirst=bench_dayfirst
+                        )
+                    )
                 
-                bench_name = benchmark_file.name.split('.')[0]
-                st.info(f"📊 Benchmark procesado: {len(benchmark)} observaciones")
+                    bench_name = benchmark_file.name.split('.')[0]
+                    st.info(f"📊 Benchmark procesado: {len(benchmark)} observaciones")
                 
-            except Exception as e:
-                st.error(f"❌ Error al procesar benchmark: {str(e)}")
-                benchmark = None
+                except Exception as e:
+                    st.error(f"❌ Error al procesar benchmark: {str(e)}")
+                    benchmark = None
         
         st.markdown("---")
         
         # Calculate metrics
         prefs = st.session_state.preferences
         
+        # A restored analysis keeps its results while rf and periods are unchanged
+        settings = {'rf': rf_rate, 'periods': periods_per_year, 'bootstrap_method': bootstrap_method}
+        restored = (
+            snapshot is not None and snapshot['metrics'] is not None
+            and snapshot['settings'].get('periods') == periods_per_year
+            and np.isclose(snapshot['settings'].get('rf', np.nan), rf_rate)
+        )
+        
+        ci = None
+        if prefs['show_confidence_intervals']:
+            if restored and snapshot['ci'] is not None and snapshot['settings'].get('bootstrap_method') == bootstrap_method:
+                ci = snapshot['ci']
+            else:
+                # Keyed on the series contents so reruns and other sessions reuse it
+                with st.spinner("Calculando intervalos de confianza..."):
+                    ci = shared_cache.get_or_load(
+                        ('bootstrap_ci', series_key(returns), rf_rate, periods_per_year, bootstrap_method),
+                        lambda: bootstrap_ci(returns, rf=rf_rate, periods=periods_per_year, method=bootstrap_method)
+                    )
+        
+        if restored:
+            metrics = dict(snapshot['metrics'])
+        else:
+            metrics = strategy_metrics(returns, rf=rf_rate, periods=periods_per_year)
+        episodes = snapshot['episodes'] if snapshot is not None and snapshot['episodes'] is not None else None
+        
+        # Calendar breakdowns, aggregated once per series for every chart and table
+        calendar = calendar_returns(returns)
+        
         # === BASIC METRICS ===
         if prefs['metrics']['basic']:
             st.markdown("<div class='section-header'><h3 style='margin:0;'>📊 Métricas de Rendimiento</h3></div>", unsafe_allow_html=True)
             
-            total_return = qs.stats.comp(returns)
-            cagr = qs.stats.cagr(returns, rf=rf_rate, periods=periods_per_year)
-            sharpe = qs.stats.sharpe(returns, rf=rf_rate, periods=periods_per_year)
-            sortino = qs.stats.sortino(returns, rf=rf_rate, periods=periods_per_year)
+            total_return = metrics['total_return']
+            cagr = metrics['cagr']
+            sharpe = metrics['sharpe']
+            sortino = metrics['sortino']
             
             col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("Retorno Total", f"{total_return*100:.2f}%")
             with col2:
                 st.metric("CAGR", f"{cagr*100:.2f}%")
+                if ci is not None:
+                    st.caption(format_ci(ci, 'cagr', pct=True))
             with col3:
                 st.metric("Ratio Sharpe", f"{sharpe:.2f}")
+                if ci is not None:
+                    st.caption(format_ci(ci, 'sharpe'))
             with col4:
                 st.metric("Ratio Sortino", f"{sortino:.2f}")
+                if ci is not None:
+                    st.caption(format_ci(ci, 'sortino'))
             
             if prefs['show_insights']:
                 st.markdown(get_insight('sharpe', sharpe), unsafe_allow_html=True)
@@ -675,12 +1303,12 @@ else:
         if prefs['metrics']['risk']:
             st.markdown("<div class='section-header'><h3 style='margin:0;'>⚠️ Métricas de Riesgo</h3></div>", unsafe_allow_html=True)
             
-            volatility = qs.stats.volatility(returns, periods=periods_per_year)
-            var_95 = qs.stats.var(returns)
-            cvar_95 = qs.stats.cvar(returns)
-            kelly = qs.stats.kelly_criterion(returns)
-            skew = qs.stats.skew(returns)
-            kurtosis = qs.stats.kurtosis(returns)
+            volatility = metrics['volatility']
+            var_95 = metrics['var_95']
+            cvar_95 = metrics['cvar_95']
+            kelly = metrics['kelly']
+            skew = metrics['skew']
+            kurtosis = metrics['kurtosis']
             
             col1, col2, col3, col4, col5, col6 = st.columns(6)
             with col1:
@@ -698,43 +1326,78 @@ else:
             
             if prefs['show_insights'] and kelly > 0.25:
                 st.markdown(f"<div class='warning-box'><b>⚠️ Tamaño de Posición:</b> Kelly sugiere {kelly*100:.1f}% de asignación. Considera 0.5x Kelly ({kelly*50:.1f}%) para implementación práctica.</div>", unsafe_allow_html=True)
+            
+            with st.expander("📐 VaR y CVaR por Método y Nivel", expanded=False):
+                levels_table = var_table(returns, VAR_LEVELS)
+                var_view = pd.DataFrame({
+                    f"{kind} {level:.0%}": levels_table[column].xs(level, level='level').reindex(VAR_METHODS).values
+                    for kind, column in (('VaR', 'var'), ('CVaR', 'cvar')) for level in VAR_LEVELS
+                }, index=[VAR_METHOD_LABELS[m] for m in VAR_METHODS])
+                st.dataframe(var_view.style.format('{:.2%}'), use_container_width=True)
+                st.caption("Retorno por período. El VaR paramétrico supone normalidad; Cornish-Fisher lo corrige por asimetría y curtosis.")
+                
+                st.markdown("#### 🔁 VaR Móvil y Backtest")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    var_method = st.selectbox("Método", VAR_METHODS, format_func=lambda m: VAR_METHOD_LABELS[m], key='var_method')
+                with col2:
+                    var_level = st.selectbox("Confianza", VAR_LEVELS, index=1, format_func=lambda c: f"{c:.0%}", key='var_level')
+                with col3:
+                    var_window = st.slider("Ventana", 20, max(21, min(1000, len(returns) // 2)),
+                                           min(periods_per_year, max(20, len(returns) // 4)), key='var_window')
+                
+                # Each period is checked against the VaR estimated up to the previous one
+                forecast = rolling_var(returns, window=var_window, level=var_level, method=var_method).shift(1)
+                backtest = var_backtest(returns, forecast, level=var_level)
+                
+                if backtest['observations'] > 0:
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("Excesos", f"{backtest['breaches']}", f"{backtest['breaches'] - backtest['expected']:+.1f} vs esperado", delta_color="inverse")
+                    with col2:
+                        st.metric("Tasa de Excesos", f"{backtest['breach_rate']*100:.2f}%", f"objetivo {(1 - var_level)*100:.0f}%", delta_color="off")
+                    with col3:
+                        st.metric("Kupiec (p-valor)", f"{backtest['kupiec_pvalue']:.3f}")
+                    with col4:
+                        st.metric("Christoffersen (p-valor)", f"{backtest['christoffersen_pvalue']:.3f}")
+                    
+                    if backtest['conditional_pvalue'] < 0.05:
+                        st.markdown(f"<div class='warning-box'><b>⚠️ Backtest rechazado:</b> la cobertura condicional falla (p = {backtest['conditional_pvalue']:.3f}); el modelo subestima el riesgo o sus excesos se agrupan.</div>", unsafe_allow_html=True)
+                    else:
+                        st.caption(f"Cobertura condicional p = {backtest['conditional_pvalue']:.3f}: sin evidencia contra el modelo al 5%.")
+                    
+                    var_title = f"VaR {VAR_METHOD_LABELS[var_method]} {var_level:.0%} ({var_window} períodos)"
+                    render_chart(
+                        lambda: charts.var_backtest_figure(returns, forecast, backtest['breach_dates'], var_title),
+                        lambda: plot_var_backtest(returns, forecast, backtest['breach_dates'], var_title),
+                        key='var_backtest'
+                    )
+                else:
+                    st.info("ℹ️ Historial insuficiente para la ventana elegida.")
         
         # === DRAWDOWN METRICS ===
         if prefs['metrics']['drawdown']:
             st.markdown("<div class='section-header'><h3 style='margin:0;'>📉 Métricas de Drawdown</h3></div>", unsafe_allow_html=True)
             
-            max_dd = qs.stats.max_drawdown(returns)
-            calmar = qs.stats.calmar(returns, periods=periods_per_year)
-            
-            cumulative = (1 + returns).cumprod()
-            running_max = cumulative.cummax()
-            drawdown = (cumulative - running_max) / running_max
+            max_dd = metrics['max_drawdown']
+            calmar = metrics['calmar']
             
-            is_drawdown = drawdown < 0
-            dd_periods = []
-            if is_drawdown.any():
-                dd_start = None
-                for i, (date, is_dd) in enumerate(is_drawdown.items()):
-                    if is_dd and dd_start is None:
-                        dd_start = i
-                    elif not is_dd and dd_start is not None:
-                        dd_periods.append(drawdown.iloc[dd_start:i])
-                        dd_start = None
-                if dd_start is not None:
-                    dd_periods.append(drawdown.iloc[dd_start:])
-            
-            avg_dd = np.mean([dd.min() for dd in dd_periods]) if dd_periods else 0
-            avg_dd_days = np.mean([len(dd) for dd in dd_periods]) if dd_periods else 0
+            avg_dd = metrics['avg_drawdown']
+            avg_dd_days = metrics['avg_drawdown_periods']
             
             col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("Drawdown Máximo", f"{max_dd*100:.2f}%")
+                if ci is not None:
+                    st.caption(format_ci(ci, 'max_drawdown', pct=True))
             with col2:
                 st.metric("Drawdown Promedio", f"{avg_dd*100:.2f}%")
             with col3:
                 st.metric("Días Promedio DD", f"{avg_dd_days:.0f}")
             with col4:
                 st.metric("Ratio Calmar", f"{calmar:.2f}")
+                if ci is not None:
+                    st.caption(format_ci(ci, 'calmar'))
             
             if prefs['show_insights']:
                 st.markdown(get_insight('max_dd', max_dd*100), unsafe_allow_html=True)
@@ -745,11 +1408,11 @@ else:
         if prefs['metrics']['returns']:
             st.markdown("<div class='section-header'><h3 style='margin:0;'>💰 Análisis de Retornos</h3></div>", unsafe_allow_html=True)
             
-            win_rate = qs.stats.win_rate(returns)
-            best = qs.stats.best(returns)
-            worst = qs.stats.worst(returns)
-            payoff = qs.stats.payoff_ratio(returns)
-            profit_factor = qs.stats.profit_factor(returns)
+            win_rate = metrics['win_rate']
+            best = metrics['best']
+            worst = metrics['worst']
+            payoff = metrics['payoff_ratio']
+            profit_factor = metrics['profit_factor']
             
             col1, col2, col3, col4, col5 = st.columns(5)
             with col1:
@@ -763,22 +1426,110 @@ else:
             with col5:
                 st.metric("Factor de Beneficio", f"{profit_factor:.2f}")
         
+        # === TRADE STATISTICS ===
+        if trades is not None and prefs['metrics']['returns']:
+            st.markdown("<div class='section-header'><h3 style='margin:0;'>🧾 Métricas por Operación</h3></div>", unsafe_allow_html=True)
+            trade_metrics = trade_stats(trades)
+            
+            col1, col2, col3, col4, col5 = st.columns(5)
+            with col1:
+                st.metric("Operaciones", f"{trade_metrics['trades']:,}")
+                st.metric("Duración Media", format_duration(trade_metrics['avg_hold']))
+            with col2:
+                st.metric("Tasa de Acierto", f"{trade_metrics['win_rate']*100:.1f}%")
+                st.metric("Duración Mediana", format_duration(trade_metrics['median_hold']))
+            with col3:
+                st.metric("PnL Medio", f"{trade_metrics['expectancy']:,.2f}")
+                st.metric("Duración Ganadoras", format_duration(trade_metrics['avg_hold_win']))
+            with col4:
+                st.metric("Ratio Payoff", f"{trade_metrics['payoff_ratio']:.2f}")
+                st.metric("Duración Perdedoras", format_duration(trade_metrics['avg_hold_loss']))
+            with col5:
+                st.metric("Factor de Beneficio", f"{trade_metrics['profit_factor']:.2f}")
+                st.metric("Rachas Gan./Pérd.", f"{trade_metrics['win_streak']} / {trade_metrics['loss_streak']}")
+            
+            if 'avg_mae' in trade_metrics or 'avg_mfe' in trade_metrics:
+                col1, col2, col3, col4, col5 = st.columns(5)
+                if 'avg_mae' in trade_metrics:
+                    with col1:
+                        st.metric("MAE Medio", f"{trade_metrics['avg_mae']:,.2f}")
+                    with col2:
+                        st.metric("Peor MAE", f"{trade_metrics['worst_mae']:,.2f}")
+                if 'avg_mfe' in trade_metrics:
+                    with col3:
+                        st.metric("MFE Medio", f"{trade_metrics['avg_mfe']:,.2f}")
+                    with col4:
+                        st.metric("Captura de MFE", f"{trade_metrics['mfe_capture']*100:.1f}%",
+                                  help="PnL de las ganadoras sobre su máxima ganancia latente")
+                if 'edge_ratio' in trade_metrics:
+                    with col5:
+                        st.metric("Edge Ratio", f"{trade_metrics['edge_ratio']:.2f}", help="MFE medio / |MAE medio|")
+            st.caption(f"Mejor operación {trade_metrics['best']:,.2f} • peor {trade_metrics['worst']:,.2f} • "
+                       f"PnL total {trade_metrics['total_pnl']:,.2f} • duración máxima {format_duration(trade_metrics['max_hold'])}")
+        
+        # === BENCHMARK ARRIVAL ===
+        if benchmark_request is not None:
+            with bench_status.container():
+                try:
+                    with st.spinner(f"📥 Descargando {bench_name} desde Yahoo Finance..."):
+                        benchmark, stale = wait_for_benchmark(benchmark_request, benchmark_option, bench_start, bench_end)
+                    
+                    if benchmark is not None and len(benchmark) > 0:
+                        col_info1, col_info2, col_info3 = st.columns(3)
+                        with col_info1:
+                            if stale:
+                                st.warning(f"⏱️ {bench_name}: usando datos descargados antes")
+                            else:
+                                st.success(f"✅ {bench_name} descargado")
+                        with col_info2:
+                            st.info(f"📅 {len(benchmark)} días")
+                        with col_info3:
+                            bench_return = (1 + benchmark).prod() - 1
+                            st.info(f"📈 Retorno: {bench_return*100:.2f}%")
+                        
+                        st.caption(f"📆 Rango: {bench_start.strftime('%Y-%m-%d')} a {bench_end.strftime('%Y-%m-%d')}")
+                        
+                        with st.expander("📊 Vista Previa del Benchmark", expanded=False):
+                            preview_df = pd.DataFrame({
+                                'Fecha': benchmark.index[-10:],
+                                'Retorno': [f"{r*100:.4f}%" for r in benchmark.values[-10:]]
+                            })
+                            st.dataframe(preview_df, use_container_width=True, hide_index=True)
+                    else:
+                        st.error(f"❌ No se pudieron obtener datos de {bench_name}")
+                        benchmark = None
+                except Exception as e:
+                    st.error(f"❌ Error al descargar {bench_name}")
+                    with st.expander("🔍 Detalles del error"):
+                        st.code(str(e) or type(e).__name__)
+                        st.info("💡 Consejos:")
+                        st.markdown("""
+                        - Verifica que el símbolo sea correcto (ej: SPY, QQQ, ^GSPC)
+                        - Algunos símbolos requieren formato especial (ej: BTC-USD para Bitcoin)
+                        - Yahoo Finance puede tener datos limitados para ciertos activos
+                        - Intenta con un rango de fechas diferente
+                        """)
+                    benchmark = None
+        bench_calendar = calendar_returns(benchmark) if benchmark is not None else None
+        
         # === BENCHMARK COMPARISON ===
         if benchmark is not None and prefs['show_benchmark_comparison']:
             st.markdown("<div class='section-header'><h3 style='margin:0;'>🎯 vs Benchmark</h3></div>", unsafe_allow_html=True)
             
-            bench_return = qs.stats.comp(benchmark)
-            bench_sharpe = qs.stats.sharpe(benchmark, rf=rf_rate, periods=periods_per_year)
-            beta = calculate_beta(returns, benchmark)
-            alpha = calculate_alpha(returns, benchmark, rf=rf_rate, periods=periods_per_year)
+            if 'beta' not in metrics:
+                metrics.update(benchmark_metrics(returns, benchmark, rf=rf_rate, periods=periods_per_year))
+            bench_return = metrics['benchmark_return']
+            bench_sharpe = metrics['benchmark_sharpe']
+            beta = metrics['beta']
+            alpha = metrics['alpha']
             
             col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric(f"Retorno {bench_name}", f"{bench_return*100:.2f}%",
-                         delta=f"{(total_return - bench_return)*100:.2f}% Estrategia")
+                         delta=f"{(metrics['total_return'] - bench_return)*100:.2f}% Estrategia")
             with col2:
                 st.metric(f"Sharpe {bench_name}", f"{bench_sharpe:.2f}",
-                         delta=f"{(sharpe - bench_sharpe):.2f} Estrategia")
+                         delta=f"{(metrics['sharpe'] - bench_sharpe):.2f} Estrategia")
             with col3:
                 st.metric("Beta", f"{beta:.2f}")
             with col4:
@@ -800,28 +1551,12 @@ else:
         
         if prefs['charts']['cumulative_returns']:
             with st.expander("📈 Retornos Acumulados", expanded=True):
-                try:
-                    fig = qs.plots.returns(returns, benchmark=benchmark, show=False, figsize=(14, 6))
-                    st.pyplot(fig, clear_figure=True)
-                    plt.close()
-                except Exception as e:
-                    cum_returns = (1 + returns).cumprod()
-                    fig, ax = plt.subplots(figsize=(14, 6))
-                    ax.plot(cum_returns.index, cum_returns.values, linewidth=2, color='#00d4ff', label='Estrategia')
-                    if benchmark is not None:
-                        cum_bench = (1 + benchmark).cumprod()
-                        ax.plot(cum_bench.index, cum_bench.values, linewidth=2, color='#ff9900', label=bench_name, alpha=0.7)
-                    ax.set_title('Retornos Acumulados', fontsize=14, color='white')
-                    ax.set_xlabel('Fecha', fontsize=12, color='white')
-                    ax.set_ylabel('Valor', fontsize=12, color='white')
-                    ax.legend()
-                    ax.grid(True, alpha=0.2)
-                    ax.set_facecolor('#0f1419')
-                    fig.patch.set_facecolor('#0f1419')
-                    ax.tick_params(colors='white')
-                    plt.tight_layout()
-                    st.pyplot(fig, clear_figure=True)
-                    plt.close()
+                render_chart(
+                    lambda: charts.cumulative_returns_figure(returns, benchmark, bench_name),
+                    lambda: qs.plots.returns(returns, benchmark=benchmark, show=False, figsize=(14, 6)),
+                    lambda: plot_cumulative_returns(returns, benchmark, bench_name, figsize=(14, 6)),
+                    key='cumulative_returns'
+                )
         
         charts_to_show = []
         
@@ -853,17 +1588,30 @@ else:
                         with st.expander(chart_title, expanded=False):
                             try:
                                 if chart_type == 'monthly_heatmap':
-                                    fig = qs.plots.monthly_heatmap(returns, show=False, figsize=(10, 7))
-                                    st.pyplot(fig, clear_figure=True)
+                                    render_chart(
+                                        lambda: charts.monthly_heatmap_figure(calendar['monthly_table']),
+                                        lambda: plot_monthly_heatmap(calendar['monthly_table'], figsize=(10, 7)),
+                                        key=chart_type
+                                    )
                                 elif chart_type == 'distribution':
-                                    fig = qs.plots.histogram(returns, show=False, figsize=(10, 6))
-                                    st.pyplot(fig, clear_figure=True)
+                                    render_chart(
+                                        lambda: charts.histogram_figure(returns),
+                                        lambda: qs.plots.histogram(returns, show=False, figsize=(10, 6)),
+                                        key=chart_type
+                                    )
                                 elif chart_type == 'drawdown':
-                                    fig = qs.plots.drawdowns_periods(returns, show=False, figsize=(10, 6))
-                                    st.pyplot(fig, clear_figure=True)
+                                    render_chart(
+                                        lambda: charts.drawdown_figure(returns, episodes=episodes),
+                                        lambda: qs.plots.drawdowns_periods(returns, show=False, figsize=(10, 6)),
+                                        key=chart_type
+                                    )
                                 elif chart_type == 'yearly_returns':
-                                    fig = qs.plots.yearly_returns(returns, benchmark=benchmark, show=False, figsize=(10, 6))
-                                    st.pyplot(fig, clear_figure=True)
+                                    bench_yearly = bench_calendar['yearly'] if bench_calendar is not None else None
+                                    render_chart(
+                                        lambda: charts.yearly_returns_figure(calendar['yearly'], bench_yearly, bench_name),
+                                        lambda: plot_yearly_returns(calendar['yearly'], bench_yearly, bench_name=bench_name, figsize=(10, 6)),
+                                        key=chart_type
+                                    )
                                 elif chart_type == 'qq_plot':
                                     fig = qs.plots.qq(returns, show=False, figsize=(10, 6))
                                     st.pyplot(fig, clear_figure=True)
@@ -871,32 +1619,30 @@ else:
                                     fig = qs.plots.log_returns(returns, show=False, figsize=(10, 6))
                                     st.pyplot(fig, clear_figure=True)
                                 elif chart_type == 'rolling_vol':
-                                    fig = qs.plots.rolling_volatility(returns, period=periods_per_year, show=False, figsize=(10, 6))
-                                    st.pyplot(fig, clear_figure=True)
+                                    render_chart(
+                                        lambda: charts.rolling_figure(
+                                            charts.rolling_volatility(returns, window=periods_per_year, periods=periods_per_year),
+                                            'Volatilidad Móvil', 'Volatilidad (%)', percent=True
+                                        ),
+                                        lambda: qs.plots.rolling_volatility(returns, period=periods_per_year, show=False, figsize=(10, 6)),
+                                        key=chart_type
+                                    )
                                 elif chart_type == 'rolling_sharpe':
-                                    fig = qs.plots.rolling_sharpe(returns, rf=rf_rate, period=periods_per_year, show=False, figsize=(10, 6))
-                                    st.pyplot(fig, clear_figure=True)
+                                    render_chart(
+                                        lambda: charts.rolling_figure(
+                                            charts.rolling_sharpe(returns, rf=rf_rate, window=periods_per_year, periods=periods_per_year),
+                                            'Sharpe Móvil', 'Sharpe', hline=0
+                                        ),
+                                        lambda: qs.plots.rolling_sharpe(returns, rf=rf_rate, period=periods_per_year, show=False, figsize=(10, 6)),
+                                        key=chart_type
+                                    )
                                 elif chart_type == 'rolling_beta':
-                                    window = min(60, len(returns) // 4)
-                                    common_dates = returns.index.intersection(benchmark.index)
-                                    aligned_returns = returns.loc[common_dates]
-                                    aligned_benchmark = benchmark.loc[common_dates]
-                                    
-                                    rolling_beta = aligned_returns.rolling(window).cov(aligned_benchmark) / aligned_benchmark.rolling(window).var()
-                                    
-                                    fig, ax = plt.subplots(figsize=(10, 6))
-                                    ax.plot(rolling_beta.index, rolling_beta.values, linewidth=2, color='#00d4ff')
-                                    ax.axhline(y=1, color='#ff9900', linestyle='--', alpha=0.5, label='Beta = 1')
-                                    ax.set_title('Rolling Beta', fontsize=14, color='white')
-                                    ax.set_xlabel('Fecha', fontsize=12, color='white')
-                                    ax.set_ylabel('Beta', fontsize=12, color='white')
-                                    ax.grid(True, alpha=0.2)
-                                    ax.legend()
-                                    ax.set_facecolor('#0f1419')
-                                    fig.patch.set_facecolor('#0f1419')
-                                    ax.tick_params(colors='white')
-                                    plt.tight_layout()
-                                    st.pyplot(fig, clear_figure=True)
+                                    beta_series = charts.rolling_beta(returns, benchmark, window=min(60, len(returns) // 4))
+                                    render_chart(
+                                        lambda: charts.rolling_figure(beta_series, 'Beta Móvil', 'Beta', hline=1, hline_name='Beta = 1'),
+                                        lambda: plot_rolling_beta(beta_series, figsize=(10, 6)),
+                                        key=chart_type
+                                    )
                                 
                                 plt.close('all')
                             except Exception as e:
@@ -912,27 +1658,10 @@ else:
             with st.expander("📊 Análisis de Ventaja Estadística", expanded=False):
                 col1, col2, col3 = st.columns(3)
                 
-                avg_win = qs.stats.avg_win(returns)
-                avg_loss = qs.stats.avg_loss(returns)
+                avg_win = metrics['avg_win']
+                avg_loss = metrics['avg_loss']
                 
-                returns_sign = np.sign(returns)
-                consecutive_wins = 0
-                consecutive_losses = 0
-                current_win_streak = 0
-                current_loss_streak = 0
-                
-                for r in returns_sign:
-                    if r > 0:
-                        current_win_streak += 1
-                        current_loss_streak = 0
-                        consecutive_wins = max(consecutive_wins, current_win_streak)
-                    elif r < 0:
-                        current_loss_streak += 1
-                        current_win_streak = 0
-                        consecutive_losses = max(consecutive_losses, current_loss_streak)
-                    else:
-                        current_win_streak = 0
-                        current_loss_streak = 0
+                consecutive_wins, consecutive_losses = kernels.streaks(returns.to_numpy(dtype=float))
                 
                 with col1:
                     st.metric("Ganancia Promedio", f"{avg_win*100:.2f}%")
@@ -942,17 +1671,17 @@ else:
                     st.metric("Rachas Perdedoras", f"{consecutive_losses:.0f}")
                 with col3:
                     st.metric("Ratio Gan/Pérd", f"{(avg_win/abs(avg_loss)):.2f}")
-                    st.metric("Tasa de Acierto", f"{win_rate*100:.1f}%")
+                    st.metric("Tasa de Acierto", f"{metrics['win_rate']*100:.1f}%")
                 
                 if prefs['show_insights']:
-                    if win_rate > 0.5 and payoff > 1.5:
+                    if metrics['win_rate'] > 0.5 and metrics['payoff_ratio'] > 1.5:
                         st.markdown("<div class='insight-box'><b>🌟 Ventaja Fuerte:</b> Alta tasa de acierto + payoff favorable = ventaja estratégica robusta.</div>", unsafe_allow_html=True)
-                    elif payoff > 2:
+                    elif metrics['payoff_ratio'] > 2:
                         st.markdown("<div class='insight-box'><b>💡 Ventaja Asimétrica:</b> Ratio payoff fuerte sugiere características de seguimiento de tendencias.</div>", unsafe_allow_html=True)
         
         if prefs['advanced']['time_analysis']:
             with st.expander("🔄 Análisis Temporal", expanded=False):
-                monthly_rets = returns.resample('M').apply(lambda x: (1 + x).prod() - 1)
+                monthly_rets = calendar['monthly']
                 positive_months = (monthly_rets > 0).sum()
                 total_months = len(monthly_rets)
                 monthly_win_rate = (positive_months / total_months) * 100
@@ -968,9 +1697,288 @@ else:
                     st.metric("Peor Mes", f"{monthly_rets.min()*100:.2f}%")
                 
                 st.markdown("#### 📊 Distribución de Retornos Mensuales")
-                fig = qs.plots.monthly_returns(returns, show=False, figsize=(14, 6))
-                st.pyplot(fig, clear_figure=True)
-                plt.close()
+                render_chart(
+                    lambda: charts.monthly_heatmap_figure(calendar['monthly_table']),
+                    lambda: plot_monthly_heatmap(calendar['monthly_table'], figsize=(14, 6)),
+                    key='time_analysis_heatmap'
+                )
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("#### 📆 Retorno por Día de la Semana")
+                    weekday_df = pd.DataFrame({
+                        'Día': [WEEKDAY_LABELS[d] for d in calendar['weekday'].index],
+                        'Retorno Compuesto': [f"{r*100:.2f}%" for r in calendar['weekday'].values]
+                    })
+                    st.dataframe(weekday_df, use_container_width=True, hide_index=True)
+                with col2:
+                    st.markdown("#### 🗓️ Retorno por Trimestre")
+                    quarterly_df = pd.DataFrame({
+                        'Trimestre': [str(q) for q in calendar['quarterly'].index],
+                        'Retorno': [f"{r*100:.2f}%" for r in calendar['quarterly'].values]
+                    })
+                    st.dataframe(quarterly_df, use_container_width=True, hide_index=True, height=250)
+                
+                if len(calendar['hour']) > 0:
+                    st.markdown("#### 🕐 Retorno por Hora del Día")
+                    hour_df = pd.DataFrame({
+                        'Hora': [f"{h:02d}:00" for h in calendar['hour'].index],
+                        'Retorno Compuesto': [f"{r*100:.2f}%" for r in calendar['hour'].values]
+                    })
+                    st.dataframe(hour_df, use_container_width=True, hide_index=True)
+        
+        if prefs['advanced']['stability']:
+            with st.expander("📐 Estabilidad de Métricas", expanded=False):
+                yearly_panel = calendar_metrics(returns, rf=rf_rate, periods=periods_per_year)
+                
+                st.markdown("#### 📅 Métricas por Año Calendario")
+                st.dataframe(
+                    yearly_panel.rename(columns=WINDOW_METRIC_LABELS).style.format({
+                        'Sharpe': '{:.2f}', 'Volatilidad': '{:.2%}', 'Drawdown Máx.': '{:.2%}',
+                        'Tasa de Acierto': '{:.1%}', 'CAGR': '{:.2%}'
+                    }),
+                    use_container_width=True
+                )
+                
+                # Colour each metric by its z-score across years; volatility and
+                # drawdown are flipped so that green is always better
+                direction = pd.Series({'sharpe': 1, 'volatility': -1, 'max_drawdown': 1, 'win_rate': 1, 'cagr': 1})
+                zscores = (yearly_panel - yearly_panel.mean()) / yearly_panel.std().replace(0, np.nan)
+                zscores = (zscores * direction).fillna(0)
+                fig = go.Figure(go.Heatmap(
+                    z=zscores.T.values,
+                    x=[str(y) for y in yearly_panel.index],
+                    y=[WINDOW_METRIC_LABELS[m] for m in yearly_panel.columns],
+                    text=[[f"{v:.2f}" if m == 'sharpe' else f"{v*100:.1f}%" for v in yearly_panel[m]] for m in yearly_panel.columns],
+                    texttemplate="%{text}",
+                    colorscale='RdYlGn', zmid=0, showscale=False
+                ))
+                fig.update_layout(template='plotly_dark', height=350, title='Estabilidad Anual (z-score por métrica)')
+                st.plotly_chart(fig, use_container_width=True)
+                
+                window = periods_per_year
+                rolling_panel = None
+                if window > 1 and len(returns) > window:
+                    # Drawdowns scan every window, so long series are sampled
+                    # down to about 2000 windows
+                    step = max(1, (len(returns) - window) // 2000)
+                    rolling_panel = rolling_metrics(returns, window=window, rf=rf_rate, periods=periods_per_year, step=step)
+                    
+                    st.markdown(f"#### 🔁 Distribución en Ventanas Móviles de {window} Períodos")
+                    summary = stability_summary(rolling_panel).rename(index=WINDOW_METRIC_LABELS)
+                    summary = summary.rename(columns={'mean': 'Media', 'std': 'Desv.', 'min': 'Mín', 'max': 'Máx', 'positive': '% Positivas'})
+                    st.dataframe(summary.style.format('{:.3f}'), use_container_width=True)
+                else:
+                    st.info(f"ℹ️ Se necesitan más de {window} observaciones para las ventanas móviles.")
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.download_button("📥 Años Calendario (CSV)", yearly_panel.to_csv(),
+                                     f"estabilidad_anual_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv",
+                                     use_container_width=True)
+                with col2:
+                    if rolling_panel is not None:
+                        st.download_button("📥 Ventanas Móviles (CSV)", rolling_panel.to_csv(),
+                                         f"estabilidad_movil_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv",
+                                         use_container_width=True)
+        
+        if prefs['advanced']['sensitivity']:
+            with st.expander("🎚️ Sensibilidad a Tasa Libre y Períodos", expanded=False):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    rf_range = st.slider("Rango Tasa Libre (%)", 0.0, 15.0, (0.0, 8.0), 0.25)
+                with col2:
+                    rf_step = st.selectbox("Paso (%)", [0.1, 0.25, 0.5, 1.0], index=1)
+                with col3:
+                    grid_periods = st.multiselect("Períodos/Año", [252, 365, 52, 12, 1], default=[252, 365, 52, 12])
+                
+                if grid_periods:
+                    rates = np.round(np.arange(rf_range[0], rf_range[1] + rf_step / 2, rf_step), 4) / 100
+                    grid = sensitivity_grid(returns, rates, grid_periods, benchmark=benchmark)
+                    available = [m for m in SENSITIVITY_METRICS if grid[m].notna().any()]
+                    
+                    grid_metric = st.selectbox("Métrica", available, format_func=lambda m: SENSITIVITY_LABELS[m])
+                    table = grid[grid_metric].unstack('periods')[grid_periods]
+                    pct = grid_metric in ('cagr_excess', 'alpha')
+                    values = table.values * (100 if pct else 1)
+                    
+                    fig = go.Figure(go.Heatmap(
+                        z=values, x=[str(p) for p in table.columns], y=[f"{r*100:.2f}%" for r in table.index],
+                        text=np.char.mod('%.2f%%' if pct else '%.2f', values), texttemplate="%{text}",
+                        colorscale='RdYlGn', zmid=0 if np.nanmin(values) < 0 < np.nanmax(values) else None,
+                        hovertemplate='Tasa Libre %{y} · %{x} períodos/año: %{text}<extra></extra>'
+                    ))
+                    fig.update_xaxes(title='Períodos/Año', type='category')
+                    fig.update_yaxes(title='Tasa Libre de Riesgo', type='category')
+                    fig.update_layout(template='plotly_dark', height=max(350, 40 + 22 * len(table)),
+                                      title=f"{SENSITIVITY_LABELS[grid_metric]} por Tasa Libre y Períodos/Año")
+                    st.plotly_chart(fig, use_container_width=True)
+                    
+                    if periods_per_year in grid_periods:
+                        st.markdown(f"#### 📋 Todas las Métricas con {periods_per_year} Períodos/Año")
+                        current = grid.xs(periods_per_year, level='periods')[available]
+                        current.index = [f"{r*100:.2f}%" for r in current.index]
+                        st.dataframe(
+                            current.rename(columns=SENSITIVITY_LABELS).style.format({
+                                'Sharpe': '{:.2f}', 'Sortino': '{:.2f}', 'CAGR - Tasa Libre': '{:.2%}', 'Alpha (Anual)': '{:.2%}'
+                            }),
+                            use_container_width=True
+                        )
+                    
+                    st.download_button("📥 Rejilla de Sensibilidad (CSV)", grid.to_csv(),
+                                     f"sensibilidad_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv",
+                                     use_container_width=True)
+                else:
+                    st.info("ℹ️ Selecciona al menos una periodicidad.")
+        
+        if prefs['advanced']['stress_test']:
+            with st.expander("🌪️ Escenarios de Estrés", expanded=False):
+                # Projecting through beta needs the benchmark from the first scenario on
+                scenario_benchmark = benchmark
+                if (snapshot is None and benchmark is not None and benchmark_type == "Predefinido (yfinance)"
+                        and benchmark_option and benchmark.index.min() > SCENARIO_START.tz_localize(benchmark.index.tz)):
+                    try:
+                        history = fetch_benchmark(benchmark_option, SCENARIO_START, returns.index.max())
+                        if history is not None and len(history) > 0:
+                            scenario_benchmark = history
+                    except Exception:
+                        st.caption(f"ℹ️ No se pudo ampliar el historial de {bench_name}; se usa el rango de la estrategia.")
+                
+                scenarios = stress_test(returns, scenario_benchmark)
+                beta = scenarios.attrs['beta']
+                if beta is None:
+                    st.info("ℹ️ Sin benchmark solo se muestran los escenarios cubiertos por el historial de la estrategia.")
+                else:
+                    st.caption(f"Fuera del historial de la estrategia los retornos se proyectan como β × {bench_name} (β = {beta:.2f})")
+                
+                scenario_df = pd.DataFrame({
+                    'Escenario': scenarios.index,
+                    'Inicio': scenarios['start'].dt.strftime('%Y-%m-%d').values,
+                    'Fin': scenarios['end'].dt.strftime('%Y-%m-%d').values,
+                    'Fuente': scenarios['source'].map(SOURCE_LABELS).values,
+                    'Retorno': [f"{v*100:.2f}%" if pd.notna(v) else "-" for v in scenarios['return']],
+                    'DD Máx': [f"{v*100:.2f}%" if pd.notna(v) else "-" for v in scenarios['max_drawdown']],
+                    'Recuperación': [
+                        "-" if source == SOURCE_NONE else f"{days:.0f} días" if pd.notna(days) else "No recuperado"
+                        for source, days in zip(scenarios['source'], scenarios['recovery_days'])
+                    ]
+                })
+                if 'benchmark_return' in scenarios:
+                    scenario_df[f'Retorno {bench_name}'] = [f"{v*100:.2f}%" if pd.notna(v) else "-" for v in scenarios['benchmark_return']]
+                    scenario_df[f'DD Máx {bench_name}'] = [f"{v*100:.2f}%" if pd.notna(v) else "-" for v in scenarios['benchmark_max_drawdown']]
+                st.dataframe(scenario_df, use_container_width=True, hide_index=True)
+                
+                st.download_button("📥 Escenarios de Estrés (CSV)", scenarios.to_csv(),
+                                 f"escenarios_estres_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv",
+                                 use_container_width=True)
+        
+        if prefs['advanced']['factor_regression']:
+            with st.expander("🧮 Regresión Multifactor", expanded=False):
+                default_factors = [bench_name] if benchmark is not None and bench_name in BENCHMARK_TICKERS else ["SPY"]
+                col1, col2 = st.columns(2)
+                with col1:
+                    factor_tickers = st.multiselect("Factores (Yahoo Finance)", BENCHMARK_TICKERS, default=default_factors)
+                with col2:
+                    factor_file = st.file_uploader("O sube un archivo de factores", type=['csv', 'xlsx', 'txt'],
+                                                   help="Una columna de fecha y una columna de retornos por factor")
+                
+                factor_columns = {}
+                # All downloads start before waiting on any of them
+                requests = {t: request_benchmark(t, returns.index.min(), returns.index.max()) for t in factor_tickers}
+                for ticker, request in requests.items():
+                    try:
+                        factor, stale = wait_for_benchmark(request, ticker, returns.index.min(), returns.index.max())
+                        if factor is not None and len(factor) > 0:
+                            factor_columns[ticker] = factor
+                            if stale:
+                                st.caption(f"⏱️ {ticker}: usando datos descargados antes")
+                    except Exception as e:
+                        st.warning(f"⚠️ No se pudo descargar {ticker}: {e}")
+                
+                if factor_file is not None:
+                    factor_schema = select_format(st.container(), factor_file, 'factors')
+                    file_factors = st.multiselect(
+                        "Columnas de factores", factor_schema['numeric_columns'], default=factor_schema['numeric_columns'],
+                        key='factor_file_columns'
+                    )
+                    if file_factors:
+                        factor_key = content_key(factor_file.getvalue())
+                        # Factor files usually come in percent; detect it per column from the sample
+                        factor_scales = {c: detect_scale(factor_schema['sample'][c]) for c in file_factors}
+                        frame = shared_cache.get_or_load(
+                            ('factors',) + format_key(factor_key, factor_schema) + (factor_schema['date_col'], tuple(file_factors)),
+                            lambda: parse_return_frame(
+                                load_columns(factor_file, factor_key, factor_schema, [factor_schema['date_col']] + file_factors),
+                                factor_schema['date_col'], file_factors, dayfirst=factor_schema['dayfirst'], scales=factor_scales
+                            )
+                        )
+                        factor_columns.update({c: frame[c] for c in frame.columns})
+                
+                if factor_columns:
+                    factors = pd.DataFrame(factor_columns)
+                    try:
+                        fit = ols(returns, factors, periods=periods_per_year)
+                    except ValueError:
+                        fit = None
+                        st.info("ℹ️ Pocas fechas en común entre la estrategia y los factores.")
+                    
+                    if fit is not None:
+                        col1, col2, col3, col4 = st.columns(4)
+                        with col1:
+                            st.metric("Alpha (Anual)", f"{fit['alpha']*100:.2f}%")
+                        with col2:
+                            st.metric("R²", f"{fit['r2']:.2f}")
+                        with col3:
+                            st.metric("R² Ajustado", f"{fit['adj_r2']:.2f}")
+                        with col4:
+                            st.metric("Vol. Residual", f"{fit['residual_vol']*100:.2f}%")
+                        st.caption(f"{fit['observations']} observaciones en común. Alpha = intercepto por período × {periods_per_year}.")
+                        
+                        st.dataframe(
+                            fit['coefficients'].rename(index={'alpha': 'Alpha (por período)'}, columns={
+                                'coefficient': 'Coeficiente', 'stderr': 'Error Estándar', 't_stat': 'Estadístico t'
+                            }).style.format('{:.4f}'),
+                            use_container_width=True
+                        )
+                        
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            regression_mode = st.radio("Ventana", ["Móvil", "Expansiva"], horizontal=True, key='regression_mode')
+                        with col2:
+                            regression_window = st.slider(
+                                "Períodos (Móvil)", 20, max(21, min(1000, fit['observations'] // 2)),
+                                min(periods_per_year, max(20, fit['observations'] // 4)), key='regression_window'
+                            )
+                        rolling_fit = rolling_regression(
+                            returns, factors, window=regression_window if regression_mode == "Móvil" else None,
+                            periods=periods_per_year
+                        )
+                        beta_columns = [c for c in rolling_fit.columns if c.startswith('beta_')]
+                        betas_frame = rolling_fit[beta_columns].rename(columns=lambda c: c[len('beta_'):])
+                        render_chart(
+                            lambda: charts.factor_lines_figure(betas_frame, f"Betas ({regression_mode})", 'Beta'),
+                            lambda: plot_factor_lines(betas_frame, f"Betas ({regression_mode})", 'Beta'),
+                            key='factor_betas'
+                        )
+                        
+                        regression_stat = st.selectbox(
+                            "Serie", ['alpha', 'r2', 'residual_vol'],
+                            format_func=lambda c: {'alpha': 'Alpha (Anual)', 'r2': 'R²', 'residual_vol': 'Vol. Residual'}[c],
+                            key='regression_stat'
+                        )
+                        stat_label = {'alpha': 'Alpha (Anual)', 'r2': 'R²', 'residual_vol': 'Vol. Residual'}[regression_stat]
+                        render_chart(
+                            lambda: charts.rolling_figure(rolling_fit[regression_stat], f"{stat_label} ({regression_mode})", stat_label,
+                                                          percent=regression_stat != 'r2'),
+                            lambda: plot_factor_lines(rolling_fit[[regression_stat]], f"{stat_label} ({regression_mode})", stat_label),
+                            key='factor_stat'
+                        )
+                        
+                        st.download_button("📥 Regresión Móvil (CSV)", rolling_fit.to_csv(),
+                                         f"regresion_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv",
+                                         use_container_width=True)
+                else:
+                    st.info("ℹ️ Elige al menos un factor o sube un archivo de factores.")
         
         if prefs['advanced']['monte_carlo']:
             with st.expander("🎲 Simulación Monte Carlo", expanded=False):
@@ -987,10 +1995,8 @@ else:
                         mu = returns.mean()
                         sigma = returns.std()
                         
-                        simulations = np.zeros((n_days, n_sims))
-                        for i in range(n_sims):
-                            daily_returns = np.random.normal(mu, sigma, n_days)
-                            simulations[:, i] = (1 + daily_returns).cumprod()
+                        # Same draws as one path at a time, compounded in one call
+                        simulations = kernels.compound(np.random.normal(mu, sigma, (n_sims, n_days)).T)
                         
                         fig = go.Figure()
                         
@@ -1016,23 +2022,59 @@ else:
                         st.plotly_chart(fig, use_container_width=True)
                         
                         final_values = simulations[-1, :]
-                        col1, col2, col3, col4 = st.columns(4)
-                        with col1:
-                            st.metric("Valor Final Mediano", f"{np.median(final_values):.2f}x")
-                        with col2:
-                            st.metric("Prob. Beneficio", f"{(final_values > 1).mean()*100:.1f}%")
-                        with col3:
-                            st.metric("Percentil 95", f"{np.percentile(final_values, 95):.2f}x")
-                        with col4:
-                            st.metric("Percentil 5", f"{np.percentile(final_values, 5):.2f}x")
+                        st.session_state['monte_carlo'] = {
+                            'series_key': series_key(returns),
+                            'n_sims': n_sims,
+                            'n_days': n_days,
+                            'p5': np.percentile(simulations, 5, axis=1),
+                            'p50': p50,
+                            'p95': np.percentile(simulations, 95, axis=1),
+                            'median_final': np.median(final_values),
+                            'prob_profit': (final_values > 1).mean(),
+                            'p95_final': np.percentile(final_values, 95),
+                            'p5_final': np.percentile(final_values, 5)
+                        }
                         
                         plt.close('all')
+                
+                mc_summary = st.session_state.get('monte_carlo')
+                if mc_summary is not None and mc_summary['series_key'] != series_key(returns):
+                    mc_summary = None
+                
+                if mc_summary is not None and not run_sim:
+                    st.caption(f"Última simulación: {mc_summary['n_sims']} trayectorias, {mc_summary['n_days']} días")
+                    days = list(range(mc_summary['n_days']))
+                    fig = go.Figure()
+                    fig.add_trace(go.Scatter(x=days, y=mc_summary['p95'], mode='lines', name='Percentil 95',
+                                             line=dict(color='rgba(0, 212, 255, 0.6)', width=1)))
+                    fig.add_trace(go.Scatter(x=days, y=mc_summary['p5'], mode='lines', name='Percentil 5',
+                                             line=dict(color='rgba(0, 212, 255, 0.6)', width=1),
+                                             fill='tonexty', fillcolor='rgba(0, 212, 255, 0.1)'))
+                    fig.add_trace(go.Scatter(x=days, y=mc_summary['p50'], mode='lines', name='Mediana',
+                                             line=dict(color='#00ff88', width=3)))
+                    fig.update_layout(
+                        template='plotly_dark', height=500,
+                        title=f"Monte Carlo: {mc_summary['n_sims']} trayectorias, {mc_summary['n_days']} días",
+                        xaxis_title='Días', yaxis_title='Valor del Portafolio'
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+                
+                if mc_summary is not None:
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("Valor Final Mediano", f"{mc_summary['median_final']:.2f}x")
+                    with col2:
+                        st.metric("Prob. Beneficio", f"{mc_summary['prob_profit']*100:.1f}%")
+                    with col3:
+                        st.metric("Percentil 95", f"{mc_summary['p95_final']:.2f}x")
+                    with col4:
+                        st.metric("Percentil 5", f"{mc_summary['p5_final']:.2f}x")
         
         # === REPORTS ===
         st.markdown("---")
         st.markdown("## 📑 Exportar Reportes")
         
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             if st.button("📊 Tabla de Métricas", use_container_width=True):
@@ -1078,6 +2120,25 @@ else:
                     fig = qs.plots.snapshot(returns, show=False, figsize=(14, 10))
                     st.pyplot(fig, clear_figure=True)
                     plt.close()
+        
+        with col4:
+            if st.button("📦 Guardar Análisis", use_container_width=True):
+                with st.spinner("Empaquetando análisis..."):
+                    if benchmark is not None and 'beta' not in metrics:
+                        metrics.update(benchmark_metrics(returns, benchmark, rf=rf_rate, periods=periods_per_year))
+                    mc_summary = st.session_state.get('monte_carlo')
+                    bundle = save_snapshot(
+                        returns, metrics, st.session_state.preferences, settings,
+                        benchmark=benchmark, bench_name=bench_name if benchmark is not None else None,
+                        episodes=episodes if episodes is not None else drawdown_episodes(returns),
+                        ci=ci,
+                        monte_carlo=mc_summary if mc_summary is not None and mc_summary['series_key'] == series_key(returns) else None,
+                        source=source_name
+                    )
+                    st.download_button("📥 Descargar Análisis", bundle,
+                                     f"analisis_{datetime.now().strftime('%Y%m%d')}.{SNAPSHOT_EXTENSION}",
+                                     "application/zip")
+                    st.caption(f"{len(bundle) / 1024:.0f} KB")
     
     except Exception as e:
         st.error(f"❌ Error al procesar los datos")
@@ -1093,9 +2154,9 @@ else:
             5. **Encoding**: Si el archivo tiene caracteres especiales, guárdalo como UTF-8
             """)
             
-            if 'df' in locals() and df is not None:
+            if 'sample_df' in locals() and sample_df is not None:
                 st.markdown("### 📄 Vista previa de tus datos:")
-                st.dataframe(df.head(10), use_container_width=True)
+                st.dataframe(sample_df.head(10), use_container_width=True)
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,109 @@
+"""Portfolio returns from several asset return columns with drift and rebalancing"""
+import numpy as np
+import pandas as pd
+
+# Calendar rebalancing: holdings are reset to the target weights at the first
+# observation of every period
+REBALANCE_FREQS = {'daily': 'D', 'weekly': 'W', 'monthly': 'M', 'quarterly': 'Q', 'yearly': 'Y'}
+REBALANCE_METHODS = list(REBALANCE_FREQS) + ['threshold', 'none']
+THRESHOLD_BLOCK = 256
+
+
+def normalize_weights(weights, columns):
+    """Target weights aligned to ``columns`` and scaled to sum to one"""
+    if isinstance(weights, dict):
+        weights = [weights.get(c, 0.0) for c in columns]
+    weights = np.asarray(weights, dtype=float)
+    if weights.shape != (len(columns),):
+        raise ValueError(f"Expected {len(columns)} weights, got {weights.shape[0] if weights.ndim else 0}")
+    total = weights.sum()
+    if total == 0 or not np.isfinite(total):
+        raise ValueError("Weights must have a non-zero finite sum")
+    return weights / total
+
+
+def calendar_segments(index, freq):
+    """Segment number of every observation, a new segment per calendar period"""
+    codes = index.to_period(REBALANCE_FREQS[freq]).asi8
+    return np.r_[0, np.cumsum(codes[1:] != codes[:-1])]
+
+
+def threshold_segments(gross, weights, threshold, block=THRESHOLD_BLOCK):
+    """Segment numbers for drift-triggered rebalancing
+
+    Holdings are reset to target after the close of the first observation
+    where any drifted weight is more than ``threshold`` away from its
+    target. Drift is evaluated a block of rows at a time, so the Python loop
+    runs once per rebalance or block rather than once per row.
+    """
+    n = len(gross)
+    boundaries = np.zeros(n, dtype=bool)
+    growth = np.ones(gross.shape[1])
+    position = 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        while position < n:
+            stop = min(n, position + block)
+            cumulative = growth * np.cumprod(gross[position:stop], axis=0)
+            drifted = cumulative * weights
+            drifted /= drifted.sum(axis=1, keepdims=True)
+            breach = np.flatnonzero(np.abs(drifted - weights).max(axis=1) > threshold)
+            if len(breach):
+                position += breach[0] + 1
+                if position < n:
+                    boundaries[position] = True
+                growth = np.ones(gross.shape[1])
+            else:
+                growth = cumulative[-1]
+                position = stop
+    return np.cumsum(boundaries)
+
+
+def build_portfolio(asset_returns, weights, rebalance='monthly', threshold=0.05, track_weights=True):
+    """Portfolio return series from asset returns and target weights
+
+    ``asset_returns`` holds one column per asset (NaN counts as a flat
+    period). Between rebalances every holding compounds on its own, so the
+    weights drift; at a rebalance they are reset to target. ``rebalance`` is
+    one of REBALANCE_METHODS. Returns a dict with the portfolio ``returns``,
+    end-of-period ``weights`` (None unless ``track_weights``), the dates of
+    each ``rebalance`` and the one-way ``turnover`` it required.
+    """
+    if rebalance not in REBALANCE_METHODS:
+        raise ValueError(f"Unknown rebalance method: {rebalance}")
+    asset_returns = asset_returns.sort_index()
+    index = asset_returns.index
+    target = normalize_weights(weights, asset_returns.columns)
+    gross = 1 + asset_returns.fillna(0).to_numpy(dtype=float)
+
+    if rebalance == 'threshold':
+        segments = threshold_segments(gross, target, threshold)
+    elif rebalance == 'none':
+        segments = np.zeros(len(index), dtype=np.int64)
+    else:
+        segments = calendar_segments(index, rebalance)
+
+    starts = np.r_[True, segments[1:] != segments[:-1]]
+    if starts.all():
+        # Rebalanced every observation: no drift within a segment
+        cumulative = gross
+    else:
+        cumulative = pd.DataFrame(gross).groupby(segments).cumprod().to_numpy()
+    value = cumulative @ target
+    previous = np.r_[1.0, value[:-1]]
+    previous[starts] = 1.0
+    returns = pd.Series(value / previous - 1, index=index, name='Portafolio')
+
+    drifted = cumulative * target
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drifted /= value[:, None]
+    # One-way turnover at each rebalance: distance from the drifted weights
+    # carried into the new period back to target
+    rebalance_rows = np.flatnonzero(starts)[1:]
+    turnover = np.abs(drifted[rebalance_rows - 1] - target).sum(axis=1) / 2
+
+    return {
+        'returns': returns,
+        'weights': pd.DataFrame(drifted, index=index, columns=asset_returns.columns) if track_weights else None,
+        'rebalances': index[rebalance_rows],
+        'turnover': pd.Series(turnover, index=index[rebalance_rows], name='turnover'),
+    }
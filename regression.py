@@ -0,0 +1,136 @@
+"""Multi-factor regressions of strategy returns: full sample, rolling and expanding
+
+Every fit regresses the strategy's per-period returns on an intercept plus
+one column per factor. Rolling and expanding fits are recursive: running
+sums of the cross products X'X, X'y and y'y are updated once per period
+(and, for a rolling window, downdated by the period leaving it), so every
+window costs O(k^2) to update instead of a refit, and all the small k x k
+systems are solved in one batched call.
+"""
+import numpy as np
+import pandas as pd
+
+
+def align_factors(returns, factors):
+    """Strategy returns and factor columns on the dates all of them share"""
+    if isinstance(factors, pd.Series):
+        factors = factors.to_frame()
+    data = pd.concat([returns.rename('__y__'), factors], axis=1, join='inner').dropna()
+    return data['__y__'].rename(returns.name), data.drop(columns='__y__').astype(float)
+
+
+def _design(y, X):
+    """Centered inputs with a leading intercept column
+
+    Centering does not change the slopes and keeps the running sums well
+    conditioned; the intercept is shifted back afterwards.
+    """
+    y_mean, x_mean = y.mean(), X.mean(axis=0)
+    design = np.column_stack([np.ones(len(y)), X - x_mean])
+    return y - y_mean, design, y_mean, x_mean
+
+
+def ols(returns, factors, periods=252):
+    """Full-sample least squares fit
+
+    Returns a dict with the ``coefficients`` table (coefficient, standard
+    error and t-stat for the intercept and each factor), the annualized
+    ``alpha`` (intercept x periods), ``betas``, ``r2``, ``adj_r2``, the
+    annualized ``residual_vol`` and the ``residuals`` series.
+    """
+    y, X = align_factors(returns, factors)
+    n, k = X.shape
+    if n <= k + 1:
+        raise ValueError(f"Need more than {k + 1} shared observations, got {n}")
+
+    yc, design, y_mean, x_mean = _design(y.to_numpy(dtype=float), X.to_numpy())
+    coef, _, rank, _ = np.linalg.lstsq(design, yc, rcond=None)
+    residuals = yc - design @ coef
+    dof = n - k - 1
+    sigma2 = residuals @ residuals / dof
+    covariance = sigma2 * np.linalg.pinv(design.T @ design)
+    betas = coef[1:]
+    intercept = coef[0] + y_mean - x_mean @ betas
+
+    # Shifting the intercept back adds the betas' uncertainty at the factor
+    # means: Var(alpha) = sigma²/n + x_mean' Cov(betas) x_mean
+    beta_covariance = covariance[1:, 1:]
+    stderr = np.sqrt(np.r_[covariance[0, 0] + x_mean @ beta_covariance @ x_mean, np.diag(beta_covariance)])
+    total = yc @ yc
+    r2 = 1 - (residuals @ residuals) / total if total > 0 else np.nan
+
+    names = ['alpha'] + list(X.columns)
+    coefficients = pd.DataFrame({
+        'coefficient': np.r_[intercept, betas],
+        'stderr': stderr,
+        't_stat': np.r_[intercept, betas] / stderr,
+    }, index=pd.Index(names, name='term'))
+    return {
+        'coefficients': coefficients,
+        'alpha': intercept * periods,
+        'betas': pd.Series(betas, index=X.columns, name='beta'),
+        'r2': r2,
+        'adj_r2': 1 - (1 - r2) * (n - 1) / dof,
+        'residual_vol': np.sqrt(sigma2 * periods),
+        'residuals': pd.Series(residuals, index=y.index, name='residual'),
+        'observations': n,
+    }
+
+
+def rolling_regression(returns, factors, window=None, periods=252, min_periods=None):
+    """Alpha, betas, R² and residual volatility of every trailing window
+
+    ``window`` None gives expanding fits from the first period. Rows before
+    ``min_periods`` observations (default: the window, or 20 periods for
+    expanding fits) are NaN. Alpha and residual volatility are annualized.
+    Columns: ``alpha``, ``beta_<factor>`` per factor, ``r2``,
+    ``residual_vol``.
+    """
+    y, X = align_factors(returns, factors)
+    n, k = X.shape
+    columns = ['alpha'] + [f'beta_{c}' for c in X.columns] + ['r2', 'residual_vol']
+    if min_periods is None:
+        min_periods = window if window is not None else 20
+    min_periods = max(min_periods, k + 2)
+    if n < min_periods:
+        return pd.DataFrame(np.nan, index=y.index, columns=columns)
+
+    yc, design, y_mean, x_mean = _design(y.to_numpy(dtype=float), X.to_numpy())
+
+    # Running sufficient statistics: one outer product added per period
+    xx = np.cumsum(design[:, :, None] * design[:, None, :], axis=0)
+    xy = np.cumsum(design * yc[:, None], axis=0)
+    yy = np.cumsum(yc ** 2)
+    sy = np.cumsum(yc)
+    count = np.arange(1, n + 1, dtype=float)
+    if window is not None:
+        # Downdate the period that left each window
+        xx[window:] -= xx[:-window].copy()
+        xy[window:] -= xy[:-window].copy()
+        yy[window:] -= yy[:-window].copy()
+        sy[window:] -= sy[:-window].copy()
+        count = np.minimum(count, window)
+
+    valid = np.flatnonzero(count >= min_periods)
+    coef = np.full((n, k + 1), np.nan)
+    # Near-singular windows (a factor flat for the whole window) fall back
+    # to the pseudo-inverse
+    try:
+        coef[valid] = np.linalg.solve(xx[valid], xy[valid][:, :, None])[:, :, 0]
+    except np.linalg.LinAlgError:
+        coef[valid] = (np.linalg.pinv(xx[valid]) @ xy[valid][:, :, None])[:, :, 0]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ssr = np.maximum(yy - np.einsum('ij,ij->i', coef, xy), 0)
+        sst = yy - sy ** 2 / count
+        r2 = 1 - ssr / sst
+        residual_vol = np.sqrt(ssr / (count - k - 1) * periods)
+
+    betas = coef[:, 1:]
+    intercept = coef[:, 0] + y_mean - betas @ x_mean
+    result = pd.DataFrame(
+        np.column_stack([intercept * periods, betas, r2, residual_vol]),
+        index=y.index, columns=columns
+    )
+    result.iloc[:min_periods - 1] = np.nan
+    return result
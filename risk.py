@@ -0,0 +1,192 @@
+"""Value at Risk and expected shortfall: several methods and levels, rolling forecasts and backtests
+
+Historical figures use a single partial selection for all confidence
+levels; parametric and Cornish-Fisher figures come from one set of moments.
+Definitions match quantstats (``var`` is the normal VaR, ``cvar`` the
+normal expected shortfall, ``cvar(method='historical')`` the mean of the
+returns at or below the empirical quantile).
+"""
+import numpy as np
+import pandas as pd
+from scipy.special import xlogy
+from scipy.stats import chi2, norm
+
+VAR_METHODS = ['historical', 'parametric', 'cornish_fisher']
+VAR_LEVELS = (0.90, 0.95, 0.99)
+
+
+def tail_moments(values):
+    """Mean, sample std and bias-corrected skew and excess kurtosis (as pandas computes them)"""
+    n = len(values)
+    mean = values.mean()
+    centered = values - mean
+    m2 = np.mean(centered ** 2)
+    m3 = np.mean(centered ** 3)
+    m4 = np.mean(centered ** 4)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(m2 * n / (n - 1))
+        skew = m3 / m2 ** 1.5 * np.sqrt(n * (n - 1)) / (n - 2)
+        kurt = ((n + 1) * (m4 / m2 ** 2 - 3) + 6) * (n - 1) / ((n - 2) * (n - 3))
+    return mean, std, skew, kurt
+
+
+def historical_var(values, levels=VAR_LEVELS):
+    """Empirical VaR and CVaR for every level from one partial sort
+
+    VaR is the linearly interpolated quantile (as ``np.quantile``); CVaR
+    averages the returns at or below it. Only the lower tail up to the
+    deepest quantile is ever fully sorted.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    alpha = 1 - np.asarray(levels, dtype=float)
+    n = len(values)
+    if n == 0:
+        return np.full(len(alpha), np.nan), np.full(len(alpha), np.nan)
+
+    position = alpha * (n - 1)
+    lo = np.floor(position).astype(int)
+    hi = np.ceil(position).astype(int)
+    partitioned = np.partition(values, np.unique(np.r_[lo, hi]))
+    head = np.sort(partitioned[:hi.max() + 1])
+    var = head[lo] + (head[hi] - head[lo]) * (position - lo)
+
+    # Returns at or below each VaR: all inside the sorted head, except ties
+    # with its last value that the selection left outside
+    prefix = np.r_[0.0, np.cumsum(head)]
+    count = np.searchsorted(head, var, side='right')
+    total = prefix[count]
+    at_edge = count == len(head)
+    if at_edge.any():
+        ties = np.count_nonzero(partitioned[len(head):] == head[-1])
+        count = count + ties * at_edge
+        total = total + ties * head[-1] * at_edge
+    return var, total / count
+
+
+def _truncated_normal_moments(c):
+    """Integrals of z^k times the normal density from -inf to c, k = 0..3"""
+    pdf, cdf = norm.pdf(c), norm.cdf(c)
+    return cdf, -pdf, cdf - c * pdf, -(c ** 2 + 2) * pdf
+
+
+def cornish_fisher_quantile(z, skew, kurt):
+    """Standard normal quantile adjusted for skewness and excess kurtosis"""
+    return (z + (z ** 2 - 1) * skew / 6 + (z ** 3 - 3 * z) * kurt / 24
+            - (2 * z ** 3 - 5 * z) * skew ** 2 / 36)
+
+
+def var_table(returns, levels=VAR_LEVELS):
+    """VaR and CVaR by method and confidence level
+
+    Returns a DataFrame indexed by (method, level) with ``var`` and
+    ``cvar`` columns, both as (negative) per-period returns. Cornish-Fisher
+    CVaR averages the adjusted quantile over the tail in closed form.
+    """
+    values = returns.dropna().to_numpy(dtype=float)
+    levels = np.asarray(levels, dtype=float)
+    alpha = 1 - levels
+    mean, std, skew, kurt = tail_moments(values)
+    z = norm.ppf(alpha)
+
+    hist_var, hist_cvar = historical_var(values, levels)
+
+    param_var = mean + std * z
+    param_cvar = mean - std * norm.pdf(z) / alpha
+
+    cf_var = mean + std * cornish_fisher_quantile(z, skew, kurt)
+    i0, i1, i2, i3 = _truncated_normal_moments(z)
+    tail = (i1 + (i2 - i0) * skew / 6 + (i3 - 3 * i1) * kurt / 24
+            - (2 * i3 - 5 * i1) * skew ** 2 / 36)
+    cf_cvar = mean + std * tail / alpha
+
+    index = pd.MultiIndex.from_product([VAR_METHODS, levels], names=['method', 'level'])
+    return pd.DataFrame({
+        'var': np.r_[hist_var, param_var, cf_var],
+        'cvar': np.r_[hist_cvar, param_cvar, cf_cvar],
+    }, index=index)
+
+
+def rolling_var(returns, window=252, level=0.95, method='historical'):
+    """VaR estimated on each trailing window, aligned to the window's last date
+
+    Shift by one period to use it as the next period's forecast. The
+    historical estimate uses pandas' rolling quantile; the moment-based ones
+    come from cumulative sums of centered powers, so every method is a
+    single pass over the series.
+    """
+    if method not in VAR_METHODS:
+        raise ValueError(f"Unknown VaR method: {method}")
+    returns = returns.dropna()
+    alpha = 1 - level
+    if method == 'historical':
+        return returns.rolling(window).quantile(alpha, interpolation='linear').rename('var')
+
+    values = returns.to_numpy(dtype=float)
+    if len(values) < window:
+        return pd.Series(np.nan, index=returns.index, name='var')
+    # Centering first keeps the power sums numerically stable
+    center = values.mean()
+    centered = values - center
+    sums = [np.r_[0.0, np.cumsum(centered ** k)] for k in (1, 2, 3, 4)]
+    s1, s2, s3, s4 = [(s[window:] - s[:-window]) / window for s in sums]
+
+    # Raw moments of the centered values to central moments of each window
+    mu = s1
+    m2 = s2 - mu ** 2
+    m3 = s3 - 3 * mu * s2 + 2 * mu ** 3
+    m4 = s4 - 4 * mu * s3 + 6 * mu ** 2 * s2 - 3 * mu ** 4
+    n = window
+    z = norm.ppf(alpha)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(np.maximum(m2, 0) * n / (n - 1))
+        if method == 'cornish_fisher':
+            skew = m3 / m2 ** 1.5 * np.sqrt(n * (n - 1)) / (n - 2)
+            kurt = ((n + 1) * (m4 / m2 ** 2 - 3) + 6) * (n - 1) / ((n - 2) * (n - 3))
+            z = cornish_fisher_quantile(z, skew, kurt)
+    var = center + mu + std * z
+    return pd.Series(np.r_[np.full(window - 1, np.nan), var], index=returns.index, name='var')
+
+
+def var_backtest(returns, forecast, level=0.95):
+    """Breach counts and Kupiec / Christoffersen likelihood-ratio tests
+
+    ``forecast`` is the VaR known before each period (e.g. a shifted
+    ``rolling_var``); periods without a forecast are skipped. Kupiec tests
+    the breach frequency, Christoffersen whether breaches cluster, and the
+    conditional coverage test combines both.
+    """
+    aligned = pd.concat([returns, forecast], axis=1, join='inner').dropna()
+    breaches = (aligned.iloc[:, 0] < aligned.iloc[:, 1]).to_numpy()
+    n = len(breaches)
+    x = int(breaches.sum())
+    p = 1 - level
+
+    observed = x / n if n else np.nan
+    kupiec = -2 * (xlogy(n - x, 1 - p) + xlogy(x, p) - xlogy(n - x, 1 - observed) - xlogy(x, observed))
+
+    previous, current = breaches[:-1], breaches[1:]
+    n00 = np.count_nonzero(~previous & ~current)
+    n01 = np.count_nonzero(~previous & current)
+    n10 = np.count_nonzero(previous & ~current)
+    n11 = np.count_nonzero(previous & current)
+    pi0 = n01 / (n00 + n01) if n00 + n01 else 0.0
+    pi1 = n11 / (n10 + n11) if n10 + n11 else 0.0
+    pi = (n01 + n11) / (n - 1) if n > 1 else 0.0
+    independence = -2 * (xlogy(n00 + n10, 1 - pi) + xlogy(n01 + n11, pi)
+                         - xlogy(n00, 1 - pi0) - xlogy(n01, pi0) - xlogy(n10, 1 - pi1) - xlogy(n11, pi1))
+    conditional = kupiec + independence
+
+    return {
+        'observations': n,
+        'breaches': x,
+        'expected': n * p,
+        'breach_rate': observed,
+        'breach_dates': aligned.index[breaches],
+        'kupiec_lr': kupiec,
+        'kupiec_pvalue': chi2.sf(kupiec, 1),
+        'christoffersen_lr': independence,
+        'christoffersen_pvalue': chi2.sf(independence, 1),
+        'conditional_lr': conditional,
+        'conditional_pvalue': chi2.sf(conditional, 2),
+    }
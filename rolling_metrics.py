@@ -0,0 +1,130 @@
+"""Window x metric panels for calendar periods and rolling windows"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+WINDOW_METRICS = ['sharpe', 'volatility', 'max_drawdown', 'win_rate', 'cagr']
+
+# Upper bound on the number of cells materialized at once by the sliding
+# window drawdown scan
+CHUNK_CELLS = 4_000_000
+
+
+def _cumsum0(values):
+    """Cumulative sum with a leading zero, so segment sums are c[end] - c[start]"""
+    out = np.zeros(len(values) + 1)
+    np.cumsum(values, out=out[1:])
+    return out
+
+
+def segment_metrics(values, starts, ends, rf=0.0, periods=252):
+    """Metrics other than drawdown for arbitrary [start, end) segments via cumulative sums"""
+    # Centering first keeps the sum-of-squares variance numerically stable
+    center = values.mean() if len(values) else 0.0
+    centered = values - center
+    s1 = _cumsum0(centered)
+    s2 = _cumsum0(centered ** 2)
+    logs = _cumsum0(np.log1p(values))
+    wins = _cumsum0(values > 0)
+    nonzero = _cumsum0(values != 0)
+
+    count = (ends - starts).astype(float)
+    rf_period = (1 + rf) ** (1.0 / periods) - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_c = (s1[ends] - s1[starts]) / count
+        var = ((s2[ends] - s2[starts]) - count * mean_c ** 2) / (count - 1)
+        std = np.sqrt(np.maximum(var, 0))
+        mean = mean_c + center
+        sharpe = (mean - rf_period) / std * np.sqrt(periods)
+        volatility = std * np.sqrt(periods)
+        win_rate = (wins[ends] - wins[starts]) / (nonzero[ends] - nonzero[starts])
+        cagr = np.expm1((logs[ends] - logs[starts]) * periods / count)
+
+    return {'sharpe': sharpe, 'volatility': volatility, 'win_rate': win_rate, 'cagr': cagr}
+
+
+def rolling_max_drawdown(values, window, step=1):
+    """Max drawdown of every ``step``-th full rolling window using strided views"""
+    log_returns = np.log1p(values)
+    views = sliding_window_view(log_returns, window)[::step]
+    rows_per_chunk = max(1, CHUNK_CELLS // window)
+    out = np.empty(len(views))
+    for start in range(0, len(views), rows_per_chunk):
+        block = np.cumsum(views[start:start + rows_per_chunk], axis=1)
+        # Equity starts at 1 at the beginning of each window
+        peak = np.maximum.accumulate(np.maximum(block, 0), axis=1)
+        out[start:start + rows_per_chunk] = np.expm1((block - peak).min(axis=1))
+    return out
+
+
+def grouped_drawdown(values, group_ids):
+    """Log equity and its running peak inside each contiguous group
+
+    Equity restarts at 1 at every group, so ``relative - peak`` is the log
+    drawdown. Also returns the first position of each group.
+    """
+    log_equity = np.cumsum(np.log1p(values))
+    group_start = np.r_[0, np.flatnonzero(np.diff(group_ids)) + 1]
+    base = np.r_[0.0, log_equity][group_start]
+    rank = np.repeat(np.arange(len(group_start)), np.diff(np.r_[group_start, len(values)]))
+    relative = log_equity - base[rank]
+
+    # Lifting each group above everything before it lets a single running
+    # maximum restart at every group boundary
+    lift = np.abs(relative).max() * 2 + 1
+    lifted = np.maximum(relative, 0) + rank * lift
+    peak = np.maximum.accumulate(lifted) - rank * lift
+    return relative, peak, group_start
+
+
+def grouped_max_drawdown(values, group_ids):
+    """Max drawdown inside each contiguous group, restarting equity at every group"""
+    relative, peak, group_start = grouped_drawdown(values, group_ids)
+    return np.minimum.reduceat(np.expm1(relative - peak), group_start)
+
+
+def rolling_metrics(returns, window=252, rf=0.0, periods=252, step=1):
+    """Metrics for every rolling window, indexed by the window's last date
+
+    Drawdowns cost O(window) per window, so long intraday histories can
+    evaluate only every ``step``-th window (walk-forward style).
+    """
+    returns = returns.dropna()
+    values = returns.to_numpy(dtype=float)
+    if len(values) < window:
+        return pd.DataFrame(columns=WINDOW_METRICS, dtype=float)
+
+    ends = np.arange(window, len(values) + 1, step)
+    starts = ends - window
+    panel = segment_metrics(values, starts, ends, rf=rf, periods=periods)
+    panel['max_drawdown'] = rolling_max_drawdown(values, window, step=step)
+    return pd.DataFrame(panel, index=returns.index[ends - 1])[WINDOW_METRICS]
+
+
+def calendar_metrics(returns, rf=0.0, periods=252, freq='year'):
+    """Metrics for every calendar year (or quarter/month) in the series"""
+    returns = returns.dropna().sort_index()
+    values = returns.to_numpy(dtype=float)
+    if len(values) == 0:
+        return pd.DataFrame(columns=WINDOW_METRICS, dtype=float)
+
+    index = returns.index
+    if freq == 'year':
+        keys = index.year
+        group_ids = keys.to_numpy()
+    else:
+        keys = index.to_period({'quarter': 'Q', 'month': 'M'}[freq])
+        group_ids = keys.asi8
+    starts = np.r_[0, np.flatnonzero(np.diff(group_ids)) + 1]
+    ends = np.r_[starts[1:], len(values)]
+
+    panel = segment_metrics(values, starts, ends, rf=rf, periods=periods)
+    panel['max_drawdown'] = grouped_max_drawdown(values, group_ids)
+    return pd.DataFrame(panel, index=keys[starts])[WINDOW_METRICS]
+
+
+def stability_summary(panel):
+    """Distribution of each metric across windows"""
+    summary = panel.describe(percentiles=[0.05, 0.25, 0.5, 0.75, 0.95]).T
+    summary['positive'] = (panel > 0).mean()
+    return summary.drop(columns=['count'])
@@ -0,0 +1,166 @@
+"""Historical stress scenarios replayed on the strategy, projected through beta where needed"""
+import numpy as np
+import pandas as pd
+
+import kernels
+from analytics import calculate_beta
+from rolling_metrics import grouped_drawdown
+
+# Name, first and last day of each market episode
+SCENARIOS = [
+    ("Burbuja Puntocom", "2000-03-24", "2002-10-09"),
+    ("Atentados 11-S", "2001-09-10", "2001-09-21"),
+    ("Crisis Financiera Global", "2007-10-09", "2009-03-09"),
+    ("Quiebra de Lehman", "2008-09-12", "2008-11-20"),
+    ("Flash Crash 2010", "2010-04-23", "2010-07-02"),
+    ("Rebaja de Rating EE.UU. 2011", "2011-07-22", "2011-10-03"),
+    ("Devaluación del Yuan 2015", "2015-08-10", "2015-08-25"),
+    ("Volmageddon 2018", "2018-01-26", "2018-02-08"),
+    ("Corrección Q4 2018", "2018-09-20", "2018-12-24"),
+    ("Crash COVID-19", "2020-02-19", "2020-03-23"),
+    ("Subida de Tipos 2022", "2022-01-03", "2022-10-12"),
+    ("Crisis Bancaria 2023", "2023-03-08", "2023-03-17"),
+]
+SCENARIO_START = min(pd.Timestamp(start) for _, start, _ in SCENARIOS)
+
+SOURCE_HISTORY = 'historical'
+SOURCE_PROJECTED = 'projected'
+SOURCE_MIXED = 'mixed'
+SOURCE_NONE = 'none'
+
+
+def _naive(series):
+    """``series`` on a timezone-naive index, keeping local wall times like the scenario dates"""
+    if series is not None and getattr(series.index, 'tz', None) is not None:
+        series = series.tz_localize(None)
+    return series
+
+
+def combine_with_projection(returns, benchmark=None):
+    """Strategy returns extended with beta x benchmark outside the strategy's history
+
+    Inside the strategy's own date span missing periods count as flat. The
+    second value flags projected periods, the third is the beta used.
+    """
+    returns = returns.dropna()
+    if benchmark is None:
+        return returns, np.zeros(len(returns), dtype=bool), None
+
+    benchmark = benchmark.dropna()
+    beta = calculate_beta(returns, benchmark)
+    index = returns.index.union(benchmark.index)
+    strategy = returns.reindex(index)
+    projected = strategy.isna().to_numpy() & ((index < returns.index[0]) | (index > returns.index[-1]))
+    combined = strategy.to_numpy(dtype=float, copy=True)
+    combined[projected] = beta * benchmark.reindex(index).to_numpy(dtype=float)[projected]
+    combined = np.nan_to_num(combined, nan=0.0)
+    return pd.Series(combined, index=index), projected, beta
+
+
+def _window_positions(index, scenarios):
+    starts = index.searchsorted(pd.to_datetime([s for _, s, _ in scenarios]), side='left')
+    ends = index.searchsorted(pd.to_datetime([e for _, _, e in scenarios]) + pd.Timedelta(days=1), side='left')
+    return starts, np.maximum(ends, starts)
+
+
+def _gather(starts, ends):
+    """Positions of every window laid end to end, with the window number of each"""
+    lengths = ends - starts
+    window = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets, window
+
+
+def replay(series, starts, ends):
+    """Return, max drawdown, valley and recovery of ``series`` over every window
+
+    Windows may overlap; they are laid end to end and measured in one pass,
+    with equity restarting at 1 on each window's first day. Recovery is the
+    first position, possibly after the window, where equity is back at the
+    peak that preceded the window's deepest point (-1 if never).
+    """
+    values = series.to_numpy(dtype=float)
+    count = len(starts)
+    result = {
+        'return': np.full(count, np.nan),
+        'max_drawdown': np.full(count, np.nan),
+        'valley': np.full(count, -1),
+        'recovery': np.full(count, -1),
+    }
+    observed = np.flatnonzero(ends > starts)
+    if len(observed) == 0:
+        return result
+
+    positions, window = _gather(starts[observed], ends[observed])
+    relative, peak, group_start = grouped_drawdown(values[positions], window)
+    drawdown = relative - peak
+
+    # Deepest point of each window: sort by (window, drawdown), take the first
+    order = np.lexsort((drawdown, window))
+    first = np.r_[0, np.flatnonzero(np.diff(window[order])) + 1]
+    deepest = order[first]
+    group_end = np.r_[group_start[1:], len(positions)]
+
+    result['return'][observed] = np.expm1(relative[group_end - 1])
+    result['max_drawdown'][observed] = np.expm1(drawdown[deepest])
+    result['valley'][observed] = positions[deepest]
+
+    # Peak level in absolute log equity, then the first later period at or
+    # above it, for all windows at once
+    log_equity = np.cumsum(np.log1p(values))
+    base = np.r_[0.0, log_equity][starts[observed]]
+    target = base + peak[deepest]
+    valley = positions[deepest]
+    recovery = kernels.first_reach(log_equity, target - 1e-12, valley)
+    recovery[drawdown[deepest] >= 0] = valley[drawdown[deepest] >= 0]
+    result['recovery'][observed] = recovery
+    return result
+
+
+def stress_test(returns, benchmark=None, scenarios=SCENARIOS):
+    """One row per scenario: strategy and benchmark return, drawdown and recovery
+
+    ``source`` tells whether the strategy figures come from its own history,
+    from beta x benchmark (before or after the strategy existed), a mix of
+    both, or are missing. ``recovery_days`` is counted from the scenario's
+    deepest point and is NaN while still under water.
+    """
+    returns, benchmark = _naive(returns), _naive(benchmark)
+    combined, projected, beta = combine_with_projection(returns, benchmark)
+    index = combined.index
+    starts, ends = _window_positions(index, scenarios)
+    strategy = replay(combined, starts, ends)
+
+    lengths = ends - starts
+    projected_count = np.r_[0, np.cumsum(projected)]
+    projected_count = projected_count[ends] - projected_count[starts]
+    source = np.select(
+        [lengths == 0, projected_count == 0, projected_count == lengths],
+        [SOURCE_NONE, SOURCE_HISTORY, SOURCE_PROJECTED],
+        SOURCE_MIXED
+    )
+
+    valley = strategy['valley']
+    recovery = strategy['recovery']
+    valley_dates = index[np.maximum(valley, 0)].where(valley >= 0)
+    recovery_dates = index[np.maximum(recovery, 0)].where(recovery >= 0)
+
+    table = pd.DataFrame({
+        'start': pd.to_datetime([s for _, s, _ in scenarios]),
+        'end': pd.to_datetime([e for _, _, e in scenarios]),
+        'source': source,
+        'periods': lengths,
+        'return': strategy['return'],
+        'max_drawdown': strategy['max_drawdown'],
+        'valley': valley_dates,
+        'recovery': recovery_dates,
+        'recovery_days': (recovery_dates - valley_dates).days,
+    }, index=pd.Index([name for name, _, _ in scenarios], name='scenario'))
+
+    if benchmark is not None:
+        bench = benchmark.dropna().reindex(index).fillna(0)
+        bench_stats = replay(bench, starts, ends)
+        table['benchmark_return'] = bench_stats['return']
+        table['benchmark_max_drawdown'] = bench_stats['max_drawdown']
+    table.attrs['beta'] = beta
+    return table
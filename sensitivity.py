@@ -0,0 +1,83 @@
+"""Risk-free rate and annualization sensitivity of the rf-dependent metrics"""
+import numpy as np
+import pandas as pd
+
+SENSITIVITY_METRICS = ['sharpe', 'sortino', 'cagr_excess', 'alpha']
+
+
+def return_moments(returns):
+    """Statistics every grid point reuses: moments, sorted returns and prefix sums"""
+    values = returns.dropna().to_numpy(dtype=float)
+    ordered = np.sort(values)
+    return {
+        'n': len(values),
+        'mean': values.mean(),
+        'std': values.std(ddof=1),
+        'log_total': np.log1p(values).sum(),
+        'sorted': ordered,
+        'prefix_sum': np.r_[0.0, np.cumsum(ordered)],
+        'prefix_sq': np.r_[0.0, np.cumsum(ordered ** 2)],
+    }
+
+
+def _benchmark_moments(returns, benchmark):
+    """Beta and log growth over the dates shared with the benchmark"""
+    common_dates = returns.index.intersection(benchmark.index)
+    if len(common_dates) == 0:
+        return None
+    aligned_returns = returns.loc[common_dates].to_numpy(dtype=float)
+    aligned_benchmark = benchmark.loc[common_dates].to_numpy(dtype=float)
+    variance = np.var(aligned_benchmark)
+    beta = np.cov(aligned_returns, aligned_benchmark)[0][1] / variance if variance else 0.0
+    return {
+        'n': len(common_dates),
+        'beta': beta,
+        'log_strategy': np.log1p(aligned_returns).sum(),
+        'log_benchmark': np.log1p(aligned_benchmark).sum(),
+    }
+
+
+def sensitivity_grid(returns, rates, periods, benchmark=None, moments=None):
+    """Sharpe, Sortino, excess CAGR and alpha for every (rf, periods) pair
+
+    Definitions follow quantstats (Sharpe, Sortino, CAGR) and
+    ``analytics.calculate_alpha``. The annual rf is de-annualized per
+    periodicity; Sortino's downside deviation below each per-period rf
+    comes from prefix sums over the sorted returns, so the whole grid is
+    evaluated without touching the series again. Returns a DataFrame
+    indexed by (rf, periods) with one column per metric.
+    """
+    moments = moments or return_moments(returns)
+    rf, per = np.meshgrid(np.asarray(rates, dtype=float), np.asarray(periods, dtype=float), indexing='ij')
+    rf_period = (1 + rf) ** (1 / per) - 1
+    n = moments['n']
+
+    excess_mean = moments['mean'] - rf_period
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = excess_mean / moments['std'] * np.sqrt(per)
+
+        # Sum of squared shortfalls below t: S2 - 2tS1 + t^2 k over the k
+        # returns strictly below t
+        k = np.searchsorted(moments['sorted'], rf_period, side='left')
+        shortfall = (moments['prefix_sq'][k] - 2 * rf_period * moments['prefix_sum'][k]
+                     + rf_period ** 2 * k)
+        downside = np.sqrt(np.maximum(shortfall, 0) / n)
+        sortino = excess_mean / downside * np.sqrt(per)
+
+    cagr_excess = np.exp(moments['log_total'] * per / n) - 1 - rf
+
+    alpha = np.full(rf.shape, np.nan)
+    if benchmark is not None:
+        bench = _benchmark_moments(returns.dropna(), benchmark.dropna())
+        if bench is not None:
+            strategy_return = np.exp(bench['log_strategy'] * per / bench['n']) - 1
+            benchmark_return = np.exp(bench['log_benchmark'] * per / bench['n']) - 1
+            alpha = strategy_return - (rf + bench['beta'] * (benchmark_return - rf))
+
+    index = pd.MultiIndex.from_arrays([rf.ravel(), per.ravel().astype(int)], names=['rf', 'periods'])
+    return pd.DataFrame({
+        'sharpe': sharpe.ravel(),
+        'sortino': sortino.ravel(),
+        'cagr_excess': cagr_excess.ravel(),
+        'alpha': alpha.ravel(),
+    }, index=index)
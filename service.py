@@ -0,0 +1,288 @@
+"""Local HTTP service exposing the dashboard's metrics pipeline
+
+Accepts a return series (optionally with a benchmark) as JSON, CSV or Arrow
+and answers with the metrics table, drawdown episodes and rolling stats
+the dashboard computes. Run it on its own:
+
+    python service.py --port 8765 --workers 8
+
+or inside the Streamlit process by setting BQUANT_SERVICE_PORT, in which
+case it shares the dashboard's caches.
+
+Endpoints (POST with the series as body, parameters in the query string):
+    /metrics    headline metrics          rf, periods, benchmark
+    /drawdowns  drawdown episodes         top
+    /rolling    rolling-window panel      window, step, rf, periods
+    /analyze    all of the above
+    GET /health cache statistics
+
+JSON bodies look like {"returns": {"2024-01-02": 0.01, ...}, "benchmark": {...}}
+or {"returns": {"dates": [...], "values": [...]}}. CSV and Arrow tables use
+the first column as dates, the second as returns and an optional third as
+benchmark returns.
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from analytics import parse_returns, fetch_benchmark, headline_metrics, drawdown_episodes
+from data_cache import shared_cache, content_key
+from rolling_metrics import rolling_metrics
+
+logger = logging.getLogger(__name__)
+
+ARROW_TYPES = ('application/vnd.apache.arrow.stream', 'application/vnd.apache.arrow.file')
+
+
+class ServiceError(Exception):
+    """Request error reported to the client with an HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _series_from_json(obj, name):
+    if isinstance(obj, dict) and 'dates' in obj and 'values' in obj:
+        series = pd.Series(obj['values'], index=obj['dates'], dtype=float)
+    elif isinstance(obj, dict):
+        series = pd.Series(obj, dtype=float)
+    else:
+        raise ServiceError(f"'{name}' must be a mapping of date to value or {{dates, values}}")
+    series.index = pd.to_datetime(series.index)
+    series = series.sort_index().dropna()
+    if series.abs().mean() > 1:
+        series = series / 100
+    return series
+
+
+def _table_from_body(body, content_type):
+    """DataFrame from a CSV or Arrow body"""
+    if content_type in ARROW_TYPES:
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ServiceError("Arrow payloads need pyarrow installed", status=415)
+        reader = pa.ipc.open_stream if content_type.endswith('stream') else pa.ipc.open_file
+        return reader(pa.BufferReader(body)).read_all().to_pandas()
+    return pd.read_csv(io.BytesIO(body))
+
+
+def parse_payload(body, content_type):
+    """Returns and optional benchmark as columns of one DataFrame"""
+    if not body:
+        raise ServiceError("Empty request body")
+    try:
+        if content_type == 'application/json':
+            payload = json.loads(body)
+            if 'returns' not in payload:
+                raise ServiceError("JSON payload needs a 'returns' field")
+            columns = {'returns': _series_from_json(payload['returns'], 'returns')}
+            if payload.get('benchmark') is not None:
+                columns['benchmark'] = _series_from_json(payload['benchmark'], 'benchmark')
+        elif content_type == 'text/csv' or content_type in ARROW_TYPES:
+            table = _table_from_body(body, content_type)
+            if len(table.columns) < 2:
+                raise ServiceError("Table needs a date column and a returns column")
+            date_col = table.columns[0]
+            columns = {'returns': parse_returns(table, date_col, table.columns[1])}
+            if len(table.columns) > 2:
+                columns['benchmark'] = parse_returns(table, date_col, table.columns[2])
+        else:
+            raise ServiceError(f"Unsupported content type: {content_type}", status=415)
+    except ServiceError:
+        raise
+    except Exception as e:
+        raise ServiceError(f"Could not parse payload: {e}")
+    return pd.DataFrame(columns)
+
+
+def load_payload(body, content_type):
+    """Parsed payload, shared by content hash with every other request and session"""
+    frame = shared_cache.get_or_load(
+        ('payload', content_type, content_key(body)),
+        lambda: parse_payload(body, content_type)
+    )
+    returns = frame['returns'].dropna()
+    benchmark = frame['benchmark'].dropna() if 'benchmark' in frame else None
+    if len(returns) < 2:
+        raise ServiceError("Need at least two return observations")
+    return returns, benchmark
+
+
+def _param(params, name, cast, default):
+    if name not in params:
+        return default
+    try:
+        return cast(params[name][-1])
+    except ValueError:
+        raise ServiceError(f"Invalid value for '{name}': {params[name][-1]}")
+
+
+def _require(value, name, minimum):
+    if value is not None and value < minimum:
+        raise ServiceError(f"'{name}' must be at least {minimum}, got {value}")
+    return value
+
+
+def _clean(value):
+    """JSON-safe scalars: NaN/inf become null, timestamps ISO strings"""
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return None if pd.isna(value) else pd.Timestamp(value).isoformat()
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value) if math.isfinite(value) else None
+    return value
+
+
+def _frame_records(frame):
+    return [{k: _clean(v) for k, v in row.items()} for row in frame.to_dict(orient='records')]
+
+
+def analyze(path, params, body, content_type):
+    """Run the requested part of the pipeline and return a JSON-ready dict"""
+    returns, benchmark = load_payload(body, content_type)
+    rf = _param(params, 'rf', float, 0.0)
+    periods = _require(_param(params, 'periods', int, 252), 'periods', 1)
+    ticker = _param(params, 'benchmark', str, None)
+    if ticker and benchmark is None:
+        benchmark = fetch_benchmark(ticker, returns.index.min(), returns.index.max())
+        if benchmark is None:
+            raise ServiceError(f"No benchmark data for {ticker}", status=502)
+
+    result = {'observations': len(returns), 'start': _clean(returns.index[0]), 'end': _clean(returns.index[-1])}
+    if path in ('/metrics', '/analyze'):
+        metrics = headline_metrics(returns, benchmark, rf=rf, periods=periods)
+        result['metrics'] = {k: _clean(v) for k, v in metrics.items()}
+    if path in ('/drawdowns', '/analyze'):
+        episodes = drawdown_episodes(returns)
+        top = _require(_param(params, 'top', int, None), 'top', 0)
+        if top is not None:
+            episodes = episodes.nsmallest(top, 'max_drawdown')
+        result['drawdowns'] = _frame_records(episodes)
+    if path in ('/rolling', '/analyze'):
+        window = _require(_param(params, 'window', int, periods), 'window', 2)
+        step = _require(_param(params, 'step', int, max(1, (len(returns) - window) // 2000)), 'step', 1)
+        panel = rolling_metrics(returns, window=window, rf=rf, periods=periods, step=step)
+        result['rolling'] = {
+            'window': window,
+            'step': step,
+            'index': [_clean(d) for d in panel.index],
+            'metrics': {col: [_clean(v) for v in panel[col].to_numpy()] for col in panel.columns},
+        }
+    return result
+
+
+class AnalyticsHandler(BaseHTTPRequestHandler):
+    routes = ('/metrics', '/drawdowns', '/rolling', '/analyze')
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, allow_nan=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/health':
+            self._send_json(200, {'status': 'ok', 'cache': shared_cache.stats()})
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path not in self.routes:
+            self._send_json(404, {'error': 'Not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        content_type = (self.headers.get('Content-Type') or 'application/json').split(';')[0].strip()
+        try:
+            self._send_json(200, analyze(url.path, parse_qs(url.query), body, content_type))
+        except ServiceError as e:
+            self._send_json(e.status, {'error': str(e)})
+        except Exception:
+            # Details stay in the server log, not in the response
+            logger.exception("Request failed")
+            self._send_json(500, {'error': 'Internal error'})
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTP server that hands every connection to a fixed-size worker pool"""
+
+    def __init__(self, address, handler, workers=8):
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analytics')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def create_server(host='127.0.0.1', port=8765, workers=8):
+    return PooledHTTPServer((host, port), AnalyticsHandler, workers=workers)
+
+
+_embedded_server = None
+_embedded_lock = threading.Lock()
+
+
+def ensure_server(host='127.0.0.1', port=8765, workers=8):
+    """Start the service once per process in a background thread"""
+    global _embedded_server
+    with _embedded_lock:
+        if _embedded_server is None:
+            _embedded_server = create_server(host, port, workers)
+            threading.Thread(target=_embedded_server.serve_forever, daemon=True,
+                             name='analytics-service').start()
+            logger.info("Analytics service listening on %s:%s", host, port)
+        return _embedded_server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BQuantStats analytics HTTP service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=8, help="concurrent requests")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    server = create_server(args.host, args.port, args.workers)
+    logger.info("Analytics service listening on %s:%s", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Save and restore a complete analysis as a single compact bundle
+
+A bundle is a zip archive: return series, drawdown episodes and bootstrap
+intervals as Parquet tables, and metrics, preferences, settings and the
+Monte Carlo summary as JSON. Restoring one needs no upload, benchmark
+download or recomputation as long as rf and periods are unchanged.
+"""
+import io
+import json
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = 'bqs'
+
+
+class SnapshotError(Exception):
+    """Bundle that cannot be read or was written by an incompatible version"""
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _write_table(archive, name, frame):
+    buffer = io.BytesIO()
+    frame.to_parquet(buffer)
+    # Parquet is already compressed
+    archive.writestr(f'{name}.parquet', buffer.getvalue(), compress_type=zipfile.ZIP_STORED)
+
+
+def _write_json(archive, name, payload):
+    archive.writestr(f'{name}.json', json.dumps(payload, default=_json_default))
+
+
+def save_snapshot(returns, metrics, preferences, settings, benchmark=None, bench_name=None,
+                  episodes=None, ci=None, monte_carlo=None, source=None):
+    """Bundle bytes for an analysis; optional parts are left out when None"""
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'source': source,
+        'series_names': {'returns': returns.name, 'benchmark': benchmark.name if benchmark is not None else None},
+        'bench_name': bench_name,
+        'parts': [],
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        tables = {
+            'returns': returns.rename('returns').to_frame(),
+            'benchmark': benchmark.rename('benchmark').to_frame() if benchmark is not None else None,
+            'episodes': episodes,
+            'ci': ci,
+        }
+        for name, frame in tables.items():
+            if frame is not None:
+                _write_table(archive, name, frame)
+                manifest['parts'].append(name)
+
+        documents = {
+            'metrics': metrics,
+            'preferences': preferences,
+            'settings': settings,
+            'monte_carlo': monte_carlo,
+        }
+        for name, payload in documents.items():
+            if payload is not None:
+                _write_json(archive, name, payload)
+                manifest['parts'].append(name)
+        _write_json(archive, 'manifest', manifest)
+    return buffer.getvalue()
+
+
+def load_snapshot(data):
+    """Dict with the bundle's series, tables and documents (None for missing parts)"""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise SnapshotError("Not an analysis bundle")
+
+    with archive:
+        names = set(archive.namelist())
+        if 'manifest.json' not in names:
+            raise SnapshotError("Bundle has no manifest")
+        try:
+            manifest = json.loads(archive.read('manifest.json'))
+        except ValueError:
+            raise SnapshotError("Bundle manifest is not valid JSON")
+        version = manifest.get('version') if isinstance(manifest, dict) else None
+        if not isinstance(version, int) or not 1 <= version <= SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported bundle version: {version}")
+        # Every part the manifest lists must be in the archive
+        missing = [part for part in manifest.get('parts', [])
+                   if f'{part}.parquet' not in names and f'{part}.json' not in names]
+        if missing:
+            raise SnapshotError(f"Bundle is missing: {', '.join(missing)}")
+
+        def table(name):
+            if f'{name}.parquet' not in names:
+                return None
+            return pd.read_parquet(io.BytesIO(archive.read(f'{name}.parquet')))
+
+        def document(name):
+            if f'{name}.json' not in names:
+                return None
+            return json.loads(archive.read(f'{name}.json'))
+
+        returns = table('returns')
+        if returns is None:
+            raise SnapshotError("Bundle has no returns")
+        benchmark = table('benchmark')
+        series_names = manifest.get('series_names', {})
+        return {
+            'manifest': manifest,
+            'returns': returns['returns'].rename(series_names.get('returns')),
+            'benchmark': benchmark['benchmark'].rename(series_names.get('benchmark')) if benchmark is not None else None,
+            'bench_name': manifest.get('bench_name'),
+            'episodes': table('episodes'),
+            'ci': table('ci'),
+            'metrics': document('metrics'),
+            'preferences': document('preferences'),
+            'settings': document('settings') or {},
+            'monte_carlo': document('monte_carlo'),
+        }
@@ -0,0 +1,59 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+import quantstats as qs
+
+from bootstrap import METRICS, bootstrap_ci, bootstrap_metrics, matrix_metrics, stationary_indices
+
+
+@pytest.fixture
+def returns():
+    index = pd.bdate_range('2010-01-01', periods=2520)
+    return pd.Series(np.random.default_rng(1).normal(0.0004, 0.01, len(index)), index=index)
+
+
+def quantstats_metrics(returns, rf, periods):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return [
+            qs.stats.sharpe(returns, rf=rf, periods=periods),
+            qs.stats.sortino(returns, rf=rf, periods=periods),
+            qs.stats.cagr(returns, periods=periods),
+            qs.stats.max_drawdown(returns),
+            qs.stats.calmar(returns, periods=periods),
+        ]
+
+
+@pytest.mark.parametrize('rf', [0.0, 0.045])
+def test_matrix_metrics_match_quantstats(returns, rf):
+    values = returns.to_numpy()
+    # Each row is one replicate; a sample that is the series itself and its
+    # reverse must give the quantstats figures of those series
+    samples = np.vstack([values, values[::-1]])
+    result = matrix_metrics(samples.copy(), np.log1p(samples), rf=rf, periods=252)
+    for row, series in zip(result, (returns, pd.Series(values[::-1], index=returns.index))):
+        np.testing.assert_allclose(row, quantstats_metrics(series, rf, 252), rtol=1e-9)
+
+
+def test_stationary_indices_wrap_in_blocks():
+    idx = stationary_indices(500, 50, 10, np.random.default_rng(0))
+    assert idx.shape == (50, 500) and idx.min() >= 0 and idx.max() < 500
+    steps = (np.diff(idx, axis=1) % 500) == 1
+    # Mean block length close to the requested 10
+    assert 8 < steps.size / (~steps).sum() < 12
+
+
+def test_replicates_independent_of_workers(returns):
+    single = bootstrap_metrics(returns, n_boot=1200, batch_size=500, seed=3, n_jobs=1)
+    threaded = bootstrap_metrics(returns, n_boot=1200, batch_size=500, seed=3, n_jobs=4)
+    pd.testing.assert_frame_equal(single, threaded)
+
+
+@pytest.mark.parametrize('method', ['iid', 'stationary'])
+def test_intervals_cover_the_point_estimate(returns, method):
+    ci = bootstrap_ci(returns, rf=0.02, n_boot=2000, method=method, seed=0)
+    point = quantstats_metrics(returns, 0.02, 252)
+    assert list(ci.index) == METRICS
+    assert (ci['lower'] < point).all() and (point < ci['upper']).all()
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from calendar_returns import calendar_returns
+
+
+def compounded(returns, keys):
+    return returns.groupby(keys).apply(lambda r: (1 + r).prod() - 1)
+
+
+@pytest.fixture
+def intraday():
+    # Trading hours only, with a gap of several months so some buckets are empty
+    index = pd.date_range('2021-11-01', '2023-03-31', freq='h')
+    index = index[(index.hour >= 9) & (index.hour <= 17) & (index.dayofweek < 5)]
+    index = index[(index < '2022-05-01') | (index >= '2022-09-01')]
+    rng = np.random.default_rng(10)
+    returns = pd.Series(rng.normal(0.00005, 0.002, len(index)), index=index)
+    returns.iloc[::97] = np.nan
+    return returns
+
+
+def test_buckets_match_groupby(intraday):
+    result = calendar_returns(intraday)
+    returns = intraday.dropna()
+    index = returns.index
+
+    monthly = compounded(returns, index.to_period('M'))
+    np.testing.assert_allclose(result['monthly'].to_numpy(), monthly.to_numpy(), rtol=1e-10)
+    assert result['monthly'].index.equals(monthly.index.to_timestamp(how='end').normalize())
+
+    quarterly = compounded(returns, index.to_period('Q'))
+    np.testing.assert_allclose(result['quarterly'].to_numpy(), quarterly.to_numpy(), rtol=1e-10)
+    assert result['quarterly'].index.equals(quarterly.index)
+
+    for key, labels in (('yearly', index.year), ('weekday', index.dayofweek), ('hour', index.hour)):
+        expected = compounded(returns, labels)
+        np.testing.assert_allclose(result[key].to_numpy(), expected.to_numpy(), rtol=1e-10)
+        assert list(result[key].index) == list(expected.index)
+
+
+def test_monthly_table(intraday):
+    table = calendar_returns(intraday)['monthly_table']
+    returns = intraday.dropna()
+    expected = compounded(returns, [returns.index.year, returns.index.month]).unstack()
+    assert list(table.columns) == list(range(1, 13)) and list(table.index) == [2021, 2022, 2023]
+    pd.testing.assert_frame_equal(table, expected.reindex(columns=range(1, 13)), check_names=False, check_index_type=False, rtol=1e-10)
+    assert table.loc[2022, [5, 6, 7, 8]].isna().all()
+
+
+def test_daily_and_empty_series():
+    daily = pd.Series([0.01, -0.02, 0.03], index=pd.to_datetime(['2024-01-30', '2024-01-31', '2024-02-01']))
+    result = calendar_returns(daily)
+    assert result['hour'].empty
+    assert result['monthly'].to_numpy() == pytest.approx([1.01 * 0.98 - 1, 0.03])
+    empty = calendar_returns(pd.Series([], index=pd.DatetimeIndex([]), dtype=float))
+    assert all(len(v) == 0 for v in empty.values())
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_cache import SharedDataCache, content_key
+
+
+def series(seed, n=100):
+    index = pd.bdate_range('2024-01-01', periods=n)
+    return pd.Series(np.random.default_rng(seed).normal(0, 0.01, n), index=index, name=f's{seed}')
+
+
+def size(value):
+    return SharedDataCache(max_bytes=10 ** 9)._pack(value)[1]
+
+
+def test_least_recently_used_evicted_first():
+    items = {k: series(k) for k in range(4)}
+    cache = SharedDataCache(max_bytes=3 * size(items[0]))
+    for k in range(3):
+        cache.put(k, items[k])
+    assert cache.get(0) is not None  # 0 is now the most recent, 1 the least
+    cache.put(3, items[3])
+    assert cache.get(1) is None
+    assert [k for k in range(4) if cache.get(k) is not None] == [0, 2, 3]
+    stats = cache.stats()
+    assert stats['entries'] == 3 and stats['bytes'] <= stats['max_bytes']
+
+
+def test_oversized_value_is_returned_but_not_kept():
+    cache = SharedDataCache(max_bytes=size(series(0)))
+    cache.put('small', series(0))
+    big = cache.put('big', series(1, n=1000))
+    pd.testing.assert_series_equal(big, series(1, n=1000))
+    assert cache.get('big') is None and cache.get('small') is not None
+
+
+def test_replacing_a_key_keeps_the_byte_count():
+    cache = SharedDataCache(max_bytes=10 ** 6)
+    cache.put('a', series(0))
+    cache.put('a', series(1))
+    assert cache.stats()['bytes'] == size(series(1))
+    pd.testing.assert_series_equal(cache.get('a'), series(1))
+
+
+def test_cached_series_are_read_only_and_shared():
+    cache = SharedDataCache(max_bytes=10 ** 6)
+    original = series(0)
+    cache.put('a', original)
+    first, second = cache.get('a'), cache.get('a')
+    assert np.shares_memory(first.to_numpy(), second.to_numpy())
+    with pytest.raises(ValueError):
+        first.to_numpy()[0] = 1.0
+    # The stored buffer is a copy, so the caller's series stays writable
+    original.iloc[0] = 1.0
+    assert cache.get('a').iloc[0] != 1.0
+
+
+def test_float32_mode_halves_float_series():
+    value = series(0)
+    cache = SharedDataCache(max_bytes=10 ** 6, float32=True)
+    stored = cache.put('a', value)
+    assert stored.dtype == np.float32
+    np.testing.assert_allclose(stored.to_numpy(), value.to_numpy(), rtol=1e-6)
+    assert cache.stats()['bytes'] == size(value) - value.to_numpy().nbytes // 2
+    assert cache.put('ints', pd.Series([1, 2, 3])).dtype == np.int64
+
+
+def test_get_or_load_counts_hits_and_misses():
+    cache = SharedDataCache(max_bytes=10 ** 6)
+    calls = []
+    load = lambda: calls.append(1) or pd.DataFrame({'x': [1.0, 2.0]})
+    first = cache.get_or_load(('frame', 1), load)
+    second = cache.get_or_load(('frame', 1), load)
+    assert len(calls) == 1 and first is not second
+    pd.testing.assert_frame_equal(first, second)
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+    with pytest.raises(TypeError):
+        cache.put('dict', {'x': 1})
+    assert content_key(b'abc') == content_key(b'abc') != content_key(b'abd')
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import kernels
+
+pytestmark = pytest.mark.parametrize('backend', kernels.BACKENDS)
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(11)
+    values = rng.normal(0.0002, 0.01, 5000)
+    values[rng.random(len(values)) < 0.05] = 0.0
+    return values
+
+
+def test_drawdown(values, backend):
+    equity = np.cumprod(1 + values)
+    expected = equity / np.maximum.accumulate(np.maximum(equity, 1.0)) - 1
+    np.testing.assert_array_equal(kernels.drawdown(values, backend), expected)
+    np.testing.assert_array_equal(kernels.drawdown(values, backend), kernels._drawdown_loop(values))
+
+
+def test_episode_bounds(values, backend):
+    drawdown = kernels.drawdown(values, 'numpy')
+    for series in (drawdown, np.r_[drawdown, -0.01], np.zeros(10), np.array([])):
+        result = kernels.episode_bounds(series, backend)
+        for got, expected in zip(result, kernels._episode_bounds_loop(series)):
+            np.testing.assert_array_equal(got, expected)
+
+
+def test_streaks(values, backend):
+    assert kernels.streaks(values, backend) == kernels._streaks_loop(values)
+    assert kernels.streaks(np.array([]), backend) == (0, 0)
+    assert kernels.streaks(np.array([1, 1, 0, 1, -1, -1, -1, 2]), backend) == (2, 3)
+
+
+def test_first_reach(values, backend):
+    series = np.cumsum(np.log1p(values))
+    starts = np.array([0, 100, 2500, 4999, 4000])
+    targets = np.r_[series[[0, 100, 2500, 4999]] + 0.02, series.max() + 1]
+    expected = kernels._first_reach_loop(series, targets, starts)
+    assert expected[-1] == -1
+    np.testing.assert_array_equal(kernels.first_reach(series, targets, starts, backend), expected)
+
+
+def test_compound(values, backend):
+    matrix = values.reshape(-1, 100)
+    expected = np.cumprod(1 + matrix, axis=0)
+    np.testing.assert_array_equal(kernels.compound(matrix, backend), expected)
+    np.testing.assert_array_equal(kernels.compound(matrix, backend), kernels._compound_loop(matrix))
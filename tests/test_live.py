@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import strategy_metrics
+from live import LivePathError, OnlineMetrics, ReturnsTail, resolve_live_path
+
+
+def test_resolve_live_path_stays_under_root(tmp_path):
+    root = tmp_path / 'live'
+    root.mkdir()
+    (root / 'strategy.csv').write_text('Date,Returns\n')
+    (tmp_path / 'secret.csv').write_text('x\n')
+    os.symlink(tmp_path / 'secret.csv', root / 'link.csv')
+
+    assert resolve_live_path('strategy.csv', str(root)) == os.path.realpath(root / 'strategy.csv')
+    assert resolve_live_path(str(root / 'strategy.csv'), str(root)) == os.path.realpath(root / 'strategy.csv')
+    for path in ('../secret.csv', str(tmp_path / 'secret.csv'), 'link.csv', '/etc/passwd', 'missing.csv'):
+        with pytest.raises(LivePathError):
+            resolve_live_path(path, str(root))
+    with pytest.raises(LivePathError):
+        resolve_live_path('strategy.csv', None)
+    # Symlinks in a followed directory that leave the root are skipped
+    assert ReturnsTail(str(root), root=str(root))._files() == [str(root / 'strategy.csv')]
+
+
+def test_online_metrics_match_strategy_metrics():
+    rng = np.random.default_rng(1)
+    returns = pd.Series(rng.normal(0.0003, 0.012, 2000), index=pd.bdate_range('2015-01-01', periods=2000))
+    returns.iloc[::37] = 0
+    for rf in (0.0, 0.03):
+        online = OnlineMetrics(rf, 252)
+        cuts = np.r_[0, np.sort(rng.choice(np.arange(1, 2000), 50, replace=False)), 2000]
+        for start, end in zip(cuts[:-1], cuts[1:]):
+            online.update(returns.iloc[start:end])
+        live = online.metrics()
+        reference = strategy_metrics(returns, rf=rf, periods=252)
+        for key in live.keys() & reference.keys():
+            assert live[key] == pytest.approx(reference[key], rel=1e-8, abs=1e-12), key
+
+
+def test_scale_detected_from_first_data_rows(tmp_path):
+    path = tmp_path / 'strategy.csv'
+    path.write_text('Date,Returns\n')
+    tail = ReturnsTail(str(path))
+    assert len(tail.poll()) == 0
+    assert tail.schema is None
+
+    with open(path, 'a') as f:
+        f.write('2024-01-02,1.5\n2024-01-03,-0.8\n2024-01-04,0.4\n')
+    np.testing.assert_allclose(tail.poll().to_numpy(), [0.015, -0.008, 0.004])
+
+    with open(path, 'a') as f:
+        f.write('2024-01-05,0.2\n2024-01-08,-0.')
+    np.testing.assert_allclose(tail.poll().to_numpy(), [0.002])
+    with open(path, 'a') as f:
+        f.write('3\n')
+    np.testing.assert_allclose(tail.poll().to_numpy(), [-0.003])
+
+
+def test_directory_files_are_read_once(tmp_path):
+    (tmp_path / 'a.csv').write_text('Date,Returns\n2024-01-02,0.01\n2024-01-03,0.02\n')
+    tail = ReturnsTail(str(tmp_path))
+    assert len(tail.poll()) == 2
+    (tmp_path / 'b.csv').write_text('Date,Returns\n2024-01-03,0.02\n2024-01-04,-0.01\n')
+    new = tail.poll()
+    assert list(new.index) == [pd.Timestamp('2024-01-04')]
+    assert len(tail.poll()) == 0
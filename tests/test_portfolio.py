@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import parse_return_frame
+from portfolio import REBALANCE_FREQS, build_portfolio, normalize_weights, threshold_segments
+from upload_schema import detect_scale
+
+
+@pytest.fixture
+def asset_returns():
+    index = pd.bdate_range('2020-01-01', periods=700)
+    rng = np.random.default_rng(4)
+    values = rng.normal([0.0005, 0.0002, 0.0008], [0.02, 0.005, 0.03], (len(index), 3))
+    frame = pd.DataFrame(values, index=index, columns=['stocks', 'bonds', 'crypto'])
+    frame.iloc[5:9, 2] = np.nan
+    return frame
+
+
+def hand_rolled(asset_returns, weights, rebalance, threshold=None):
+    """One row at a time: compound holdings, then reset to target after the close when due"""
+    target = np.asarray(weights, dtype=float) / np.sum(weights)
+    gross = 1 + asset_returns.fillna(0).to_numpy()
+    index = asset_returns.index
+    periods = index.to_period(REBALANCE_FREQS[rebalance]) if rebalance in REBALANCE_FREQS else None
+    holdings = target.copy()
+    returns, drifted, turnover, dates = [], [], [], []
+    for i in range(len(gross)):
+        before = holdings.sum()
+        holdings = holdings * gross[i]
+        returns.append(holdings.sum() / before - 1)
+        weights_now = holdings / holdings.sum()
+        drifted.append(weights_now)
+        if i + 1 == len(gross):
+            break
+        if periods is not None:
+            due = periods[i + 1] != periods[i]
+        elif rebalance == 'threshold':
+            due = np.abs(weights_now - target).max() > threshold
+        else:
+            due = False
+        if due:
+            turnover.append(np.abs(weights_now - target).sum() / 2)
+            dates.append(index[i + 1])
+            holdings = target * holdings.sum()
+    return np.array(returns), np.array(drifted), np.array(turnover), pd.DatetimeIndex(dates)
+
+
+@pytest.mark.parametrize('rebalance, threshold', [
+    ('daily', None), ('weekly', None), ('monthly', None), ('quarterly', None), ('yearly', None),
+    ('none', None), ('threshold', 0.02), ('threshold', 0.1),
+])
+def test_matches_hand_rolled_loop(asset_returns, rebalance, threshold):
+    weights = [60, 30, 10]
+    result = build_portfolio(asset_returns, weights, rebalance=rebalance, threshold=threshold)
+    returns, drifted, turnover, dates = hand_rolled(asset_returns, weights, rebalance, threshold)
+    np.testing.assert_allclose(result['returns'].to_numpy(), returns, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(result['weights'].to_numpy(), drifted, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(result['turnover'].to_numpy(), turnover, rtol=0, atol=1e-12)
+    assert result['rebalances'].equals(dates) and result['turnover'].index.equals(dates)
+
+
+def test_threshold_rebalances_on_small_blocks(asset_returns):
+    # Breaches found across block edges give the same segments as one long block
+    gross = 1 + asset_returns.fillna(0).to_numpy()
+    target = normalize_weights([1, 1, 1], asset_returns.columns)
+    np.testing.assert_array_equal(threshold_segments(gross, target, 0.03, block=7),
+                                  threshold_segments(gross, target, 0.03, block=10_000))
+
+
+def test_weights_validation(asset_returns):
+    assert normalize_weights({'bonds': 1, 'stocks': 3}, asset_returns.columns).tolist() == [0.75, 0.25, 0.0]
+    with pytest.raises(ValueError):
+        normalize_weights([1, 2], asset_returns.columns)
+    with pytest.raises(ValueError):
+        normalize_weights([0, 0, 0], asset_returns.columns)
+    with pytest.raises(ValueError):
+        build_portfolio(asset_returns, [1, 1, 1], rebalance='hourly')
+
+
+def test_percent_columns_scaled_as_detected(asset_returns):
+    # Daily percent columns average well under 1% in absolute value, so the
+    # mean-based guess alone would read them as decimals
+    upload = (asset_returns.fillna(0) * [100, 100, 1]).rename_axis('Date').reset_index()
+    scales = {c: detect_scale(upload[c]) for c in asset_returns.columns}
+    assert scales == {'stocks': 100, 'bonds': 100, 'crypto': 1}
+    frame = parse_return_frame(upload, 'Date', list(asset_returns.columns), scales=scales)
+    np.testing.assert_allclose(frame.to_numpy(), asset_returns.fillna(0).to_numpy())
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from regression import ols, rolling_regression
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(7)
+    index = pd.bdate_range('2015-01-01', periods=1500)
+    factors = pd.DataFrame(rng.normal([0.0004, 0.001, -0.0002], [0.01, 0.006, 0.004], (len(index), 3)),
+                           index=index, columns=['MKT', 'SMB', 'HML'])
+    returns = 0.0003 + factors @ np.array([0.9, 0.3, -0.2]) + rng.normal(0, 0.005, len(index))
+    return returns.rename('strategy'), factors
+
+
+def lstsq_fit(returns, factors):
+    X = np.column_stack([np.ones(len(factors)), factors.to_numpy()])
+    y = returns.to_numpy()
+    coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+    residuals = y - X @ coef
+    sigma2 = residuals @ residuals / (len(y) - X.shape[1])
+    stderr = np.sqrt(np.diag(sigma2 * np.linalg.inv(X.T @ X)))
+    return coef, stderr, residuals
+
+
+def test_ols_matches_uncentered_lstsq(data):
+    returns, factors = data
+    fit = ols(returns, factors, periods=252)
+    coef, stderr, residuals = lstsq_fit(returns, factors)
+
+    np.testing.assert_allclose(fit['coefficients']['coefficient'], coef, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(fit['coefficients']['stderr'], stderr, rtol=1e-9)
+    np.testing.assert_allclose(fit['coefficients']['t_stat'], coef / stderr, rtol=1e-9)
+    np.testing.assert_allclose(fit['residuals'], residuals, atol=1e-12)
+    assert fit['alpha'] == pytest.approx(coef[0] * 252)
+
+
+def test_rolling_regression_matches_window_fits(data):
+    returns, factors = data
+    rolling = rolling_regression(returns, factors, window=120, periods=252)
+    for end in (119, 500, 1499):
+        window = slice(end - 119, end + 1)
+        coef, _, residuals = lstsq_fit(returns.iloc[window], factors.iloc[window])
+        row = rolling.iloc[end]
+        assert row['alpha'] == pytest.approx(coef[0] * 252, rel=1e-8)
+        np.testing.assert_allclose(row[['beta_MKT', 'beta_SMB', 'beta_HML']], coef[1:], rtol=1e-8)
+        assert row['residual_vol'] == pytest.approx(np.sqrt(residuals @ residuals / (120 - 4) * 252), rel=1e-8)
+    assert rolling.iloc[:119].isna().all().all()
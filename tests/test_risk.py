@@ -0,0 +1,93 @@
+import math
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+import quantstats as qs
+from scipy.stats import norm
+
+from risk import VAR_METHODS, cornish_fisher_quantile, rolling_var, tail_moments, var_backtest, var_table
+
+
+@pytest.fixture
+def returns():
+    index = pd.bdate_range('2016-01-01', periods=900)
+    rng = np.random.default_rng(6)
+    return pd.Series(rng.standard_t(4, len(index)) * 0.008 + 0.0003, index=index)
+
+
+def test_backtest_on_hand_built_breaches():
+    # 20 periods with breaches at 2, 3 and 10: one breach follows another once
+    index = pd.bdate_range('2024-01-01', periods=20)
+    forecast = pd.Series(-0.02, index=index)
+    returns = pd.Series(0.001, index=index)
+    returns.iloc[[2, 3, 10]] = -0.05
+    result = var_backtest(returns, forecast, level=0.95)
+    assert (result['observations'], result['breaches']) == (20, 3)
+    assert result['expected'] == pytest.approx(1.0)
+    assert list(result['breach_dates']) == list(index[[2, 3, 10]])
+
+    n, x, p = 20, 3, 0.05
+    kupiec = -2 * ((n - x) * math.log(1 - p) + x * math.log(p)
+                   - (n - x) * math.log(1 - x / n) - x * math.log(x / n))
+    # Transitions: 14 calm->calm, 2 calm->breach, 2 breach->calm, 1 breach->breach
+    n00, n01, n10, n11 = 14, 2, 2, 1
+    pi0, pi1, pi = n01 / (n00 + n01), n11 / (n10 + n11), (n01 + n11) / 19
+    independence = -2 * ((n00 + n10) * math.log(1 - pi) + (n01 + n11) * math.log(pi)
+                         - n00 * math.log(1 - pi0) - n01 * math.log(pi0)
+                         - n10 * math.log(1 - pi1) - n11 * math.log(pi1))
+    assert result['kupiec_lr'] == pytest.approx(kupiec, rel=1e-12)
+    assert result['christoffersen_lr'] == pytest.approx(independence, rel=1e-12)
+    assert result['conditional_lr'] == pytest.approx(kupiec + independence, rel=1e-12)
+    # Chi-square tails in closed form: erfc(sqrt(x/2)) with 1 dof, exp(-x/2) with 2
+    assert result['kupiec_pvalue'] == pytest.approx(math.erfc(math.sqrt(kupiec / 2)), rel=1e-9)
+    assert result['christoffersen_pvalue'] == pytest.approx(math.erfc(math.sqrt(independence / 2)), rel=1e-9)
+    assert result['conditional_pvalue'] == pytest.approx(math.exp(-(kupiec + independence) / 2), rel=1e-9)
+
+
+def test_backtest_without_breaches_or_forecasts():
+    index = pd.bdate_range('2024-01-01', periods=10)
+    forecast = pd.Series(-0.02, index=index)
+    forecast.iloc[:4] = np.nan
+    result = var_backtest(pd.Series(0.001, index=index), forecast, level=0.99)
+    assert (result['observations'], result['breaches']) == (6, 0)
+    assert result['kupiec_lr'] == pytest.approx(-2 * 6 * math.log(0.99))
+    assert result['christoffersen_lr'] == 0
+
+
+def test_var_table_matches_quantstats_and_numpy(returns):
+    table = var_table(returns)
+    values = returns.to_numpy()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for level in (0.90, 0.95, 0.99):
+            hist = np.quantile(values, 1 - level)
+            assert table.loc[('historical', level), 'var'] == pytest.approx(hist, rel=1e-12)
+            assert table.loc[('historical', level), 'cvar'] == pytest.approx(values[values <= hist].mean(), rel=1e-12)
+            assert table.loc[('parametric', level), 'var'] == pytest.approx(qs.stats.value_at_risk(returns, confidence=level), rel=1e-9)
+            assert table.loc[('parametric', level), 'cvar'] == pytest.approx(
+                values.mean() - values.std(ddof=1) * norm.pdf(norm.ppf(1 - level)) / (1 - level), rel=1e-9)
+
+
+@pytest.mark.parametrize('method', VAR_METHODS)
+def test_rolling_var_matches_each_window(returns, method):
+    window, level = 120, 0.95
+    rolling = rolling_var(returns, window=window, level=level, method=method)
+    assert rolling.index.equals(returns.index) and rolling.iloc[:window - 1].isna().all()
+    z = norm.ppf(1 - level)
+    for end in (window, 300, 611, len(returns)):
+        values = returns.iloc[end - window:end].to_numpy()
+        mean, std, skew, kurt = tail_moments(values)
+        expected = {
+            'historical': np.quantile(values, 1 - level),
+            'parametric': mean + std * z,
+            'cornish_fisher': mean + std * cornish_fisher_quantile(z, skew, kurt),
+        }[method]
+        assert rolling.iloc[end - 1] == pytest.approx(expected, rel=1e-9)
+
+
+def test_rolling_var_shorter_than_window(returns):
+    assert rolling_var(returns.iloc[:50], window=120, method='parametric').isna().all()
+    with pytest.raises(ValueError):
+        rolling_var(returns, method='garch')
@@ -0,0 +1,80 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+import quantstats as qs
+
+import rolling_metrics
+from rolling_metrics import WINDOW_METRICS, calendar_metrics, grouped_drawdown, rolling_metrics as rolling_panel
+
+
+@pytest.fixture
+def returns():
+    index = pd.bdate_range('2017-01-02', periods=1100)
+    rng = np.random.default_rng(9)
+    values = rng.normal(0.0004, 0.012, len(index))
+    values[rng.random(len(index)) < 0.05] = 0.0
+    return pd.Series(values, index=index)
+
+
+def quantstats_row(returns, rf, periods):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return {
+            'sharpe': qs.stats.sharpe(returns, rf=rf, periods=periods),
+            'volatility': qs.stats.volatility(returns, periods=periods),
+            'max_drawdown': qs.stats.max_drawdown(returns),
+            'win_rate': qs.stats.win_rate(returns),
+            'cagr': qs.stats.cagr(returns, periods=periods),
+        }
+
+
+@pytest.mark.parametrize('window, step', [(60, 1), (252, 7), (500, 250)])
+def test_rolling_windows_match_quantstats(returns, window, step):
+    panel = rolling_panel(returns, window=window, rf=0.03, periods=252, step=step)
+    ends = np.arange(window, len(returns) + 1, step)
+    assert list(panel.columns) == WINDOW_METRICS
+    assert panel.index.equals(returns.index[ends - 1])
+    for end in ends[[0, len(ends) // 2, -1]]:
+        expected = quantstats_row(returns.iloc[end - window:end], 0.03, 252)
+        row = panel.loc[returns.index[end - 1]]
+        for metric in WINDOW_METRICS:
+            assert row[metric] == pytest.approx(expected[metric], rel=1e-9), metric
+
+
+def test_drawdown_chunks_do_not_change_results(returns, monkeypatch):
+    full = rolling_metrics.rolling_max_drawdown(returns.to_numpy(), 100, step=3)
+    # A budget smaller than one window still processes a row per chunk
+    for cells in (1, 350, 10_000):
+        monkeypatch.setattr(rolling_metrics, 'CHUNK_CELLS', cells)
+        np.testing.assert_array_equal(rolling_metrics.rolling_max_drawdown(returns.to_numpy(), 100, step=3), full)
+
+
+def test_window_longer_than_series(returns):
+    panel = rolling_panel(returns.iloc[:100], window=252)
+    assert panel.empty and list(panel.columns) == WINDOW_METRICS
+    assert len(rolling_panel(returns.iloc[:252], window=252)) == 1
+
+
+@pytest.mark.parametrize('freq, key', [('year', lambda i: i.year), ('month', lambda i: i.to_period('M'))])
+def test_calendar_groups_match_quantstats(returns, freq, key):
+    panel = calendar_metrics(returns, rf=0.01, periods=252, freq=freq)
+    groups = returns.groupby(key(returns.index))
+    assert len(panel) == groups.ngroups
+    for label, group in list(groups)[:3] + list(groups)[-2:]:
+        expected = quantstats_row(group, 0.01, 252)
+        for metric in WINDOW_METRICS:
+            assert panel.loc[label, metric] == pytest.approx(expected[metric], rel=1e-9, nan_ok=True), metric
+
+
+def test_grouped_drawdown_restarts_every_group():
+    # A deep first group must not raise the peak seen by the later ones
+    values = np.array([0.5, -0.2, 0.1, -0.05, 0.02, -0.3, 0.4, 0.0])
+    groups = np.array([0, 0, 0, 1, 1, 2, 2, 2])
+    relative, peak, starts = grouped_drawdown(values, groups)
+    assert starts.tolist() == [0, 3, 5]
+    for start, end in ((0, 3), (3, 5), (5, 8)):
+        log_equity = np.cumsum(np.log1p(values[start:end]))
+        np.testing.assert_allclose(relative[start:end], log_equity, atol=1e-15)
+        np.testing.assert_allclose(peak[start:end], np.maximum.accumulate(np.maximum(log_equity, 0)), atol=1e-12)
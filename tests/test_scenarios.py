@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from scenarios import replay, stress_test
+
+
+def returns_series(tz=None):
+    index = pd.bdate_range('2007-01-01', '2012-12-31', tz=tz)
+    rng = np.random.default_rng(3)
+    return pd.Series(rng.normal(0.0003, 0.012, len(index)), index=index)
+
+
+def test_timezone_aware_returns_match_naive():
+    naive = stress_test(returns_series())
+    for tz in ('UTC', 'America/New_York'):
+        aware = stress_test(returns_series(tz), returns_series(tz) * 0.5)
+        pd.testing.assert_frame_equal(aware[naive.columns].drop(columns='source'), naive.drop(columns='source'))
+
+
+def test_replay_matches_window_by_window():
+    series = returns_series()
+    starts = np.array([0, 100, 250, 1400, 1500])
+    ends = np.array([300, 180, 900, 1560, 1500])
+    result = replay(series, starts, ends)
+    log_equity = np.cumsum(np.log1p(series.to_numpy()))
+    for k, (start, end) in enumerate(zip(starts, ends)):
+        if end == start:
+            assert result['valley'][k] == -1 and np.isnan(result['return'][k])
+            continue
+        equity = np.cumprod(1 + series.to_numpy()[start:end])
+        peak = np.maximum.accumulate(np.maximum(equity, 1.0))
+        drawdown = equity / peak - 1
+        valley = start + int(np.argmin(drawdown))
+        assert np.isclose(result['return'][k], equity[-1] - 1)
+        assert np.isclose(result['max_drawdown'][k], drawdown.min())
+        assert result['valley'][k] == valley
+        # Brute force: first later period back at the pre-valley peak
+        level = np.r_[0.0, log_equity][start] + np.log(peak[valley - start])
+        later = np.flatnonzero(log_equity[valley:] >= level - 1e-12)
+        assert result['recovery'][k] == (valley + later[0] if len(later) else -1)
@@ -0,0 +1,48 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+import quantstats as qs
+
+from analytics import calculate_alpha
+from sensitivity import sensitivity_grid
+
+RATES = [0.0, 0.02, 0.05]
+PERIODS = [12, 52, 252, 365]
+
+
+@pytest.fixture
+def series():
+    index = pd.bdate_range('2015-01-01', periods=1500)
+    rng = np.random.default_rng(7)
+    benchmark = pd.Series(rng.normal(0.0003, 0.011, len(index)), index=index)
+    returns = 0.6 * benchmark + rng.normal(0.0002, 0.008, len(index))
+    return returns, benchmark
+
+
+def test_grid_matches_quantstats(series):
+    returns, benchmark = series
+    grid = sensitivity_grid(returns, RATES, PERIODS, benchmark=benchmark)
+    assert len(grid) == len(RATES) * len(PERIODS)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for rf in RATES:
+            for periods in PERIODS:
+                row = grid.loc[(rf, periods)]
+                assert row['sharpe'] == pytest.approx(qs.stats.sharpe(returns, rf=rf, periods=periods), rel=1e-9)
+                assert row['sortino'] == pytest.approx(qs.stats.sortino(returns, rf=rf, periods=periods), rel=1e-9)
+                assert row['cagr_excess'] == pytest.approx(qs.stats.cagr(returns, periods=periods) - rf, rel=1e-9)
+                assert row['alpha'] == pytest.approx(calculate_alpha(returns, benchmark, rf=rf, periods=periods), rel=1e-9)
+
+
+def test_rf_between_returns_matches_direct_downside(series):
+    returns, _ = series
+    # Per-period rf landing between sorted returns, and above all of them
+    for rf in (0.5, 1e6):
+        grid = sensitivity_grid(returns, [rf], [252])
+        threshold = (1 + rf) ** (1 / 252) - 1
+        downside = np.sqrt((np.minimum(returns - threshold, 0) ** 2).mean())
+        expected = (returns.mean() - threshold) / downside * np.sqrt(252)
+        assert grid['sortino'].iloc[0] == pytest.approx(expected, rel=1e-9)
+        assert np.isnan(grid['alpha'].iloc[0])
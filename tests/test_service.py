@@ -0,0 +1,115 @@
+import io
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import drawdown_episodes, headline_metrics
+from service import create_server
+
+
+@pytest.fixture(scope='module')
+def url():
+    server = create_server(port=0, workers=4)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='module')
+def frame():
+    index = pd.bdate_range('2019-01-01', periods=600)
+    rng = np.random.default_rng(8)
+    benchmark = rng.normal(0.0003, 0.01, len(index))
+    returns = 0.8 * benchmark + rng.normal(0.0001, 0.006, len(index))
+    return pd.DataFrame({'date': index, 'returns': returns, 'benchmark': benchmark})
+
+
+def request(url, path, body=None, content_type='application/json'):
+    """Status and decoded JSON of one request (POST when there is a body)"""
+    req = urllib.request.Request(url + path, data=body, headers={'Content-Type': content_type} if body is not None else {})
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def json_body(frame, benchmark=True):
+    dates = frame['date'].dt.strftime('%Y-%m-%d').tolist()
+    payload = {'returns': {'dates': dates, 'values': frame['returns'].tolist()}}
+    if benchmark:
+        payload['benchmark'] = dict(zip(dates, frame['benchmark']))
+    return json.dumps(payload).encode()
+
+
+def arrow_body(frame):
+    pa = pytest.importorskip('pyarrow')
+    sink = io.BytesIO()
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def test_health(url):
+    status, payload = request(url, '/health')
+    assert status == 200 and payload['status'] == 'ok' and 'hits' in payload['cache']
+
+
+def test_payload_formats_agree(url, frame):
+    returns = frame.set_index('date')['returns']
+    benchmark = frame.set_index('date')['benchmark']
+    expected = headline_metrics(returns, benchmark, rf=0.02, periods=252)
+    bodies = {
+        'application/json': json_body(frame),
+        'text/csv': frame.to_csv(index=False).encode(),
+        'application/vnd.apache.arrow.stream': arrow_body(frame),
+    }
+    for content_type, body in bodies.items():
+        status, payload = request(url, '/metrics?rf=0.02', body, content_type)
+        assert status == 200, payload
+        assert payload['observations'] == len(frame)
+        for key in ('sharpe', 'cagr', 'max_drawdown', 'beta', 'alpha'):
+            assert payload['metrics'][key] == pytest.approx(expected[key], rel=1e-9)
+
+
+def test_analyze_sections(url, frame):
+    status, payload = request(url, '/analyze?window=60&step=5&top=3', json_body(frame, benchmark=False))
+    assert status == 200
+    episodes = drawdown_episodes(frame.set_index('date')['returns']).nsmallest(3, 'max_drawdown')
+    assert [e['max_drawdown'] for e in payload['drawdowns']] == pytest.approx(episodes['max_drawdown'].tolist())
+    rolling = payload['rolling']
+    assert (rolling['window'], rolling['step']) == (60, 5)
+    assert len(rolling['index']) == len(range(59, len(frame), 5))
+
+
+@pytest.mark.parametrize('query', ['window=0', 'window=-5', 'window=1', 'step=0', 'step=-1', 'top=-1', 'periods=0', 'window=abc'])
+def test_invalid_parameters_are_client_errors(url, frame, query):
+    status, payload = request(url, f'/analyze?{query}', json_body(frame, benchmark=False))
+    assert status == 400 and payload['error'].startswith(("'", 'Invalid value'))
+
+
+@pytest.mark.parametrize('body, content_type', [
+    (b'', 'application/json'),
+    (b'{"values": [1, 2]}', 'application/json'),
+    (b'not json', 'application/json'),
+    (b'date\n2020-01-01\n', 'text/csv'),
+    (b'{"returns": {"2020-01-01": 0.01}}', 'application/json'),
+])
+def test_bad_payloads_are_client_errors(url, body, content_type):
+    status, payload = request(url, '/metrics', body, content_type)
+    assert status == 400 and payload['error']
+
+
+def test_unknown_route_and_content_type(url, frame):
+    assert request(url, '/nothing', b'{}')[0] == 404
+    assert request(url, '/nothing')[0] == 404
+    status, payload = request(url, '/metrics', b'<xml/>', 'application/xml')
+    assert status == 415 and 'application/xml' in payload['error']
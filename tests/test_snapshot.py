@@ -0,0 +1,84 @@
+import io
+import json
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import drawdown_episodes
+from snapshot import SNAPSHOT_VERSION, SnapshotError, load_snapshot, save_snapshot
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def analysis():
+    index = pd.date_range('2022-01-03 09:30', periods=400, freq='h', tz='Europe/Madrid')
+    rng = np.random.default_rng(12)
+    returns = pd.Series(rng.normal(0.0002, 0.004, len(index)), index=index, name='Estrategia')
+    benchmark = pd.Series(rng.normal(0.0001, 0.003, len(index)), index=index, name='SPY')
+    return {
+        'returns': returns,
+        'benchmark': benchmark,
+        'bench_name': 'SPY',
+        'metrics': {'sharpe': np.float64(1.25), 'observations': np.int64(400), 'last_date': index[-1]},
+        'preferences': {'metrics': {'basic': True}},
+        'settings': {'rf': 0.02, 'periods': 252 * 7},
+        'episodes': drawdown_episodes(returns),
+        'ci': pd.DataFrame({'lower': [0.1, -0.2], 'upper': [0.5, 0.3]}, index=['sharpe', 'cagr']),
+        'source': 'upload.csv',
+    }
+
+
+def rewrite(data, manifest=None, drop=()):
+    """The bundle with its manifest replaced and some members left out"""
+    source = zipfile.ZipFile(io.BytesIO(data))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name in source.namelist():
+            if name in drop:
+                continue
+            content = json.dumps(manifest) if name == 'manifest.json' and manifest is not None else source.read(name)
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def test_round_trip(analysis):
+    bundle = load_snapshot(save_snapshot(**analysis))
+    pd.testing.assert_series_equal(bundle['returns'], analysis['returns'], check_freq=False)
+    pd.testing.assert_series_equal(bundle['benchmark'], analysis['benchmark'], check_freq=False)
+    assert str(bundle['returns'].index.tz) == 'Europe/Madrid'
+    pd.testing.assert_frame_equal(bundle['episodes'], analysis['episodes'])
+    pd.testing.assert_frame_equal(bundle['ci'], analysis['ci'])
+    assert bundle['metrics'] == {'sharpe': 1.25, 'observations': 400, 'last_date': analysis['returns'].index[-1].isoformat()}
+    assert bundle['settings'] == analysis['settings'] and bundle['bench_name'] == 'SPY'
+    manifest = bundle['manifest']
+    assert manifest['version'] == SNAPSHOT_VERSION and manifest['source'] == 'upload.csv'
+    assert set(manifest['parts']) == {'returns', 'benchmark', 'episodes', 'ci', 'metrics', 'preferences', 'settings'}
+
+
+def test_optional_parts_left_out(analysis):
+    data = save_snapshot(analysis['returns'], None, None, {'rf': 0.0})
+    bundle = load_snapshot(data)
+    assert bundle['benchmark'] is None and bundle['episodes'] is None and bundle['metrics'] is None
+    assert bundle['manifest']['parts'] == ['returns', 'settings']
+
+
+@pytest.mark.parametrize('version', [SNAPSHOT_VERSION + 1, 0, None, '1'])
+def test_wrong_manifest_version(analysis, version):
+    data = save_snapshot(**analysis)
+    manifest = load_snapshot(data)['manifest']
+    with pytest.raises(SnapshotError, match='version'):
+        load_snapshot(rewrite(data, manifest={**manifest, 'version': version}))
+
+
+@pytest.mark.parametrize('member', ['ci.parquet', 'metrics.json', 'returns.parquet', 'manifest.json'])
+def test_missing_member(analysis, member):
+    with pytest.raises(SnapshotError):
+        load_snapshot(rewrite(save_snapshot(**analysis), drop=[member]))
+
+
+def test_not_a_bundle():
+    with pytest.raises(SnapshotError):
+        load_snapshot(b'Date,Returns\n2024-01-02,0.01\n')
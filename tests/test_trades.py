@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.tseries.frequencies import to_offset
+
+from trades import parse_trades, trades_to_returns, trade_stats
+from upload_schema import detect_schema, detect_trade_columns
+
+
+@pytest.fixture
+def trades():
+    rng = np.random.default_rng(5)
+    n = 60
+    entry = pd.Timestamp('2018-01-01 09:30') + pd.to_timedelta(rng.uniform(0, 20 * 86400, n), unit='s').round('s')
+    hold = pd.to_timedelta(rng.exponential(15 * 3600, n), unit='s').round('s')
+    hold = hold.where(rng.random(n) > 0.05, pd.Timedelta(0))
+    log = pd.DataFrame({
+        'Entry Time': entry.strftime('%Y-%m-%d %H:%M:%S'),
+        'Exit Time': (entry + hold).strftime('%Y-%m-%d %H:%M:%S'),
+        'Net PnL': rng.normal(5, 100, n),
+    })
+    return parse_trades(log, 'Entry Time', 'Exit Time', 'Net PnL')
+
+
+def brute_force(trades, capital, freq):
+    """Each trade's PnL spread over every period by its overlap, one period at a time"""
+    offset = to_offset(freq)
+    edges = pd.date_range(offset.rollback(trades['entry'].min().normalize()), trades['exit'].max(), freq=offset)
+    bounds = edges.append(pd.DatetimeIndex([edges[-1] + offset])).as_unit('ns').asi8
+    pnl = np.zeros(len(bounds) - 1)
+    exposed = np.zeros(len(bounds) - 1, dtype=bool)
+    entries = trades['entry'].to_numpy('M8[ns]').view(np.int64)
+    exits = trades['exit'].to_numpy('M8[ns]').view(np.int64)
+    for entry, exit_, value in zip(entries, exits, trades['pnl']):
+        for k in range(len(bounds) - 1):
+            lo, hi = bounds[k], bounds[k + 1]
+            touches = lo <= entry < hi or lo <= exit_ < hi
+            if exit_ == entry:
+                pnl[k] += value if touches else 0.0
+            else:
+                overlap = max(0, min(hi, exit_) - max(lo, entry))
+                pnl[k] += value * overlap / (exit_ - entry)
+                touches = touches or overlap > 0
+            exposed[k] |= touches
+    equity = capital + np.r_[0.0, np.cumsum(pnl)[:-1]]
+    returns = pd.Series(pnl / equity, index=edges)
+    return returns[exposed] if freq in ('h', '15min') else returns
+
+
+@pytest.mark.parametrize('freq', ['B', 'D', 'h', '15min'])
+def test_returns_match_brute_force_overlap(trades, freq):
+    returns = trades_to_returns(trades, 10_000, freq)
+    expected = brute_force(trades, 10_000, freq)
+    assert returns.index.equals(expected.index)
+    np.testing.assert_allclose(returns.to_numpy(), expected.to_numpy(), rtol=0, atol=1e-13)
+    assert ((1 + returns).prod() - 1) * 10_000 == pytest.approx(trades['pnl'].sum())
+
+
+def test_parse_trades_drops_invalid_and_timezones():
+    log = pd.DataFrame({
+        'in': ['2020-01-02 10:00+01:00', '2020-01-03 10:00+01:00', None],
+        'out': ['2020-01-02 12:00+01:00', '2020-01-02 10:00+01:00', '2020-01-05 09:00+01:00'],
+        'pnl': [10, 5, 3],
+    })
+    trades = parse_trades(log, 'in', 'out', 'pnl')
+    assert len(trades) == 1 and trades.attrs['dropped'] == 2
+    assert trades['entry'].iloc[0] == pd.Timestamp('2020-01-02 10:00')
+
+
+def test_profit_factor_edge_cases():
+    day = pd.Timestamp('2020-01-02')
+    def stats(pnl):
+        frame = pd.DataFrame({'entry': [day] * len(pnl), 'exit': [day] * len(pnl), 'pnl': pnl})
+        return trade_stats(frame)
+    assert stats([10.0, -5.0, 0.0])['profit_factor'] == 2.0
+    assert stats([10.0, 0.0])['profit_factor'] == np.inf
+    assert stats([-10.0])['profit_factor'] == 0.0
+    assert np.isnan(stats([0.0, 0.0])['profit_factor'])
+    assert np.isnan(stats([])['profit_factor'])
+
+
+@pytest.mark.parametrize('columns, pnl', [
+    (['Entry Time', 'Exit Time', 'net_exposure', 'Net PnL'], 'Net PnL'),
+    (['Entry Time', 'Exit Time', 'net_exposure', 'Net'], 'Net'),
+    (['EntryTime', 'ExitTime', 'TradePnL'], 'TradePnL'),
+    (['Entry Time', 'Exit Time', 'net_exposure'], None),
+])
+def test_pnl_column_matched_on_whole_words(columns, pnl):
+    frame = pd.DataFrame({
+        columns[0]: ['2020-01-02 10:00', '2020-01-03 10:00'],
+        columns[1]: ['2020-01-02 12:00', '2020-01-03 15:00'],
+        **{c: [1.5, -0.5] for c in columns[2:]},
+    })
+    detected = detect_trade_columns(detect_schema(frame.to_csv(index=False).encode(), 'trades.csv'))
+    if pnl is None:
+        assert detected is None
+    else:
+        assert (detected['entry'], detected['exit'], detected['pnl']) == (columns[0], columns[1], pnl)
@@ -0,0 +1,79 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from upload_schema import SAMPLE_BYTES, detect_dayfirst, detect_scale, detect_schema, read_columns
+
+
+@pytest.fixture
+def frame():
+    index = pd.bdate_range('2021-01-04', periods=300)
+    rng = np.random.default_rng(2)
+    return pd.DataFrame({
+        'Fecha': index,
+        'Precio': 100 * np.cumprod(1 + rng.normal(0, 0.01, len(index))),
+        'Retorno': rng.normal(0.05, 0.9, len(index)).round(4),
+        'Otra': rng.normal(0, 0.01, len(index)).round(6),
+    })
+
+
+def test_semicolon_with_decimal_comma(frame):
+    data = frame.assign(Fecha=frame['Fecha'].dt.strftime('%d/%m/%Y')).to_csv(index=False, sep=';', decimal=',').encode()
+    schema = detect_schema(data, 'export.csv')
+    assert (schema['delimiter'], schema['decimal']) == (';', ',')
+    assert (schema['date_col'], schema['returns_col']) == ('Fecha', 'Retorno')
+    assert schema['dayfirst'] and schema['scale'] == 100
+    assert schema['numeric_columns'] == ['Precio', 'Retorno', 'Otra']
+
+    parsed = read_columns(data, schema, ['Fecha', 'Retorno', 'Fecha'])
+    assert list(parsed.columns) == ['Fecha', 'Retorno']
+    np.testing.assert_array_equal(parsed['Retorno'], frame['Retorno'])
+
+
+def test_overrides_reparse_the_sample(frame):
+    data = frame.to_csv(index=False, sep='|').encode()
+    assert detect_schema(data, 'export.csv')['delimiter'] == '|'
+    # A wrong override leaves a single text column, so nothing is numeric
+    forced = detect_schema(data, 'export.csv', delimiter=';')
+    assert forced['delimiter'] == ';' and forced['numeric_columns'] == []
+
+
+def test_only_the_sample_is_parsed(frame):
+    long = pd.concat([frame] * 200, ignore_index=True)
+    data = long.to_csv(index=False).encode()
+    assert len(data) > SAMPLE_BYTES
+    schema = detect_schema(data, 'long.csv')
+    assert schema['delimiter'] == ',' and schema['decimal'] == '.'
+    assert len(schema['sample']) == 200
+    assert len(read_columns(data, schema, ['Otra'])) == len(long)
+
+
+def test_excel_upload(frame):
+    pytest.importorskip('openpyxl')
+    buffer = io.BytesIO()
+    frame.to_excel(buffer, index=False)
+    schema = detect_schema(buffer.getvalue(), 'returns.xlsx', sample_rows=50)
+    assert schema['excel'] and schema['delimiter'] is None
+    assert (schema['date_col'], schema['returns_col'], len(schema['sample'])) == ('Fecha', 'Retorno', 50)
+    parsed = read_columns(buffer.getvalue(), schema, ['Fecha', 'Otra'])
+    np.testing.assert_array_equal(parsed['Otra'], frame['Otra'])
+
+
+def test_detect_scale():
+    assert detect_scale([0.8, -0.3, 0.5, 0.4]) == 100
+    assert detect_scale([0.01, -0.02, 0.004]) == 1
+    assert detect_scale([1.5, -2.0]) == 100
+    assert detect_scale([np.nan]) == 1
+
+
+@pytest.mark.parametrize('values, expected', [
+    (['03/01/2021', '25/01/2021'], True),
+    (['01/03/2021', '01/25/2021'], False),
+    (['01/02/2021', '02/03/2021'], False),
+    (['2021-01-25', '2021-02-01'], False),
+    (['13.01.2021', '14.01.2021'], True),
+])
+def test_detect_dayfirst(values, expected):
+    assert detect_dayfirst(pd.Series(values)) is expected
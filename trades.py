@@ -0,0 +1,152 @@
+"""Trade logs: conversion to periodic mark-to-market returns and trade-level statistics
+
+A trade log lists entry and exit timestamps with the realized PnL of each
+trade. Without the price path in between, each trade's PnL is marked to
+market linearly over its holding time. Every trade is located on the period
+grid with one ``searchsorted``. Its partial first and last periods are
+added with ``bincount``, and the periods it spans fully come from a
+cumulative sum of the PnL rates of open trades. The cost is O(trades +
+periods) whatever the holding times.
+"""
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+import kernels
+
+TRADE_FREQS = ['B', 'D', 'h', '30min', '15min', '5min']
+
+
+def parse_trades(df, entry_col, exit_col, pnl_col, mae_col=None, mfe_col=None, dayfirst=False):
+    """Trades sorted by exit with ``entry``, ``exit``, ``pnl`` and optional ``mae`` / ``mfe``
+
+    Rows with a missing date or PnL, or exiting before they enter, are
+    dropped; ``attrs['dropped']`` counts them. MAE is stored as a loss
+    (<= 0) and MFE as a gain (>= 0), whatever sign the export uses.
+    """
+    trades = pd.DataFrame({
+        'entry': pd.to_datetime(df[entry_col], dayfirst=dayfirst, format='mixed'),
+        'exit': pd.to_datetime(df[exit_col], dayfirst=dayfirst, format='mixed'),
+        'pnl': pd.to_numeric(df[pnl_col], errors='coerce'),
+    })
+    if mae_col is not None:
+        trades['mae'] = -pd.to_numeric(df[mae_col], errors='coerce').abs()
+    if mfe_col is not None:
+        trades['mfe'] = pd.to_numeric(df[mfe_col], errors='coerce').abs()
+    for column in ('entry', 'exit'):
+        if trades[column].dt.tz is not None:
+            trades[column] = trades[column].dt.tz_localize(None)
+
+    valid = trades[['entry', 'exit', 'pnl']].notna().all(axis=1) & (trades['exit'] >= trades['entry'])
+    result = trades[valid].sort_values(['exit', 'entry'], kind='stable', ignore_index=True)
+    result.attrs['dropped'] = int((~valid).sum())
+    return result
+
+
+def _period_edges(entry, exit_, offset):
+    """Period boundaries covering every trade, one more than the number of periods"""
+    first = offset.rollback(entry.min().normalize())
+    edges = pd.date_range(first, exit_.max(), freq=offset)
+    return edges.append(pd.DatetimeIndex([edges[-1] + offset])).as_unit('ns')
+
+
+def trades_to_returns(trades, capital, freq='B'):
+    """Periodic returns of an account starting at ``capital`` that holds the trades
+
+    Each period is labelled with its start and runs until the next one; with
+    the default business-day grid, weekend holding time counts towards the
+    Friday. Returns are period PnL over the marked-to-market equity at the
+    start of the period. Daily grids keep flat periods; intraday grids keep
+    only the bars where some trade is open, so nights do not count as flat
+    bars.
+    """
+    if capital <= 0:
+        raise ValueError("Starting capital must be positive")
+    if len(trades) == 0:
+        return pd.Series([], index=pd.DatetimeIndex([]), dtype=float, name='Trades')
+
+    offset = to_offset(freq)
+    edges = _period_edges(trades['entry'], trades['exit'], offset)
+    bounds = edges.asi8
+    entry = trades['entry'].to_numpy('M8[ns]').view(np.int64)
+    exit_ = trades['exit'].to_numpy('M8[ns]').view(np.int64)
+    pnl = trades['pnl'].to_numpy(dtype=float)
+    periods = len(bounds) - 1
+
+    first = np.searchsorted(bounds, entry, side='right') - 1
+    last = np.searchsorted(bounds, exit_, side='right') - 1
+    inside = first == last
+    spanning = ~inside
+    # PnL per nanosecond held; times stay integer until multiplied by it
+    rate = pnl[spanning] / (exit_[spanning] - entry[spanning])
+    a, c = first[spanning], last[spanning]
+
+    period_pnl = np.bincount(first[inside], weights=pnl[inside], minlength=periods)
+    period_pnl += np.bincount(a, weights=rate * (bounds[a + 1] - entry[spanning]), minlength=periods)
+    period_pnl += np.bincount(c, weights=rate * (exit_[spanning] - bounds[c]), minlength=periods)
+
+    # Trades open through whole periods strictly between their first and last
+    open_rate = np.zeros(periods + 1)
+    np.add.at(open_rate, a + 1, rate)
+    np.add.at(open_rate, c, -rate)
+    period_pnl += np.cumsum(open_rate)[:periods] * np.diff(bounds)
+
+    open_count = np.zeros(periods + 1, dtype=np.int64)
+    np.add.at(open_count, first, 1)
+    np.add.at(open_count, last + 1, -1)
+    exposed = np.cumsum(open_count)[:periods] > 0
+
+    equity = capital + np.r_[0.0, np.cumsum(period_pnl)[:-1]]
+    returns = pd.Series(period_pnl / equity, index=edges[:-1], name='Trades')
+    if isinstance(offset, pd.offsets.Tick) and pd.Timedelta(offset) < pd.Timedelta(days=1):
+        returns = returns[exposed]
+    return returns
+
+
+def trade_stats(trades):
+    """Trade-level counterparts of the period metrics
+
+    Win rate, payoff and profit factor count trades rather than periods;
+    hold times are Timedeltas. Streaks run over trades in exit order. MAE
+    and MFE figures appear only when the log has those columns.
+    """
+    pnl = trades['pnl'].to_numpy(dtype=float)
+    hold = trades['exit'] - trades['entry']
+    wins, losses = pnl > 0, pnl < 0
+    gross_win, gross_loss = pnl[wins].sum(), pnl[losses].sum()
+    avg_win = pnl[wins].mean() if wins.any() else np.nan
+    avg_loss = pnl[losses].mean() if losses.any() else np.nan
+    win_streak, loss_streak = kernels.streaks(pnl)
+
+    stats = {
+        'trades': len(pnl),
+        'win_rate': wins.mean() if len(pnl) else np.nan,
+        'expectancy': pnl.mean() if len(pnl) else np.nan,
+        'total_pnl': pnl.sum(),
+        'avg_win': avg_win,
+        'avg_loss': avg_loss,
+        'payoff_ratio': avg_win / abs(avg_loss) if losses.any() else np.nan,
+        # inf without losses, like the period metric; nan with no wins either
+        'profit_factor': gross_win / abs(gross_loss) if gross_loss else (np.inf if gross_win else np.nan),
+        'best': pnl.max() if len(pnl) else np.nan,
+        'worst': pnl.min() if len(pnl) else np.nan,
+        'avg_hold': hold.mean(),
+        'median_hold': hold.median(),
+        'max_hold': hold.max(),
+        'avg_hold_win': hold[wins].mean(),
+        'avg_hold_loss': hold[losses].mean(),
+        'win_streak': win_streak,
+        'loss_streak': loss_streak,
+    }
+    if 'mae' in trades:
+        stats['avg_mae'] = trades['mae'].mean()
+        stats['worst_mae'] = trades['mae'].min()
+    if 'mfe' in trades:
+        stats['avg_mfe'] = trades['mfe'].mean()
+        stats['best_mfe'] = trades['mfe'].max()
+        # Part of the best open profit that winning trades kept at exit
+        mfe = trades.loc[wins, 'mfe']
+        stats['mfe_capture'] = pnl[wins][mfe > 0].sum() / mfe[mfe > 0].sum() if (mfe > 0).any() else np.nan
+    if 'mae' in trades and 'mfe' in trades:
+        stats['edge_ratio'] = stats['avg_mfe'] / abs(stats['avg_mae']) if stats['avg_mae'] else np.nan
+    return stats
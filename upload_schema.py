@@ -0,0 +1,183 @@
+"""Schema detection on a small sample of an upload, then a single column-pruned parse"""
+import csv
+import io
+import os
+import re
+
+import pandas as pd
+
+SAMPLE_BYTES = 64 * 1024
+SAMPLE_ROWS = 200
+DELIMITERS = [',', ';', '\t', '|']
+DATE_HINTS = ('date', 'fecha', 'time', 'timestamp', 'datetime', 'dia', 'día', 'periodo')
+RETURN_HINTS = ('return', 'retorno', 'ret', 'pnl', 'rend', 'rentab', 'strategy', 'estrategia')
+ENTRY_HINTS = ('entry', 'entrada', 'open', 'apertura', 'inicio', 'start')
+EXIT_HINTS = ('exit', 'salida', 'close', 'cierre', 'fin', 'end')
+PNL_HINTS = ('pnl', 'p&l', 'profit', 'beneficio', 'ganancia', 'resultado')
+# Generic words that mean PnL only as the whole column name ('net', not 'net_exposure')
+PNL_NAMES = ('net', 'neto')
+
+_COMMA_DECIMAL = re.compile(r'^-?\d+,\d+$')
+_DOT_DECIMAL = re.compile(r'^-?\d*\.\d+$')
+_NUMERIC_DATE = re.compile(r'^\s*(\d{1,2})[/.-](\d{1,2})[/.-]\d{2,4}')
+_CAMEL_BOUNDARY = re.compile(r'(?<=[a-z])(?=[A-Z][a-z])')
+_TOKEN = re.compile(r'(?:[^\W_]|&)+')
+
+
+def _is_excel(filename):
+    return os.path.splitext(filename)[1].lower() in ('.xlsx', '.xls')
+
+
+def _sample_text(data):
+    """Leading bytes of the file decoded, cut at the last complete line"""
+    head = data[:SAMPLE_BYTES]
+    if len(data) > SAMPLE_BYTES and b'\n' in head:
+        head = head[:head.rindex(b'\n') + 1]
+    for encoding in ('utf-8-sig', 'latin-1'):
+        try:
+            return head.decode(encoding), encoding
+        except UnicodeDecodeError:
+            continue
+
+
+def _sniff_delimiter(text, filename):
+    try:
+        return csv.Sniffer().sniff(text[:8192], delimiters=''.join(DELIMITERS)).delimiter
+    except csv.Error:
+        return '\t' if filename.lower().endswith('.txt') else ','
+
+
+def _sniff_decimal(raw, delimiter):
+    """',' when numeric fields use a decimal comma, which needs a non-comma delimiter"""
+    if delimiter == ',':
+        return '.'
+    values = raw.stack().astype(str).str.strip()
+    comma = values.str.match(_COMMA_DECIMAL).sum()
+    dot = values.str.match(_DOT_DECIMAL).sum()
+    return ',' if comma > dot else '.'
+
+
+def detect_dayfirst(values):
+    """True for DD/MM/YYYY style dates: a leading field above 12 settles it"""
+    fields = values.astype(str).str.extract(_NUMERIC_DATE).dropna().astype(int)
+    if len(fields) == 0:
+        return False
+    return bool((fields[0] > 12).any() and not (fields[1] > 12).any())
+
+
+def _date_score(column, values):
+    """Share of sample values that parse as dates, plus a bonus for the column name"""
+    hint = any(h in str(column).lower() for h in DATE_HINTS)
+    if pd.api.types.is_numeric_dtype(values) and not hint:
+        return 0.0, False
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return 1.0 + hint, False
+    dayfirst = detect_dayfirst(values)
+    parsed = pd.to_datetime(values.astype(str), errors='coerce', dayfirst=dayfirst, format='mixed')
+    return parsed.notna().mean() + hint, dayfirst
+
+
+def _looks_like_prices(values):
+    values = values.dropna()
+    return bool(len(values) > 2 and (values > 0).all() and values.median() > 2)
+
+
+def detect_scale(values):
+    """100 when sample returns look like percentages, 1 when they look like decimals"""
+    values = pd.Series(values, dtype=float).dropna().abs()
+    if len(values) == 0:
+        return 1
+    return 100 if values.mean() > 1 or values.median() > 0.25 else 1
+
+
+def detect_schema(data, filename, delimiter=None, decimal=None, sample_rows=SAMPLE_ROWS):
+    """Format, likely date/returns columns and percent scale from a sample
+
+    Only the first SAMPLE_BYTES of text files (or ``sample_rows`` rows of a
+    spreadsheet) are parsed. ``delimiter`` and ``decimal`` override the
+    sniffed values. The returned dict carries the reader settings for
+    ``read_columns`` and the parsed ``sample`` for previews.
+    """
+    schema = {'excel': _is_excel(filename), 'delimiter': None, 'decimal': '.', 'encoding': None}
+    if schema['excel']:
+        sample = pd.read_excel(io.BytesIO(data), nrows=sample_rows)
+    else:
+        text, schema['encoding'] = _sample_text(data)
+        schema['delimiter'] = delimiter or _sniff_delimiter(text, filename)
+        raw = pd.read_csv(io.StringIO(text), sep=schema['delimiter'], dtype=str, nrows=sample_rows)
+        schema['decimal'] = decimal or _sniff_decimal(raw, schema['delimiter'])
+        sample = pd.read_csv(io.StringIO(text), sep=schema['delimiter'], decimal=schema['decimal'], nrows=sample_rows)
+
+    columns = list(sample.columns)
+    date_scores = {c: _date_score(c, sample[c]) for c in columns}
+    date_col = max(columns, key=lambda c: date_scores[c][0])
+    numeric = [c for c in columns if c != date_col and pd.api.types.is_numeric_dtype(sample[c])]
+
+    def returns_score(column):
+        hint = any(h in str(column).lower() for h in RETURN_HINTS)
+        prices = column in numeric and _looks_like_prices(sample[column])
+        return int(hint) - int(prices)
+
+    candidates = numeric or [c for c in columns if c != date_col] or columns
+    returns_col = max(candidates, key=returns_score)
+
+    schema.update({
+        'columns': columns,
+        'numeric_columns': numeric,
+        'date_col': date_col,
+        'dayfirst': date_scores[date_col][1],
+        'returns_col': returns_col,
+        'scale': detect_scale(sample[returns_col]) if returns_col in numeric else 1,
+        'sample': sample,
+    })
+    return schema
+
+
+def _tokens(name):
+    """Lowercase words of a column name, split on separators and camelCase ('NetPnL' -> net, pnl)"""
+    return _TOKEN.findall(_CAMEL_BOUNDARY.sub(' ', str(name)).lower())
+
+
+def detect_trade_columns(schema):
+    """Entry, exit, PnL and optional MAE/MFE columns when the upload looks like a trade log
+
+    Returns None unless two date-like columns and a numeric PnL column are
+    found. Names are matched on whole words. Entry and exit are told apart
+    by their names, or else by column order.
+    """
+    sample = schema['sample']
+    scores = {c: _date_score(c, sample[c]) for c in schema['columns']}
+    dates = [c for c in schema['columns'] if scores[c][0] >= 0.8 and not pd.api.types.is_numeric_dtype(sample[c])]
+    numeric = schema['numeric_columns']
+    if len(dates) < 2 or not numeric:
+        return None
+
+    def named(columns, hints):
+        # Whole words only, trying hints in order so the most specific wins
+        tokens = {c: _tokens(c) for c in columns}
+        return next((c for h in hints for c in columns if h in tokens[c]), None)
+
+    entry = named(dates, ENTRY_HINTS) or dates[0]
+    exit_ = named([c for c in dates if c != entry], EXIT_HINTS) or next(c for c in dates if c != entry)
+    pnl = named(numeric, PNL_HINTS) or next((c for n in PNL_NAMES for c in numeric if _tokens(c) == [n]), None)
+    if pnl is None:
+        return None
+    return {
+        'entry': entry,
+        'exit': exit_,
+        'pnl': pnl,
+        'mae': named(numeric, ('mae',)),
+        'mfe': named(numeric, ('mfe',)),
+        'dayfirst': scores[entry][1],
+    }
+
+
+def read_columns(data, schema, columns):
+    """Full parse of the upload restricted to ``columns``"""
+    columns = list(dict.fromkeys(columns))
+    if schema['excel']:
+        frame = pd.read_excel(io.BytesIO(data), usecols=columns)
+    else:
+        frame = pd.read_csv(io.BytesIO(data), sep=schema['delimiter'], decimal=schema['decimal'],
+                            encoding=schema['encoding'], usecols=columns)
+    return frame[columns]